@@ -13,36 +13,46 @@ from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_apscheduler import APScheduler
-from datetime import datetime, timedelta
 
 import logging
-from logging.handlers import SMTPHandler, RotatingFileHandler
 
 # Create Flask extension instances without attaching application
 db = SQLAlchemy() 
 migrate = Migrate()  
 mail = Mail() 
 bootstrap = Bootstrap() 
-scheduler = APScheduler()
+scheduler = APScheduler() # Configured and started by startScheduler, after the fork in gunicorn workers
 
 login = LoginManager()
 login.login_view = 'auth.login' # Endpoint name
 login.login_message = ('Please log in to access this page.')
 
 from appPkg.main.handlers import checkAlerts # Placed here to avoid import error for DB
-from appPkg.main.syslog import backup_logs
+from appPkg.main.syslog import backup_logs, accessLog
+from appPkg.main.leader import runAsLeader
+from appPkg.main.outbox import dispatchOutbox
+from appPkg.main.pricecache import priceCache
+from appPkg.main.executors import executors
+from appPkg.email import mailDelivery
+from appPkg.main.logpipeline import LogPipeline, AggregatingSMTPHandler
+from appPkg.main.logsegments import SegmentFileHandler
     
 # Flask Application Factory 
-def create_app(config_class=Config): 
+def create_app(config_class=Config, run_scheduler=None, ship_logs=None): 
     """
     Initialize the Flask app and extensions. 
     Initialize email handling for Python errors
-    Initialize and startup the scheduler to check for alerts every X minutes.
+    Initialize and startup the scheduler to check for alerts every X minutes (leader process only) and to ship the logs.
     
     Parameters
     ----------
     config_class : Config
         Python app configuration data.
+    run_scheduler : boolean, optional
+        The default is None, which uses SCHEDULER_ENABLED. Web workers run without the scheduler,
+        the jobs then run in the 'flask alerts worker' process.
+    ship_logs : boolean, optional
+        The default is None, which uses LOG_SHIPPING_ENABLED. Runs the log backup job, in web workers too.
 
     Returns
     -------
@@ -51,7 +61,7 @@ def create_app(config_class=Config):
 
     """
     app = Flask (__name__) 
-    app.config.from_object(Config) 
+    app.config.from_object(config_class) 
 
     # init_app() method invoked on extension instances to bind to the now known application. 
     db.init_app(app)
@@ -59,7 +69,10 @@ def create_app(config_class=Config):
     login.init_app(app)
     mail.init_app(app)
     bootstrap.init_app(app)
-    scheduler.init_app(app)
+    priceCache.init_app(app)
+    executors.init_app(app)
+    mailDelivery.init_app(app) # Runs on the 'mail' executor pool
+    accessLog.init_app(app)
     
     # Register the errors blueprint with the application
     from appPkg.errors import bp as errors_bp 
@@ -78,7 +91,9 @@ def create_app(config_class=Config):
     app.register_blueprint(api_bp, url_prefix='/api')
 
     # Email Log Errors
-    if not app.debug: # Only enable email logger when app in production mode
+    if not app.debug and not app.testing: # Only enable email logger when app in production mode
+        log_handlers = [] # Owned by the log pipeline's listener thread, not the request threads
+        
         if app.config['MAIL_SERVER']: 
             
             # Setup email handler
@@ -89,38 +104,106 @@ def create_app(config_class=Config):
             if app.config['MAIL_USE_TLS']:
                 secure = ()
             
-            mail_handler = SMTPHandler(
+            mail_handler = AggregatingSMTPHandler(
                 mailhost=(app.config['MAIL_SERVER'], app.config['MAIL_PORT']),
                 fromaddr=app.config['MAIL_USERNAME'],
                 toaddrs=app.config['ADMINS'], subject='SPA Failure',
-                credentials=auth, secure=secure)
+                credentials=auth, secure=secure, interval=app.config['LOG_EMAIL_INTERVAL'])
             mail_handler.setLevel(logging.ERROR)
-            app.logger.addHandler(mail_handler)
+            log_handlers.append(mail_handler)
             
         # Logging exceptions that are not errors being emailed
         if not os.path.exists('logs'):
             os.mkdir('logs')
         
-        filepath = 'logs/' + str(datetime.utcnow().strftime("%Y%m%d-%H%M%S")) + '_spa.log'
-        file_handler = RotatingFileHandler(filepath, maxBytes=10000, backupCount=10)
+        # One segment per process, compressed and listed in logs/manifest.jsonl when it rolls over
+        file_handler = SegmentFileHandler('logs', maxBytes=app.config['LOG_SEGMENT_SIZE'], maxAge=app.config['LOG_SEGMENT_MAX_AGE'],
+                                          retentionDays=app.config['LOG_RETENTION_DAYS'])
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+        log_handlers.append(file_handler)
+        
+        # Request threads only enqueue records, the listener thread writes the file in batches and sends the error emails
+        log_pipeline = LogPipeline(log_handlers, queueSize=app.config['LOG_QUEUE_SIZE'], 
+                                   batchSize=app.config['LOG_BATCH_SIZE'], flushInterval=app.config['LOG_FLUSH_INTERVAL'],
+                                   deferStart=app.config['LOG_DEFER_LISTENER'])
+        app.logger.addHandler(log_pipeline.queueHandler)
     
         app.logger.setLevel(logging.INFO)
         app.logger.info('SPA startup')
     
-    # Start-up APScheduler to check alerts
-    with app.app_context():
-        
-        # Initialize logTimeCheck to last year
-        current_app.logTimeCheck = datetime.now() - timedelta(days=365)
-        
-        scheduler.add_job(func=checkAlerts, args=[current_app._get_current_object()], trigger='interval', id='job1', seconds=app.config['ALERT_CHECK_FREQUENCY'], timezone="UTC")
-        scheduler.add_job(func=backup_logs, args=[current_app._get_current_object(), os.getcwd()], trigger='interval', id='job2', seconds=app.config['LOG_BACKUP_FREQUENCY'], timezone="UTC")
-        scheduler.start()
+    # Start-up APScheduler to check alerts and ship the logs
+    if run_scheduler is None:
+        run_scheduler = app.config['SCHEDULER_ENABLED']
+    if ship_logs is None:
+        ship_logs = app.config['LOG_SHIPPING_ENABLED']
+    if run_scheduler or ship_logs:
+        startScheduler(app, alertJobs=run_scheduler, logJobs=ship_logs)
         
     return app
 
+def startScheduler(app, alertJobs=True, logJobs=True):
+    """
+    Add the background jobs and start APScheduler.
+    Called by create_app, or by 'flask alerts worker' when the web workers run without the alert jobs.
+    Jobs already added are replaced, so the worker can add the alert jobs to a scheduler already shipping the logs.
+
+    Parameters
+    ----------
+    app : Flask instance
+    alertJobs : boolean, optional
+        The default is True. Alert checks and outbox dispatch, run by one process per deployment.
+    logJobs : boolean, optional
+        The default is True. Log backup, run by every container since each has its own logs directory.
+
+    Returns
+    -------
+    None.
+
+    """
+    if not scheduler.running:
+        scheduler.init_app(app) # Configures APScheduler, not allowed once it runs
+    
+    with app.app_context():
+        
+        # Jobs only run in the process holding the leader lock for them (see appPkg/main/leader.py)
+        if alertJobs:
+            scheduler.add_job(func=runAsLeader, args=['checkAlerts', checkAlerts, current_app._get_current_object()], trigger='interval', id='job1', seconds=app.config['ALERT_CHECK_FREQUENCY'], timezone="UTC", replace_existing=True)
+            scheduler.add_job(func=dispatchOutbox, args=[current_app._get_current_object()], trigger='interval', id='job3', seconds=app.config['OUTBOX_DISPATCH_FREQUENCY'], timezone="UTC", replace_existing=True) # SKIP LOCKED claims, safe on every process
+        if logJobs:
+            scheduler.add_job(func=runAsLeader, args=['backup_logs', backup_logs, current_app._get_current_object(), os.getcwd()], kwargs={'lockDir': os.path.join(os.getcwd(), 'logs')}, trigger='interval', id='job2', seconds=app.config['LOG_BACKUP_FREQUENCY'], timezone="UTC", replace_existing=True) # One shipper per logs directory, not per deployment
+        if not scheduler.running:
+            scheduler.start()
+
+def resetAfterFork(app, run_scheduler=False, ship_logs=False):
+    """
+    Called in each gunicorn worker after it is forked from a master that preloaded the app (see gunicorn.conf.py).
+    Connections, threads and pools created before the fork belong to the master, the worker creates its own.
+
+    Parameters
+    ----------
+    app : Flask instance
+    run_scheduler : boolean, optional
+        The default is False. Start the alert jobs deferred by the master.
+    ship_logs : boolean, optional
+        The default is False. Start the log backup job deferred by the master.
+
+    Returns
+    -------
+    None.
+
+    """
+    from appPkg.main.quotes import resetQuoteProvider
+    
+    with app.app_context():
+        # A new empty pool, the master's connections are left open for the master (dispose(close=False) needs SQLAlchemy 1.4.33)
+        db.engine.pool = db.engine.pool.recreate()
+    executors.resetAfterFork()
+    mailDelivery.resetAfterFork()
+    resetQuoteProvider()
+    
+    if run_scheduler or ship_logs:
+        startScheduler(app, alertJobs=run_scheduler, logJobs=ship_logs)
+
 from appPkg import models # At the end to prevent circular referencing
\ No newline at end of file
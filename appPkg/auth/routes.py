@@ -13,8 +13,6 @@ from appPkg import db
 from appPkg.auth import bp
 from appPkg.auth.forms import LoginForm, RegistrationForm, ResetPasswordRequestForm, ResetPasswordForm
 from appPkg.models import User
-from appPkg.main.syslog import logInfo
-import inspect
 
 @bp.route('/login', methods=['GET', 'POST']) # Default is GET only
 def login():
@@ -27,8 +25,6 @@ def login():
     Redirect webpage
     """
     
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
-    
     if current_user.is_authenticated: # Dont want a logged in user to go to the login page again
         return redirect(url_for('main.index')) 
     
@@ -75,7 +71,6 @@ def register():
     HTML template
     Redirect webpage
     """
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
     
     if current_user.is_authenticated:
         return redirect(url_for('index')) # Redirect: Go to index page
@@ -115,8 +110,6 @@ def reset_password_request():
     Redirect webpage        
     """
     
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
-    
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
         
@@ -145,7 +138,6 @@ def reset_password(token):
     HTML template
     Redirect webpage
     """
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
     
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
@@ -0,0 +1,245 @@
+"""
+Description:
+    Custom flask CLI commands
+"""
+
+import click
+from time import perf_counter
+
+
+def register(app):
+    """
+    Register the custom CLI commands with the app.
+
+    Parameters
+    ----------
+    app : Flask instance
+
+    Returns
+    -------
+    None.
+
+    """
+
+    @app.cli.command('profile-startup')
+    @click.option('--module', default='appPkg', help='Module to import in a fresh interpreter.')
+    @click.option('--top', default=25, help='Number of modules to list.')
+    def profileStartup(module, top):
+        """Report per-module import time of a cold start (python -X importtime), slowest first."""
+        import os
+        import subprocess
+        import sys
+
+        start = perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, cwd=os.path.dirname(app.root_path)) # Project directory
+        elapsed = perf_counter() - start
+        if result.returncode:
+            raise click.ClickException(result.stderr.strip().splitlines()[-1])
+
+        # 'import time: self [us] | cumulative | imported package', nested imports are indented
+        modules = []
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            modules.append((int(fields[1]), int(fields[0].split(':')[1]), fields[2].strip()))
+        modules.sort(reverse=True)
+
+        click.echo(f'import {module}: {elapsed * 1000:.0f} ms wall, {len(modules)} modules')
+        click.echo(f'{"cumulative ms":>14} {"self ms":>8}  module')
+        for cumulative, own, name in modules[:top]:
+            click.echo(f'{cumulative / 1000:14.1f} {own / 1000:8.1f}  {name}')
+
+    @app.cli.group()
+    def quotes():
+        """Quote provider commands."""
+        pass
+
+    @quotes.command()
+    @click.option('--symbols', default=500, help='Number of symbols to fetch.')
+    @click.option('--latency', default=0.5, help='Simulated seconds per request for the fake provider.')
+    @click.option('--provider', default='fake',
+                  help='Quote provider to load test (fake, fake-async, yahoo-chart, yahoo-chart-async, yahoofinancials).')
+    def loadtest(symbols, latency, provider):
+        """Time one fetch cycle over many symbols, offline with the fake provider."""
+        from appPkg.main.quotes import quoteProviders, AsyncQuoteProvider, ConcurrentQuoteProvider
+
+        fake = provider in ('fake', 'fake-async')
+        if fake:
+            quoteProvider = quoteProviders[provider](app.config['QUOTE_CONCURRENCY'], app.config['QUOTE_TIMEOUT'], latency)
+        elif issubclass(quoteProviders[provider], (ConcurrentQuoteProvider, AsyncQuoteProvider)):
+            quoteProvider = quoteProviders[provider](app.config['QUOTE_CONCURRENCY'], app.config['QUOTE_TIMEOUT'])
+        else:
+            quoteProvider = quoteProviders[provider]()
+
+        tickers = [f'SYM{i}' for i in range(symbols)] if fake else ['AAPL', 'MSFT', 'AMZN', 'GOOG'] * (symbols // 4)
+        start = perf_counter()
+        prices = quoteProvider.getPrices(tickers)
+        elapsed = perf_counter() - start
+
+        valid = sum(1 for price in prices.values() if price)
+        click.echo(f'{provider}: {len(tickers)} symbols, {valid} prices in {elapsed:.2f}s '
+                   f'(concurrency {app.config["QUOTE_CONCURRENCY"]})')
+
+    @app.cli.group()
+    def alerts():
+        """Alert checking commands."""
+        pass
+
+    @alerts.command()
+    @click.option('--sizes', default='10000,100000,1000000', help='Comma separated alert counts.')
+    @click.option('--stocks', default=500, help='Number of distinct stocks.')
+    def benchmark(sizes, stocks):
+        """Compare the vectorized engine to the original per-alert loop on synthetic alerts."""
+        import numpy as np
+        from appPkg.main.vectorized import evaluateArrays
+
+        rng = np.random.default_rng(0)
+        stockPrices = {stockID: float(price) for stockID, price in enumerate(rng.uniform(50, 150, stocks))}
+
+        for size in (int(x) for x in sizes.split(',')):
+            alertIDs = np.arange(size, dtype=np.int64)
+            stockIDs = rng.integers(0, stocks, size)
+            priceAtUserInput = rng.uniform(50, 150, size)
+            desiredPrices = rng.uniform(50, 150, size)
+            falling = priceAtUserInput - desiredPrices >= 0
+
+            # Original loop - one Python comparison per alert
+            rows = list(zip(alertIDs.tolist(), stockIDs.tolist(), priceAtUserInput.tolist(), desiredPrices.tolist()))
+            start = perf_counter()
+            loopIDs = []
+            for alertID, stockID, userPrice, desiredPrice in rows:
+                price = stockPrices[stockID]
+                if userPrice - desiredPrice >= 0:
+                    if price <= desiredPrice:
+                        loopIDs.append(alertID)
+                elif userPrice - desiredPrice < 0:
+                    if price >= desiredPrice:
+                        loopIDs.append(alertID)
+            loopTime = perf_counter() - start
+
+            start = perf_counter()
+            vectorIDs = evaluateArrays(alertIDs, stockIDs, desiredPrices, falling, stockPrices)
+            vectorTime = perf_counter() - start
+
+            if loopIDs != vectorIDs.tolist():
+                raise click.ClickException(f'Vectorized engine does not match the loop at {size} alerts: '
+                                           f'{len(vectorIDs)} triggered, the loop {len(loopIDs)}')
+            click.echo(f'{size:>9} alerts: loop {loopTime * 1000:9.1f} ms, vectorized {vectorTime * 1000:7.1f} ms, '
+                       f'{len(loopIDs)} triggered ({loopTime / vectorTime:.0f}x)')
+
+    @alerts.command()
+    def worker():
+        """Run the background jobs (alert checks, outbox dispatch, log backups) without serving requests.
+        Web workers run with SCHEDULER_ENABLED=0, this process runs the scheduler until SIGTERM/SIGINT."""
+        import signal
+        from threading import Event
+        import appPkg
+        from appPkg.main.executors import executors
+
+        # create_app may already run the log backup job here, the alert jobs are added to the same scheduler
+        appPkg.startScheduler(app, alertJobs=True, logJobs=app.config['LOG_SHIPPING_ENABLED'])
+        scheduler = appPkg.scheduler
+
+        stop = Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+        click.echo(f'Alert worker running jobs {", ".join(sorted(job.id for job in scheduler.get_jobs()))}')
+        stop.wait()
+
+        scheduler.shutdown() # Waits for running jobs to finish
+        executors.shutdown() # Then for the cycles, uploads and emails they queued
+        click.echo('Alert worker stopped')
+
+    @app.cli.group()
+    def logs():
+        """Log commands."""
+        pass
+
+    @logs.command()
+    @click.option('--requests', default=10000, help='Number of simulated requests.')
+    @click.option('--depth', default=40, help='Stack depth at the view function (Flask, Werkzeug and gunicorn frames).')
+    def benchmark(requests, depth):
+        """Per-request cost of the page name lookup: inspect.stack() in each route vs request.endpoint in the access log."""
+        import inspect
+        from flask import request
+
+        def atDepth(remaining, lookup):
+            # Recurse to a realistic stack depth before the lookup, as a view function would see it
+            return atDepth(remaining - 1, lookup) if remaining else lookup()
+
+        with app.test_request_context('/about'):
+            app.preprocess_request() # Matches the URL so request.endpoint is set
+            timings = {}
+            for name, lookup in (('inspect.stack()', lambda: inspect.stack()[0].function),
+                                 ('request.endpoint', lambda: request.endpoint)):
+                start = perf_counter()
+                for i in range(requests):
+                    atDepth(depth, lookup)
+                timings[name] = (perf_counter() - start) / requests
+
+        for name, seconds in timings.items():
+            click.echo(f'{name:>17}: {seconds * 1e6:9.1f} us per request')
+        click.echo(f'Saved {(timings["inspect.stack()"] - timings["request.endpoint"]) * 1e6:.1f} us per request '
+                   f'({timings["inspect.stack()"] / timings["request.endpoint"]:.0f}x)')
+
+    @logs.command()
+    @click.option('--directory', default='logs', help='Logs directory.')
+    @click.option('--since', default=None, help="Only count requests at or after 'YYYY-mm-dd[ HH:MM]' (UTC).")
+    @click.option('--bucket', type=click.Choice(['minute', 'hour', 'day']), default='hour', help='Time bucket size.')
+    @click.option('--top', default=10, help='Number of endpoints, users and IPs to list.')
+    @click.option('--max-keys', default=10000, help='Keys kept per table, the least counted are dropped beyond this.')
+    def stats(directory, since, bucket, top, max_keys):
+        """Requests per endpoint, user, IP and time bucket from the access log lines of all log files, including compressed segments."""
+        import os
+        from appPkg.main.logstats import accessStats
+
+        if not os.path.isdir(directory):
+            raise click.ClickException(f'No logs directory {directory}')
+
+        start = perf_counter()
+        result = accessStats(directory, since=since, bucketLength={'minute': 16, 'hour': 13, 'day': 10}[bucket],
+                             maxKeys=max_keys).report(top)
+        elapsed = perf_counter() - start
+
+        click.echo(f'{result["requests"]} requests ({result["errors"]} 5xx) in {result["files"]} files, '
+                   f'{result["bytesRead"] / 1e6:.1f} MB scanned in {elapsed:.2f}s '
+                   f'({result["bytesRead"] / 1e6 / max(elapsed, 1e-9):.0f} MB/s)')
+        for table, dropped in result['dropped'].items():
+            if dropped:
+                click.echo(f'{table} table pruned: {dropped} requests counted under dropped keys, raise --max-keys for exact counts')
+
+        click.echo(f'\n{"requests":>10} {"mean ms":>8}  endpoint')
+        for endpoint, count, meanTime in result['endpoints']:
+            click.echo(f'{count:>10} {"-" if meanTime is None else f"{meanTime:.1f}":>8}  {endpoint}')
+        for title, rows in (('user', result['users']), ('IP', result['ips']), (bucket, result['buckets'])):
+            click.echo(f'\n{"requests":>10}  {title}')
+            for key, count in rows:
+                click.echo(f'{count:>10}  {key}')
+
+    @app.cli.group()
+    def mail():
+        """Email delivery commands."""
+        pass
+
+    @mail.command()
+    @click.option('--count', default=1000, help='Number of messages to send.')
+    @click.option('--recipient', default='sink@localhost', help='Recipient address.')
+    def benchmark(count, recipient):
+        """Send many messages through the delivery queue and report throughput.
+        Point MAIL_SERVER/MAIL_PORT at a local SMTP sink, ie 'python -m smtpd -n -c DebuggingServer localhost:8025'."""
+        from appPkg.email import send_email, mailDelivery
+
+        start = perf_counter()
+        with app.app_context():
+            for i in range(count):
+                send_email(f'[StockPriceAlert] Benchmark {i}', sender=app.config['ADMINS'][0] or 'spa@localhost',
+                           recipients=[recipient], text_body='Benchmark', html_body='<p>Benchmark</p>')
+        mailDelivery.join()
+        elapsed = perf_counter() - start
+
+        stats = mailDelivery.stats()
+        click.echo(f'{stats["sent"]} sent, {stats["failed"]} failed, {stats["dropped"]} dropped in {elapsed:.2f}s '
+                   f'({count / elapsed:.0f} msg/s, {stats["batches"]} batches, {app.config["MAIL_WORKERS"]} workers)')
@@ -1,38 +1,238 @@
 """
 Description:
     - Email handling for registration, app errors, etc
-    - Run asynchronously via threading to allow main app thread to continue processing
+    - Messages are queued and sent in batches by drain tasks on the shared 'mail' task pool (see appPkg/main/executors.py),
+      so the main app thread continues processing
+    - Each batch is sent over one SMTP connection, opened for the batch and closed after it (sendMessages)
 """
 
+import logging
 from flask_mail import Message
 from appPkg import mail
-from threading import Thread
-from flask import current_app
+from appPkg.main.executors import executors, TaskRejected
+from queue import Queue, Empty, Full
+from threading import Lock
+from time import monotonic
 
-def send_async_email(app, msg):
+
+def sendMessages(messages, retries=0):
     """
-    Calls the Flask-Mail instance to email email via a separate thread
+    Send messages over one SMTP connection, opened for the batch ('with mail.connect()') and closed after it.
+    After a failed send the connection is re-opened for the rest of the batch and the message is retried
+    up to 'retries' times. Needs an app context.
 
     Parameters
     ----------
-    app : Flask instance
-        New thread needs access to Flask configuration
-        
-    msg : String
-        Email message containing subject, sender, recipient, and body data.
+    messages : list
+        Message instances.
+    retries : integer, optional
+        The default is 0.
 
     Returns
     -------
-    None.
+    list
+        None for each message sent, the exception of its last attempt for each message that failed, in message order.
+
+    """
 
+    results = [None] * len(messages)
+    attempts = [0] * len(messages)
+    position = 0
+    while position < len(messages):
+        connected = False
+        try:
+            with mail.connect() as connection:
+                connected = True
+                while position < len(messages):
+                    try:
+                        connection.send(messages[position])
+                    except Exception as e:
+                        results[position] = e
+                        attempts[position] += 1
+                        if attempts[position] > retries:
+                            position += 1
+                        break # The connection may be broken, re-open it for the rest of the batch
+                    results[position] = None
+                    position += 1
+        except Exception as e:
+            if not connected: # Server unreachable, the rest of the batch fails with it
+                results[position:] = [e] * (len(messages) - position)
+                break
+            # Otherwise closing a broken connection failed, nothing left to close
+
+    return results
+
+
+class MailDelivery(object):
+    """
+    Description:
+        Bounded queue of up to MAIL_QUEUE_SIZE messages, drained by at most MAIL_WORKERS tasks on the 'mail' pool.
+        Each drain task sends batches of up to MAIL_BATCH_SIZE messages and ends when the queue is empty,
+        so no SMTP connection is held open between bursts. Queued messages are sent at interpreter exit (pool drain).
     """
+    
+    def __init__(self):
+        self.pool = None
+        self.queueSize = 10000
+        self.workers = 4
+        self.batchSize = 50
+        self.enqueueTimeout = 5
+        self.resetAfterFork()
+        
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.startTime = None
         
-    with app.app_context():
-        mail.send(msg)
+    def init_app(self, app):
+        """
+        Delivery settings from the app config, same pattern as the Flask extensions. Needs executors.init_app first.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        self.pool = executors.pool('mail')
+        self.workers = app.config['MAIL_WORKERS']
+        self.batchSize = app.config['MAIL_BATCH_SIZE']
+        self.enqueueTimeout = app.config['MAIL_ENQUEUE_TIMEOUT']
+        with self.lock:
+            self.queueSize = app.config['MAIL_QUEUE_SIZE']
+            with self.queue.mutex: # Resized in place, messages already queued stay queued
+                self.queue.maxsize = self.queueSize
+        
+    def enqueue(self, msg):
+        """
+        Queue a message and make sure a drain task is running. Blocks up to MAIL_ENQUEUE_TIMEOUT seconds
+        when the queue is full (backpressure), then drops the message.
+        The drain task sends it in the caller's app context (Flask configuration).
+
+        Parameters
+        ----------
+        msg : Message instance
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        with self.lock:
+            if self.startTime is None:
+                self.startTime = monotonic()
+        
+        try:
+            self.queue.put(msg, timeout=self.enqueueTimeout)
+        except Full:
+            with self.lock:
+                self.dropped += 1
+            logging.getLogger(__name__).error(f'Mail queue full, dropped "{msg.subject}" to {msg.recipients}')
+            return
+        
+        with self.lock:
+            if self.draining >= self.workers: # The running drain tasks pick the message up
+                return
+            self.draining += 1
+        try:
+            self.pool.submit(self.drain)
+        except TaskRejected: # Only if the pool is sized below MAIL_WORKERS, a running drain task still empties the queue
+            with self.lock:
+                self.draining -= 1
+            logging.getLogger(__name__).error('Mail pool busy, drain task not started')
+            
+    def drain(self):
+        """
+        Pool task. Sends the queued messages in batches until the queue is empty.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        while True:
+            with self.lock:
+                # Checked under the lock enqueue takes after its put, so a message queued now either is seen here
+                # or sees this task gone and starts another one
+                if self.queue.empty():
+                    self.draining -= 1
+                    return
+            
+            batch = []
+            try:
+                while len(batch) < self.batchSize:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                pass
+            if not batch: # Taken by another drain task
+                continue
+            
+            try:
+                results = sendMessages(batch, retries=1)
+            except Exception as e: # ie no app context
+                results = [e] * len(batch)
+            for msg, error in zip(batch, results):
+                if error is not None:
+                    logging.getLogger(__name__).error(f'Failed to send "{msg.subject}" to {msg.recipients}: {error!r}')
+                self.queue.task_done()
+            
+            with self.lock:
+                self.batches += 1
+                self.failed += sum(1 for error in results if error is not None)
+                self.sent += sum(1 for error in results if error is None)
+                
+    def join(self):
+        # Wait until every queued message has been sent or failed
+        self.queue.join()
+        
+    def resetAfterFork(self):
+        """
+        Forget the parent process's lock, queued messages and drain tasks. The pool itself is reset by executors.resetAfterFork.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        self.lock = Lock()
+        self.queue = Queue(maxsize=self.queueSize)
+        self.draining = 0 # Drain tasks submitted and not finished
+        
+    def stats(self):
+        """
+        Returns
+        -------
+        dictionary
+            Queue depth, running drain tasks and delivery counters. perSecond is the average since the first message.
+
+        """
+        
+        with self.lock:
+            elapsed = monotonic() - self.startTime if self.startTime else 0
+            return {
+                'queueDepth': self.queue.qsize(),
+                'workers': self.draining,
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'perSecond': self.sent / elapsed if elapsed else 0.0
+            }
+
+
+mailDelivery = MailDelivery()
 
 def send_email(subject, sender, recipients, text_body, html_body):
     """
-    Sets up the msg parameter and initiates new thread
+    Sets up the msg parameter and puts it on the delivery queue
 
     Parameters
     ----------
@@ -56,5 +256,4 @@ def send_email(subject, sender, recipients, text_body, html_body):
     msg = Message(subject, sender=sender, recipients=recipients)
     msg.body = text_body
     msg.html = html_body
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
-    
+    mailDelivery.enqueue(msg)
@@ -0,0 +1,199 @@
+"""
+Description:
+    - In-memory index of 'IN PROGRESS' alert thresholds per stock symbol
+    - Rising and falling thresholds are kept sorted so a new price returns the crossed alerts with a bisect
+    - Only the process running the alert cycle keeps an index. It is loaded in full on the first cycle, then each cycle
+      only loads the alerts with IDs above the last one seen, plus a count and desiredPrice total of the live alerts as a
+      change marker. A marker that does not match the index (alerts deleted, edited or committed out of ID order by
+      another process) reconciles the index with a full load
+    - Stale thresholds between syncs are harmless: crossed alerts are re-checked as 'IN PROGRESS' by loadWithStockAndUser
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from math import fsum, isclose
+from threading import Lock
+from appPkg import db
+from appPkg.models import Stock, alertTracker
+
+
+class AlertIndex(object):
+    """
+    Description:
+        Two sorted lists of (desiredPrice, alertID) per symbol.
+        rising - user is checking for an increasing stock price, triggered when price >= desiredPrice
+        falling - user is checking for a falling stock price, triggered when price <= desiredPrice
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.rising = {}
+        self.falling = {}
+        self.entries = {} # alertID: (symbol, falling, desiredPrice)
+        self.desiredTotal = 0.0 # Sum of the indexed desiredPrice, compared with the DB's as the change marker
+        self.lastID = None # Highest alert ID loaded from the DB, None until the first (full) sync
+        self.fullSyncs = 0
+
+    @property
+    def loaded(self):
+        # True in the process running the alert cycle, after its first sync
+        return self.lastID is not None
+
+    def add(self, alertID, symbol, priceAtUserInput, desiredPrice):
+        """
+        Add an alert threshold to the index. Direction is decided once here instead of every check cycle.
+
+        Parameters
+        ----------
+        alertID : integer
+        symbol : string
+        priceAtUserInput : float
+        desiredPrice : float
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with self.lock:
+            if alertID in self.entries:
+                return
+
+            falling = alertTracker.getDirection(priceAtUserInput, desiredPrice) == 'FALLING'
+            side = self.falling if falling else self.rising
+            insort(side.setdefault(symbol, []), (desiredPrice, alertID))
+            self.entries[alertID] = (symbol, falling, desiredPrice)
+            self.desiredTotal += desiredPrice
+
+    def remove(self, alertID):
+        """
+        Remove an alert threshold from the index (alert deleted by the user or already triggered).
+
+        Parameters
+        ----------
+        alertID : integer
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with self.lock:
+            entry = self.entries.pop(alertID, None)
+            if entry is None:
+                return
+
+            symbol, falling, desiredPrice = entry
+            self.desiredTotal -= desiredPrice
+            side = self.falling if falling else self.rising
+            thresholds = side[symbol]
+            del thresholds[bisect_left(thresholds, (desiredPrice, alertID))]
+            if not thresholds:
+                del side[symbol]
+
+    def crossed(self, symbol, price):
+        """
+        Get the alerts whose threshold has been crossed by the price. O(log n + k)
+
+        Parameters
+        ----------
+        symbol : string
+        price : float
+            Current price of the stock symbol.
+
+        Returns
+        -------
+        list
+            Alert IDs that should be triggered.
+
+        """
+
+        with self.lock:
+            rising = self.rising.get(symbol, [])
+            falling = self.falling.get(symbol, [])
+
+            # rising: every desiredPrice <= price, falling: every desiredPrice >= price
+            risingIDs = [alertID for _, alertID in rising[:bisect_right(rising, (price, float('inf')))]]
+            fallingIDs = [alertID for _, alertID in falling[bisect_left(falling, (price, float('-inf'))):]]
+
+        return risingIDs + fallingIDs
+
+    def symbols(self):
+        """
+        Returns
+        -------
+        set
+            Stock symbols that have at least one alert in the index.
+
+        """
+
+        with self.lock:
+            return set(self.rising) | set(self.falling)
+
+    def sync(self):
+        """
+        Bring the index up to date with the 'IN PROGRESS' alerts in the DB, run at the start of every cycle.
+        The first sync loads every alert. Later syncs load the alerts above the last ID seen, then compare the live alerts'
+        count and desiredPrice total with the index, and only reload in full when they differ. Needs an app context.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.loaded:
+            self.fullSync()
+            return
+
+        rows = self.liveAlerts().filter(alertTracker.id > self.lastID).all()
+        for alertID, symbol, priceAtUserInput, desiredPrice in rows:
+            self.add(alertID, symbol, priceAtUserInput, desiredPrice)
+            self.lastID = max(self.lastID, alertID)
+
+        count, desiredTotal = db.session.query(db.func.count(alertTracker.id), db.func.sum(alertTracker.desiredPrice)) \
+            .filter(alertTracker.status == 'IN PROGRESS').one()
+        with self.lock:
+            # A mismatch only costs a full sync, so the float totals are compared tightly
+            changed = count != len(self.entries) or not isclose(desiredTotal or 0.0, self.desiredTotal, rel_tol=1e-12, abs_tol=1e-6)
+        if changed:
+            self.fullSync()
+
+    def fullSync(self):
+        """
+        Reconcile the index with every 'IN PROGRESS' alert in the DB. Alerts added, deleted, triggered or edited by
+        any process are added, removed or replaced, whatever order their IDs were committed in.
+        Only four columns are read, no ORM objects.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        live = {alertID: (symbol, priceAtUserInput, desiredPrice) for alertID, symbol, priceAtUserInput, desiredPrice in self.liveAlerts()}
+
+        with self.lock:
+            stale = [alertID for alertID, (symbol, falling, desiredPrice) in self.entries.items()
+                     if alertID not in live or live[alertID][0] != symbol or live[alertID][2] != desiredPrice
+                     or (alertTracker.getDirection(*live[alertID][1:]) == 'FALLING') != falling]
+        for alertID in stale:
+            self.remove(alertID)
+
+        for alertID, (symbol, priceAtUserInput, desiredPrice) in live.items():
+            self.add(alertID, symbol, priceAtUserInput, desiredPrice) # No-op for alerts already indexed
+
+        with self.lock:
+            self.desiredTotal = fsum(desiredPrice for symbol, falling, desiredPrice in self.entries.values()) # Drops the drift of the running sum
+            self.lastID = max(live, default=self.lastID or 0)
+            self.fullSyncs += 1
+
+    def liveAlerts(self):
+        # ID, symbol, priceAtUserInput and desiredPrice of the 'IN PROGRESS' alerts
+        return db.session.query(alertTracker.id, Stock.symbol, alertTracker.priceAtUserInput, alertTracker.desiredPrice) \
+            .join(Stock, alertTracker.stockID == Stock.id).filter(alertTracker.status == 'IN PROGRESS')
+
+
+# Process wide index used by the alert cycle
+alertIndex = AlertIndex()
@@ -0,0 +1,167 @@
+"""
+Description:
+    - Single-flight runner for the alert check cycle
+    - At most one cycle in flight per process. Ticks that arrive while a cycle runs are coalesced into one follow-up run
+    - Keeps the last cycle's start time, duration and outcome, also recorded in the cycleStatus table so
+      'flask shell' in a web container sees the cycle that ran in the worker process
+"""
+
+import logging
+import os
+import socket
+from threading import Lock
+from datetime import datetime
+from time import perf_counter
+from flask import has_app_context
+from appPkg import db
+from appPkg.models import cycleStatus
+from appPkg.main.executors import executors, TaskRejected
+
+
+class CycleRunner(object):
+    """
+    Description:
+        Runs func(app) on the 'alerts' executor pool, never more than one at a time.
+    """
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.lock = Lock()
+        self.running = False
+        self.pending = False # A tick was skipped while a cycle was in flight
+        self.overruns = 0 # Number of ticks that arrived while a cycle was still running
+
+        self.lastStart = None
+        self.lastDuration = None # Seconds
+        self.lastOutcome = None # 'OK' or the exception raised
+        self.lastOverran = False # True if the last finished cycle was still running when the next tick arrived
+        self.currentOverran = False
+
+    def trigger(self, app):
+        """
+        Start a cycle, or mark a follow-up run if one is already in flight.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        boolean
+            True if a new cycle was submitted.
+
+        """
+
+        with self.lock:
+            if self.running:
+                self.pending = True
+                self.overruns += 1
+                self.currentOverran = True
+                logging.getLogger(__name__).info(f'{self.name} cycle overran, follow-up run queued')
+                return False
+            self.running = True
+
+        try:
+            executors.submit('alerts', self.run, app)
+        except TaskRejected:
+            with self.lock:
+                self.running = False
+            logging.getLogger(__name__).error(f'{self.name} cycle rejected, alerts pool busy')
+            return False
+        return True
+
+    def run(self, app):
+        """
+        Run cycles until there is no coalesced follow-up left.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        None.
+
+        """
+
+        while True:
+            with self.lock:
+                self.pending = False
+                self.currentOverran = False
+                self.lastStart = datetime.utcnow()
+            self.persist(app)
+
+            start = perf_counter()
+            try:
+                self.func(app)
+                outcome = 'OK'
+            except Exception as e:
+                logging.getLogger(__name__).exception(f'{self.name} cycle failed')
+                outcome = repr(e)
+
+            with self.lock:
+                self.lastDuration = perf_counter() - start
+                self.lastOutcome = outcome
+                self.lastOverran = self.currentOverran
+                finished = not self.pending
+                if finished:
+                    self.running = False
+            self.persist(app)
+            if finished:
+                return
+
+    def persist(self, app):
+        """
+        Record this process's status in the cycleStatus table. A failed write is logged, it never fails the cycle.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        None.
+
+        """
+
+        try:
+            with app.app_context():
+                db.session.merge(cycleStatus(name=self.name, updatedTime=datetime.utcnow(), **self.localStatus()))
+                db.session.commit()
+        except Exception:
+            logging.getLogger(__name__).exception(f'Could not record the {self.name} cycle status')
+
+    def localStatus(self):
+        with self.lock:
+            return {
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'running': self.running,
+                'lastStart': self.lastStart,
+                'lastDuration': self.lastDuration,
+                'lastOutcome': self.lastOutcome[:300] if self.lastOutcome else None,
+                'lastOverran': self.lastOverran,
+                'overruns': self.overruns
+            }
+
+    def status(self):
+        """
+        Status of this process's last cycle. In a process that has not run one (web workers, 'flask shell'),
+        the status last recorded by the process running the cycles, if there is an app context.
+
+        Returns
+        -------
+        dictionary
+            Host and pid of the process, last cycle's start time, duration, outcome and overrun information.
+
+        """
+
+        status = self.localStatus()
+        if status['lastStart'] is not None or not has_app_context():
+            return status
+
+        row = cycleStatus.query.get(self.name)
+        if row is None:
+            return status
+        return {key: getattr(row, key) for key in status}
@@ -0,0 +1,100 @@
+"""
+Description:
+    - Per-user digest of triggered alerts (ALERT_DIGEST)
+    - The check cycle writes unrendered 'DIGEST' outbox rows, one per triggered alert
+    - Once a user's oldest 'DIGEST' row is ALERT_DIGEST_WINDOW seconds old, all of the user's rows are rendered
+      into one email, queued as a 'PENDING' outbox row and marked 'DIGESTED' in the same transaction
+"""
+
+from datetime import datetime, timedelta
+from flask import render_template
+from appPkg import db
+from appPkg.models import alertTracker, notificationOutbox
+
+
+def buildDigests(config):
+    """
+    Coalesce the due 'DIGEST' outbox rows into one 'PENDING' email per user. Needs an app context.
+    PostgreSQL: rows locked by another dispatcher are skipped (FOR UPDATE SKIP LOCKED),
+    others: a digest is abandoned if another dispatcher took its rows first.
+
+    Parameters
+    ----------
+    config : Flask config
+
+    Returns
+    -------
+    integer
+        Number of digest emails queued.
+
+    """
+
+    cutoff = datetime.utcnow() - timedelta(seconds=config['ALERT_DIGEST_WINDOW'])
+    recipients = [row.recipient for row in db.session.query(notificationOutbox.recipient)
+                  .filter(notificationOutbox.status == 'DIGEST')
+                  .group_by(notificationOutbox.recipient)
+                  .having(db.func.min(notificationOutbox.createdTime) <= cutoff).all()]
+    db.session.commit()
+
+    queued = 0
+    for recipient in recipients:
+        rows = notificationOutbox.query.filter_by(status='DIGEST', recipient=recipient) \
+            .order_by(notificationOutbox.id).with_for_update(skip_locked=True).all()
+        rowIDs = [row.id for row in rows]
+        if not rowIDs:
+            db.session.commit()
+            continue
+
+        # Alerts deleted by the user since they triggered are left out
+        alerts = alertTracker.loadWithStockAndUser([row.alertID for row in rows if row.alertID], status=None)
+        alerts.sort(key=lambda alert: alert.stock.symbol if alert.stock else '')
+        triggerPrices = {row.alertID: row.triggerPrice for row in rows}
+        triggered = [(alert, triggerPrices.get(alert.id) if triggerPrices.get(alert.id) is not None else alert.stock.lastPrice)
+                     for alert in alerts] # Rows queued before the triggerPrice column show the stored price
+
+        claimed = notificationOutbox.query.filter(notificationOutbox.id.in_(rowIDs), notificationOutbox.status == 'DIGEST') \
+            .update({'status': 'DIGESTED'}, synchronize_session=False)
+        if claimed != len(rowIDs): # Another dispatcher built this digest
+            db.session.rollback()
+            continue
+
+        if triggered:
+            queueDigest(rows[0].sender, recipient, triggered)
+            queued += 1
+        db.session.commit()
+
+    return queued
+
+
+def queueDigest(sender, recipient, triggered):
+    """
+    Render the digest and add it to the outbox. A single alert uses the regular alert notification.
+
+    Parameters
+    ----------
+    sender : string
+    recipient : string
+    triggered : list
+        (alertTracker instance, trigger price) of one user's triggered alerts, with their stock and user loaded.
+
+    Returns
+    -------
+    None.
+
+    """
+
+    user = triggered[0][0].user
+    if len(triggered) == 1:
+        alert, triggerPrice = triggered[0]
+        subject = '[StockPriceAlert] Alert Notification'
+        textBody = render_template('email/alert_notification.txt', user=user, stock=alert.stock, alert=alert, triggerPrice=triggerPrice)
+        htmlBody = render_template('email/alert_notification.html', user=user, stock=alert.stock, alert=alert, triggerPrice=triggerPrice)
+    else:
+        subject = f'[StockPriceAlert] {len(triggered)} Alerts Triggered'
+        textBody = render_template('email/alert_digest.txt', user=user, alerts=triggered)
+        htmlBody = render_template('email/alert_digest.html', user=user, alerts=triggered)
+
+    now = datetime.utcnow()
+    db.session.add(notificationOutbox(sender=sender, recipient=recipient, subject=subject, textBody=textBody,
+                                      htmlBody=htmlBody, status='PENDING', attempts=0, nextAttemptTime=now,
+                                      createdTime=now))
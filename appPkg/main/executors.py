@@ -0,0 +1,341 @@
+"""
+Description:
+    - Shared background task pools (EXECUTOR_POOLS), replacing the threads started per task
+    - Each named pool has a fixed cap on worker threads and on queued tasks. Threads start on demand and are reused
+    - A full queue either blocks the submitter for a while (backpressure), rejects the task, or runs it in the submitting thread
+    - Every task runs in its own app context, so its DB session is removed and its connection returned when the task ends
+    - Per pool metrics: queue depth, active workers, wait and run time. 'flask shell' >>> executors.stats()
+    - Queued and running tasks are finished at interpreter exit
+"""
+
+import atexit
+import logging
+from concurrent.futures import Future
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+from time import monotonic
+from flask import current_app, has_app_context
+
+
+class TaskRejected(Exception):
+    """
+    Description:
+        Raised by submit when the pool's queue is full and the task was not accepted.
+    """
+
+
+class BoundedPool(object):
+    """
+    Description:
+        Up to 'workers' threads draining a queue of at most 'queueSize' tasks. Policy when the queue is full:
+        'block' waits up to 'timeout' seconds for room then rejects, 'reject' rejects right away,
+        'caller' runs the task in the submitting thread.
+    """
+
+    policies = ('block', 'reject', 'caller')
+
+    def __init__(self, name, workers, queueSize, policy='block', timeout=5, idleTimeout=60):
+        if policy not in self.policies:
+            raise ValueError(f'Unknown executor policy {policy} for pool {name}')
+        self.name = name
+        self.workers = workers
+        self.queueSize = queueSize
+        self.policy = policy
+        self.timeout = timeout
+        self.idleTimeout = idleTimeout # Seconds without a task before onIdle is called in the worker thread
+        self.onIdle = None # ie close a connection kept by the thread
+        self.app = None # Context for tasks submitted outside of an app context
+        self.drainAtExit = False
+        self.reset()
+
+    def reset(self):
+        self.lock = Lock()
+        self.queue = Queue(maxsize=self.queueSize)
+        self.threads = []
+        self.idle = 0
+        self.active = 0
+
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.callerRuns = 0
+        self.waitTime = 0.0 # Seconds queued, summed over the started tasks
+        self.maxWaitTime = 0.0
+        self.runTime = 0.0 # Seconds running, summed over the finished tasks
+
+    def configure(self, workers, queueSize, policy, timeout):
+        """
+        Take new limits in place, so the pool object held by other modules (ie mailDelivery.pool) stays the one in use.
+        Threads already started keep running, queued tasks stay queued.
+
+        Parameters
+        ----------
+        workers : integer
+        queueSize : integer
+        policy : string
+        timeout : float
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if policy not in self.policies:
+            raise ValueError(f'Unknown executor policy {policy} for pool {self.name}')
+        with self.lock:
+            self.workers = workers
+            self.policy = policy
+            self.timeout = timeout
+            self.queueSize = queueSize
+            with self.queue.mutex:
+                self.queue.maxsize = queueSize
+                self.queue.not_full.notify_all() # Submitters blocked on a full queue recheck the new size
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run in one of the pool's threads.
+
+        Parameters
+        ----------
+        fn : callable
+
+        Returns
+        -------
+        Future instance
+            Result or exception of the task.
+
+        Raises
+        ------
+        TaskRejected
+            The queue is full ('reject', or 'block' after the timeout).
+
+        """
+
+        app = current_app._get_current_object() if has_app_context() else self.app
+        task = (fn, args, kwargs, Future(), app, monotonic())
+
+        with self.lock:
+            self.submitted += 1
+            if len(self.threads) < self.workers and self.queue.qsize() >= self.idle: # No idle thread left for this task
+                if not self.drainAtExit:
+                    # Registered after the log pipeline (atexit runs last in, first out), so tasks still log while draining
+                    atexit.register(self.shutdown)
+                    self.drainAtExit = True
+                thread = Thread(target=self.work, name=f'{self.name}-{len(self.threads)}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+                self.idle += 1
+
+        try:
+            if self.policy == 'block':
+                self.queue.put(task, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(task)
+        except Full:
+            with self.lock:
+                if self.policy != 'caller':
+                    self.rejected += 1
+                    raise TaskRejected(f'{self.name} pool queue full ({self.queueSize} tasks)')
+                self.callerRuns += 1
+            self.run(task) # Backpressure: the submitter does the work itself
+        return task[3]
+
+    def run(self, task):
+        # Run one task in an app context and record its outcome
+        fn, args, kwargs, future, app, submitTime = task
+        if not future.set_running_or_notify_cancel():
+            return
+
+        start = monotonic()
+        with self.lock:
+            self.started += 1
+            self.waitTime += start - submitTime
+            self.maxWaitTime = max(self.maxWaitTime, start - submitTime)
+        try:
+            if app is None or (has_app_context() and current_app._get_current_object() is app):
+                # Run by the submitter ('caller'), its context stays, a nested one would remove its DB session on teardown
+                result = fn(*args, **kwargs)
+            else:
+                with app.app_context():
+                    result = fn(*args, **kwargs)
+        except BaseException as e:
+            logging.getLogger(__name__).exception(f'{self.name} task {getattr(fn, "__name__", fn)} failed')
+            future.set_exception(e)
+            failed = 1
+        else:
+            future.set_result(result)
+            failed = 0
+
+        with self.lock:
+            self.runTime += monotonic() - start
+            self.completed += 1
+            self.failed += failed
+
+    def work(self):
+        """
+        Worker thread. Runs queued tasks until a None task (shutdown), calling onIdle after idleTimeout seconds without work.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        while True:
+            try:
+                task = self.queue.get(timeout=self.idleTimeout)
+            except Empty:
+                if self.onIdle is not None:
+                    try:
+                        self.onIdle()
+                    except Exception: # The thread keeps serving the pool
+                        logging.getLogger(__name__).exception(f'{self.name} pool idle callback failed')
+                continue
+
+            if task is None:
+                self.queue.task_done()
+                return
+
+            with self.lock:
+                self.idle -= 1
+                self.active += 1
+            try:
+                self.run(task)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self.idle += 1
+                self.queue.task_done()
+
+    def join(self):
+        # Wait until every queued task has run
+        self.queue.join()
+
+    def shutdown(self):
+        """
+        Let the queued tasks finish, then stop the worker threads.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with self.lock:
+            threads = list(self.threads)
+        for thread in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+        with self.lock:
+            self.threads = []
+            self.idle = 0
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dictionary
+            Queue depth, thread counts, task counters, mean/max seconds the started tasks waited in the queue
+            and mean seconds the finished tasks ran.
+
+        """
+
+        with self.lock:
+            return {
+                'queueDepth': self.queue.qsize(),
+                'threads': len(self.threads),
+                'active': self.active,
+                'submitted': self.submitted,
+                'started': self.started,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'callerRuns': self.callerRuns,
+                'meanWait': self.waitTime / (self.started or 1),
+                'maxWait': self.maxWaitTime,
+                'meanRun': self.runTime / (self.completed or 1)
+            }
+
+
+class Executors(object):
+    """
+    Description:
+        Named BoundedPool instances built from EXECUTOR_POOLS, same pattern as the Flask extensions.
+    """
+
+    def __init__(self):
+        self.pools = {}
+
+    def init_app(self, app):
+        """
+        Create the pools from EXECUTOR_POOLS: name: (workers, queue size, policy, block timeout).
+        Pools that already exist are updated in place, they keep their threads and queued tasks.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        None.
+
+        """
+
+        for name, (workers, queueSize, policy, timeout) in app.config['EXECUTOR_POOLS'].items():
+            pool = self.pools.get(name)
+            if pool is None:
+                pool = self.pools[name] = BoundedPool(name, workers, queueSize, policy, timeout)
+            else:
+                pool.configure(workers, queueSize, policy, timeout)
+            pool.app = app
+
+    def pool(self, name):
+        return self.pools[name]
+
+    def submit(self, name, fn, *args, **kwargs):
+        """
+        Submit fn(*args, **kwargs) to the named pool. See BoundedPool.submit.
+
+        Returns
+        -------
+        Future instance
+
+        """
+
+        return self.pools[name].submit(fn, *args, **kwargs)
+
+    def resetAfterFork(self):
+        """
+        Forget the parent process's threads and queued tasks (threads do not survive a fork).
+        Threads are started again on the first task.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        for pool in self.pools.values():
+            pool.reset()
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dictionary
+            Pool name: pool stats.
+
+        """
+
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+executors = Executors()
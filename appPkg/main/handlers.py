@@ -4,18 +4,67 @@ Description:
     - Scheduler runs here to email users if their alert has been triggered.
     - Send issue emails when YahooFinance fails to retrieve stock data
 """
+import logging
 from appPkg import db
 from flask import render_template, current_app
 from appPkg.email import send_email
-from appPkg.models import User, Stock, alertTracker
-from threading import Thread
+from appPkg.models import Stock, alertTracker
+from appPkg.main.alertindex import alertIndex
+from appPkg.main.cycles import CycleRunner
+from appPkg.main.quotes import getQuoteProvider
+from appPkg.main.writer import CycleWriter
+from appPkg.main.pricecache import priceCache
+from appPkg.main.resilience import DedupWindow
+from appPkg.main.outbox import dispatchOutbox
+from appPkg.main.executors import executors, TaskRejected
 from datetime import datetime, timedelta
-from yahoofinancials import YahooFinancials
+from threading import Lock
     
     
+def priceIsStale(stock):
+    """
+    Check if the stock's last update time is greater than the defined frequency
+
+    Parameters
+    ----------
+    stock : stock instance
+
+    Returns
+    -------
+    boolean
+        True if the stored price needs to be refreshed from YahooFinance.
+
+    """
+    
+    if stock.lastUpdateTime is None:
+        return True
+    return (datetime.utcnow() - stock.lastUpdateTime) > timedelta(minutes=current_app.config['PRICE_CHECK_FREQUENCY'])
+
+
+def canServeStale(stock):
+    """
+    Check if a stale price is still recent enough to show while it is refreshed in the background
+
+    Parameters
+    ----------
+    stock : stock instance
+
+    Returns
+    -------
+    boolean
+        True if serve-stale is enabled and the stored price is within PRICE_HARD_STALENESS.
+
+    """
+    
+    if not current_app.config['SERVE_STALE_PRICES'] or not stock.lastPrice or stock.lastUpdateTime is None:
+        return False
+    return (datetime.utcnow() - stock.lastUpdateTime) <= timedelta(minutes=current_app.config['PRICE_HARD_STALENESS'])
+
+
 def tickerInfo(symbol):
     """
-    Query YahooFinance for current stock ticker price
+    Current stock ticker price through the process-local price cache.
+    Concurrent requests for the same cold symbol share one lookup.
 
     Parameters
     ----------
@@ -29,28 +78,207 @@ def tickerInfo(symbol):
 
     """
     
+    return priceCache.get(symbol, lambda: loadTickerInfo(symbol))
+
+
+def priceFreshFor(updateTime):
+    """
+    Seconds a price stays fresh, so a cached price expires when the stored one goes stale
+    (PRICE_CHECK_FREQUENCY after its update, not after it was cached).
+
+    Parameters
+    ----------
+    updateTime : datetime
+        Last update time of the price.
+
+    Returns
+    -------
+    float
+        Seconds left before the price is stale, 0 if it already is.
+
+    """
+    
+    if updateTime is None:
+        return 0
+    staleTime = updateTime + timedelta(minutes=current_app.config['PRICE_CHECK_FREQUENCY'])
+    return max(0, (staleTime - datetime.utcnow()).total_seconds())
+
+
+def loadTickerInfo(symbol):
+    """
+    Query the quote provider (YahooFinance) for current stock ticker price
+
+    Parameters
+    ----------
+    symbol : string
+        Stock symbol/ticker.
+
+    Returns
+    -------
+    tuple
+        Current price of the stock symbol and the seconds it stays fresh (0 for a served-stale price, so it is not cached).
+
+    """
+    
     stock = Stock.query.filter_by(symbol=symbol).first()
 
     # Query Y.F. if the stock's last update time is greater than the defined frequency
-    if (datetime.utcnow() - stock.lastUpdateTime) > timedelta(minutes=current_app.config['PRICE_CHECK_FREQUENCY']):
-        price = YahooFinancials(symbol).get_current_price() # This can take upto 5 seconds per call
+    if priceIsStale(stock):
         
-        # Check if Y.F returns valid data
-        if not price:
-            sendIssueEmail(stock)
-            return None
+        # Serve the stored price immediately and refresh it in the background. Only truly stale or unknown symbols block
+        if canServeStale(stock):
+            refreshTickerInBackground(symbol)
+            return stock.lastPrice, 0
         
-        # Update the stock DB table
-        stock.lastPrice = price
-        stock.lastUpdateTime = datetime.utcnow() 
-        db.session.commit()
+        return fetchTickerInfo(stock), priceFreshFor(stock.lastUpdateTime)
+
+    return stock.lastPrice, priceFreshFor(stock.lastUpdateTime)
+
+
+def fetchTickerInfo(stock):
+    """
+    Query the quote provider for the stock's current price and update the stock DB table
+
+    Parameters
+    ----------
+    stock : stock instance
+
+    Returns
+    -------
+    integer
+        Current price of the stock symbol, None if YahooFinance has no valid data.
+
+    """
+    
+    price = getQuoteProvider().getPrice(stock.symbol)
+    
+    # Check if Y.F returns valid data
+    if not price:
+        sendIssueEmail(stock)
+        return None
+    
+    # Update the stock DB table
+    stock.lastPrice = price
+    stock.lastUpdateTime = datetime.utcnow() 
+    db.session.commit()
+    
+    return price
+
+
+refreshingSymbols = set() # Symbols with a background refresh in progress
+refreshingSymbolsLock = Lock()
+
+def refreshTickerInBackground(symbol):
+    """
+    Start a background refresh of the symbol's price on the 'refresh' executor pool, unless one is already running
+
+    Parameters
+    ----------
+    symbol : string
+        Stock symbol/ticker.
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    with refreshingSymbolsLock:
+        if symbol in refreshingSymbols:
+            return
+        refreshingSymbols.add(symbol)
+    
+    try:
+        executors.submit('refresh', async_refreshTicker, current_app._get_current_object(), symbol)
+    except TaskRejected: # Pool busy, the stale price is served and the next request tries again
+        with refreshingSymbolsLock:
+            refreshingSymbols.discard(symbol)
 
-    return stock.lastPrice
 
+def async_refreshTicker(app, symbol):
+    """
+    Background half of serve-stale. Fetch the price and replace the stale one in the price cache.
+
+    Parameters
+    ----------
+    app : Flask instance
+    symbol : string
+        Stock symbol/ticker.
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    try:
+        with app.app_context():
+            stock = Stock.query.filter_by(symbol=symbol).first()
+            if priceIsStale(stock): # Another process may have refreshed it already
+                price = fetchTickerInfo(stock)
+            else:
+                price = stock.lastPrice
+            if price:
+                priceCache.put(symbol, price, priceFreshFor(stock.lastUpdateTime))
+    finally:
+        with refreshingSymbolsLock:
+            refreshingSymbols.discard(symbol)
+
+
+def refreshPrices(stocks, writer):
+    """
+    Query the quote provider for the current price of several stocks at once.
+    Only stale stocks are fetched, in batches of PRICE_BATCH_SIZE,
+    so a check cycle costs one lookup per batch instead of one per alert.
+
+    Parameters
+    ----------
+    stocks : list
+        Distinct stock instances that have live alerts.
+    writer : CycleWriter instance
+        Collects the price updates, written when the cycle flushes.
+
+    Returns
+    -------
+    prices : dictionary
+        Stock symbol to current price. None if YahooFinance has no valid data for the symbol.
+
+    """
+    
+    prices = {stock.symbol: stock.lastPrice for stock in stocks}
+    staleStocks = [stock for stock in stocks if priceIsStale(stock)]
+    batchSize = current_app.config['PRICE_BATCH_SIZE']
+    
+    for i in range(0, len(staleStocks), batchSize):
+        batch = staleStocks[i:i + batchSize]
+        
+        # Fetched as one multi-symbol request, or one request per symbol on the concurrent providers
+        batchPrices = getQuoteProvider().getPrices([stock.symbol for stock in batch])
+        
+        for stock in batch:
+            price = batchPrices.get(stock.symbol)
+            
+            # Check if Y.F returns valid data
+            if not price:
+                sendIssueEmail(stock)
+                prices[stock.symbol] = None
+                continue
+            
+            # Update the stock DB table on the writer's next flush
+            updateTime = datetime.utcnow()
+            writer.updatePrice(stock, price, updateTime)
+            priceCache.put(stock.symbol, price, priceFreshFor(updateTime))
+            prices[stock.symbol] = price
+
+    return prices
+
+
+issueEmails = DedupWindow() # Symbols recently emailed to the admin
 
 def sendIssueEmail(stock):
     """
-    Use this when Yahoo Finance does not return valid data for a stock in the DB
+    Use this when Yahoo Finance does not return valid data for a stock in the DB.
+    Sent at most once per symbol per ISSUE_EMAIL_WINDOW so an outage does not cause an email storm.
 
     Parameters
     ----------
@@ -61,7 +289,10 @@ def sendIssueEmail(stock):
     None.
     """
     
-    print('Sending issue email')
+    if not issueEmails.allow(stock.symbol, current_app.config['ISSUE_EMAIL_WINDOW'] * 60):
+        return
+    
+    logging.getLogger(__name__).warning(f'Sending issue email for {stock.symbol}')
     send_email('[StockPriceAlert] Issue with YahooFinance',
                sender=current_app.config['ADMINS'][0],
                recipients=[current_app.config['ADMINS'][0]],
@@ -70,15 +301,19 @@ def sendIssueEmail(stock):
                html_body=render_template('email/issue_with_stock.html',
                                          stock=stock))
     
-def sendAlertEmail(alert, stock, user):
+def queueAlertEmail(alert, stock, user, writer):
     """
-    Send an email to the user indicating their alert has been triggered.
+    Queue an email to the user indicating their alert has been triggered.
+    The email goes into the notification outbox in the same transaction as the alert status change,
+    the outbox dispatcher sends it after the commit. In digest mode (ALERT_DIGEST) the alert is only recorded
+    and the dispatcher sends one email per user listing all of their alerts triggered within ALERT_DIGEST_WINDOW.
 
     Parameters
     ----------
     alert : alert instance
     stock : stock instance
     user : user instance
+    writer : CycleWriter instance
 
     Returns
     -------
@@ -86,19 +321,23 @@ def sendAlertEmail(alert, stock, user):
 
     """
     
-    print('Sending alert email')
-    alert.status = 'ALERT TRIGGERED' # Update alert in the DB as its now processed
-    db.session.commit()
-
-    send_email('[StockPriceAlert] Alert Notification',
-               sender=current_app.config['ADMINS'][0],
-               recipients=[user.email],
-               text_body=render_template('email/alert_notification.txt',
-                                         user=user, stock=stock, 
-                                         alert=alert),
-               html_body=render_template('email/alert_notification.html',
-                                         user=user, stock=stock, 
-                                         alert=alert))
+    triggerPrice = stock.lastPrice # This cycle's price, the email shows it rather than the price at send time
+    if current_app.config['ALERT_DIGEST']: # Rendered later, together with the user's other triggered alerts
+        writer.addNotification(alert.id, sender=current_app.config['ADMINS'][0], recipient=user.email,
+                               subject=None, textBody=None, htmlBody=None, status='DIGEST', triggerPrice=triggerPrice)
+        return
+    
+    writer.addNotification(alert.id, 
+                           sender=current_app.config['ADMINS'][0],
+                           recipient=user.email,
+                           subject='[StockPriceAlert] Alert Notification',
+                           textBody=render_template('email/alert_notification.txt',
+                                                    user=user, stock=stock, 
+                                                    alert=alert, triggerPrice=triggerPrice),
+                           htmlBody=render_template('email/alert_notification.html',
+                                                    user=user, stock=stock, 
+                                                    alert=alert, triggerPrice=triggerPrice),
+                           triggerPrice=triggerPrice)
 
     
 def async_checkAlerts(app):
@@ -116,24 +355,76 @@ def async_checkAlerts(app):
     """
     
     with app.app_context():
-        inProgressAlerts = alertTracker.query.filter_by(status='IN PROGRESS').all()
-        for alert in inProgressAlerts:
+        mode = current_app.config['ALERT_EVALUATION_MODE']
+        writer = CycleWriter(current_app.config['WRITE_FLUSH_SIZE']) # Price, status and outbox writes in one transaction
+        
+        if mode == 'index':
+            # Load the alerts added since the last cycle, the index reloads in full only when its change marker does not match
+            alertIndex.sync()
+            
+            # Plan the cycle: gather the distinct stocks with live alerts and fetch their prices in batches before evaluating
+            stocks = Stock.query.filter(Stock.symbol.in_(alertIndex.symbols())).all()
+            prices = refreshPrices(stocks, writer)
+            
+            # Bisect each symbol's rising/falling thresholds for the alerts crossed by the new price
+            crossedIDs = []
+            for symbol, price in prices.items():
+                if price: # Prevents execution if stock symbol is not available on YahooFinance
+                    crossedIDs.extend(alertIndex.crossed(symbol, price))
+            
+            # Only the crossed alerts are loaded, along with their stock and user, in one joined query.
+            # Alerts deleted by the user in another process are no longer 'IN PROGRESS' and are dropped here.
+            triggeredAlerts = alertTracker.loadWithStockAndUser(crossedIDs) if crossedIDs else []
+            
+        else:
+            # Plan the cycle: gather the distinct stocks with live alerts and fetch their prices in batches before evaluating
+            stocks = Stock.query.join(alertTracker).filter(alertTracker.status == 'IN PROGRESS').distinct().all()
+            prices = refreshPrices(stocks, writer)
+            
+            # Stocks without a valid price this cycle are not evaluated
+            stockPrices = {stock.id: prices[stock.symbol] for stock in stocks if prices.get(stock.symbol)}
             
-            # Get the stock and user data based off the Alert table.
-            stock = Stock.query.filter_by(id=alert.stockID).first()
-            user = User.query.filter_by(id=alert.userID).first()
-
-            # Update stock prices if needed
-            price = tickerInfo(stock.symbol)
-
-            if price and alert: # Prevents execution if stock symbol is not available on YahooFinance, or alert deleted in DB by user in main thread (race condition)
-                # Check if any alerts should be triggered and send notification email to user
-                if alert.priceAtUserInput - alert.desiredPrice >= 0: # User is checking for falling stock price
-                    if stock.lastPrice <= alert.desiredPrice: # Check if current stock price has fallen to or below alert price
-                        sendAlertEmail(alert, stock, user)
-                elif alert.priceAtUserInput - alert.desiredPrice < 0: # User is checking for increasing stock price
-                    if stock.lastPrice >= alert.desiredPrice: # Check if current stock price has increased to or above alert price
-                        sendAlertEmail(alert, stock, user)
+            if mode == 'database':
+                # The database selects and flips the triggered alerts in one statement, so prices are written first.
+                # Nothing is committed until the outbox rows are written below.
+                writer.flush()
+                crossedIDs = alertTracker.triggerInDatabase(list(stockPrices))
+                triggeredAlerts = alertTracker.loadWithStockAndUser(crossedIDs, status=None) if crossedIDs else []
+                
+            elif mode == 'sharded':
+                # Alerts partitioned by stockID across the process pool, each shard returns its triggered alert IDs
+                from appPkg.main.sharding import evaluateSharded # Evaluation engines imported on first use (NumPy, multiprocessing)
+                crossedIDs = evaluateSharded(stockPrices)
+                triggeredAlerts = alertTracker.loadWithStockAndUser(crossedIDs) if crossedIDs else []
+                
+            elif mode == 'vectorized':
+                # Alert columns loaded into arrays, prices gathered by stockID and compared in one vectorized step
+                from appPkg.main.vectorized import VectorizedAlertEngine
+                crossedIDs = VectorizedAlertEngine.load().evaluate(stockPrices)
+                triggeredAlerts = alertTracker.loadWithStockAndUser(crossedIDs) if crossedIDs else []
+                
+            else:
+                raise ValueError(f'Unknown ALERT_EVALUATION_MODE {mode}')
+            
+        # Update alerts in the DB as they are now processed and queue their notification emails in the same transaction,
+        # so a crash can neither lose the email of a triggered alert nor email an alert that was not flipped
+        for alert in triggeredAlerts:
+            if alert.status != 'ALERT TRIGGERED': # Already flipped in 'database' mode
+                writer.updateStatus(alert, 'ALERT TRIGGERED')
+            queueAlertEmail(alert, alert.stock, alert.user, writer)
+        writer.flush()
+        db.session.commit()
+        
+        for alertID in crossedIDs:
+            alertIndex.remove(alertID)
+        
+        # Send this cycle's notifications right away rather than waiting for the dispatcher job, on the 'outbox' pool
+        # so a slow mail server does not hold up the next cycle
+        if triggeredAlerts:
+            try:
+                executors.submit('outbox', dispatchOutbox, app)
+            except TaskRejected: # A dispatch is already queued, it claims this cycle's rows too
+                pass
                     
     
 def checkAlerts(app):
@@ -153,6 +444,9 @@ def checkAlerts(app):
         
         # Only trigger if there are any alerts 'IN PROGRESS' 
         if alertTracker.query.filter_by(status='IN PROGRESS').count() > 0:
-            Thread(target=async_checkAlerts, args=[current_app._get_current_object()]).start()
-        
-        
+            alertCycle.trigger(current_app._get_current_object()) # At most one cycle in flight, overlapping ticks coalesced
+
+
+# Single-flight runner for async_checkAlerts. alertCycle.status() has the last cycle's start, duration and outcome,
+# read from the cycleStatus table in processes that do not run the cycle
+alertCycle = CycleRunner('checkAlerts', async_checkAlerts)
@@ -0,0 +1,173 @@
+"""
+Description:
+    - Leader election for the APScheduler jobs so only one process per deployment runs each job
+    - PostgreSQL: session level advisory lock held on a dedicated connection
+    - Other databases (SQLite for local testing): non-blocking file lock
+    - Host scoped jobs (log shipping) lock a file in the directory they work on instead, so one process per host
+      (or per shared volume) runs them whatever the database
+    - The lock is released by the database/OS when the leader process dies, and the next process to run the job takes over
+"""
+
+import os
+import logging
+import tempfile
+from threading import Lock
+from zlib import crc32
+from appPkg import db
+
+try:
+    import fcntl
+except ImportError: # Windows - no file locking, every process is the leader
+    fcntl = None
+
+
+class LeaderLock(object):
+    """
+    Description:
+        Lock for a single scheduler job. acquire() is called before every run and is cheap once held.
+        With lockDir the lock is a file lock in that directory, shared only by the processes that see the directory.
+    """
+
+    def __init__(self, name, lockDir=None):
+        self.name = name
+        self.lockDir = lockDir # Host scope
+        self.key = crc32(name.encode('utf-8')) # Advisory lock key
+        self.connection = None # PostgreSQL connection holding the advisory lock
+        self.lockFile = None # Open file holding the file lock
+
+    def acquire(self, app):
+        """
+        Try to become (or confirm being) the leader for this job. Needs an app context.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        boolean
+            True if this process holds the lock and should run the job.
+
+        """
+
+        if self.lockDir is None and db.engine.dialect.name == 'postgresql':
+            return self.acquireAdvisoryLock()
+        return self.acquireFileLock(app)
+
+    def acquireAdvisoryLock(self):
+        """
+        Hold pg_try_advisory_lock on a dedicated connection. If that connection is lost, the lock is lost with it.
+
+        Returns
+        -------
+        boolean
+
+        """
+
+        if self.connection is not None:
+            try:
+                self.connection.execute(db.text('SELECT 1'))
+                return True
+            except Exception:
+                logging.getLogger(__name__).info(f'Lost leader connection for {self.name}')
+                self.release()
+
+        connection = db.engine.connect()
+        if connection.execute(db.text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar():
+            self.connection = connection
+            logging.getLogger(__name__).info(f'Process {os.getpid()} is now leader for {self.name}')
+            return True
+
+        connection.close()
+        return False
+
+    def acquireFileLock(self, app):
+        """
+        Hold an exclusive non-blocking flock on LEADER_LOCK_DIR/spa-<job>.lock, or on <lockDir>/.spa-<job>.lock for host scoped jobs
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        boolean
+
+        """
+
+        if fcntl is None or self.lockFile is not None:
+            return True
+
+        if self.lockDir is not None:
+            if not os.path.isdir(self.lockDir): # Nothing to work on in this process (ie no logs directory in debug mode)
+                return False
+            path = os.path.join(self.lockDir, f'.spa-{self.name}.lock') # Hidden, so it is not taken for a log file
+        else:
+            path = os.path.join(app.config['LEADER_LOCK_DIR'] or tempfile.gettempdir(), f'spa-{self.name}.lock')
+        lockFile = open(path, 'a')
+        try:
+            fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lockFile.close()
+            return False
+
+        self.lockFile = lockFile
+        logging.getLogger(__name__).info(f'Process {os.getpid()} is now leader for {self.name}')
+        return True
+
+    def release(self):
+        """
+        Give up leadership for this job.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if self.connection is not None:
+            try:
+                self.connection.close() # Closing the session releases the advisory lock
+            except Exception:
+                pass
+            self.connection = None
+
+        if self.lockFile is not None:
+            self.lockFile.close() # Closing the file releases the flock
+            self.lockFile = None
+
+
+leaderLocks = {}
+leaderLocksLock = Lock()
+
+def runAsLeader(jobName, func, app, *args, lockDir=None):
+    """
+    Scheduler entry point. Runs the job only if this process is the leader for it.
+
+    Parameters
+    ----------
+    jobName : string
+        Name of the job, used as the lock name.
+    func : function
+        Job to run, called as func(app, *args).
+    app : Flask instance
+    *args :
+        Extra arguments for the job.
+    lockDir : string, optional
+        The default is None, one leader per deployment. Otherwise one leader per host: the processes sharing
+        this directory elect one through a file lock in it.
+
+    Returns
+    -------
+    None.
+
+    """
+
+    with leaderLocksLock:
+        leaderLock = leaderLocks.setdefault(jobName, LeaderLock(jobName, lockDir))
+
+    with app.app_context():
+        if not leaderLock.acquire(app):
+            return
+
+    func(app, *args)
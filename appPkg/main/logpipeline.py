@@ -0,0 +1,218 @@
+"""
+Description:
+    - Non-blocking logging pipeline for the app logger
+    - Request threads only put records on a bounded queue (QueueHandler), a background listener thread owns the file and SMTP handlers
+    - The listener writes records in batches and flushes the file once per batch
+    - Error emails are rate limited, the errors logged in between are aggregated into one email
+    - The listener is (re)started on the first record in each process, so forked gunicorn workers get their own,
+      and drained at interpreter exit
+    - With deferStart, the creating process (the preloading gunicorn master) starts no thread: its records wait
+      in the queue and are written when it exits, the forked workers start their listener with an empty queue
+"""
+
+import atexit
+import logging
+import os
+from logging.handlers import QueueHandler, SMTPHandler
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+from time import monotonic
+
+
+class AggregatingSMTPHandler(SMTPHandler):
+    """
+    Description:
+        Sends at most one email per interval seconds. Records logged in between are collected
+        and sent together as one email, with a count per distinct message.
+    """
+
+    def __init__(self, *args, interval=300, maxRecords=20, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interval = interval
+        self.maxRecords = maxRecords # Records included in full, the rest are only counted
+        self.pending = []
+        self.counts = {} # First line of the message: count
+        self.nextSendTime = 0 # The first error is emailed right away
+
+    def emit(self, record):
+        text = self.format(record)
+        firstLine = text.split('\n', 1)[0]
+        self.counts[firstLine] = self.counts.get(firstLine, 0) + 1
+        if len(self.pending) < self.maxRecords:
+            self.pending.append(text)
+
+    def flush(self, force=False):
+        """
+        Send the aggregated email if the interval has passed.
+
+        Parameters
+        ----------
+        force : boolean, optional
+            The default is False. True sends whatever is pending, ie at shutdown.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.counts or (not force and monotonic() < self.nextSendTime):
+            return
+
+        total = sum(self.counts.values())
+        summary = '\n'.join(f'{count:>6} x {line}' for line, count in
+                            sorted(self.counts.items(), key=lambda item: item[1], reverse=True))
+        body = f'{total} error(s) logged\n\n{summary}\n\n' + '\n\n'.join(self.pending)
+        if total > len(self.pending):
+            body += f'\n\n... {total - len(self.pending)} more not shown'
+
+        record = logging.makeLogRecord({'msg': body, 'levelname': 'ERROR', 'levelno': logging.ERROR})
+        record.errorCount = total
+        self.pending = []
+        self.counts = {}
+        self.nextSendTime = monotonic() + self.interval
+        super().emit(record) # Sends the email, errors go to handleError
+
+    def getSubject(self, record):
+        count = getattr(record, 'errorCount', 1)
+        return self.subject if count == 1 else f'{self.subject} ({count} errors)'
+
+    def format(self, record):
+        if hasattr(record, 'errorCount'): # Aggregated email, already formatted
+            return record.msg
+        return super().format(record)
+
+    def close(self):
+        self.flush(force=True)
+        super().close()
+
+
+class LogPipeline(object):
+    """
+    Description:
+        Bounded record queue plus one listener thread per process.
+    """
+
+    def __init__(self, handlers, queueSize=10000, batchSize=100, flushInterval=1, deferStart=False):
+        self.handlers = handlers
+        self.queueSize = queueSize
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval # Seconds before a partial batch and pending error emails are flushed
+        self.lock = Lock()
+        self.owner = os.getpid() if deferStart else None # Process that never starts a listener thread
+        self.pid = None
+        self.queue = None
+        self.thread = None
+        self.dropped = 0
+        self.queueHandler = PipelineQueueHandler(self)
+        atexit.register(self.stop)
+
+    def put(self, record):
+        """
+        Enqueue a record without blocking. Records are dropped when the queue is full.
+
+        Parameters
+        ----------
+        record : LogRecord instance
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if self.pid != os.getpid(): # First record in this process, ie a forked worker
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.queue = Queue(maxsize=self.queueSize) # The parent's queued records stay with the parent
+                    self.thread = None
+                    if os.getpid() != self.owner:
+                        self.thread = Thread(target=self.listen, name='log-listener', daemon=True)
+                        self.thread.start()
+                    self.pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def nextBatch(self):
+        """
+        Wait for a record, then take whatever else is already queued, up to batchSize.
+
+        Returns
+        -------
+        list
+            Records, None marks the end of the pipeline.
+
+        """
+
+        try:
+            batch = [self.queue.get(timeout=self.flushInterval)]
+        except Empty:
+            return []
+
+        while len(batch) < self.batchSize and batch[-1] is not None:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def handleBatch(self, batch):
+        # Hand each record to the handlers accepting its level, then flush once per batch
+        for record in batch:
+            if record is None:
+                continue
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        for handler in self.handlers:
+            handler.flush()
+
+    def listen(self):
+        # Listener thread
+        while True:
+            batch = self.nextBatch()
+            self.handleBatch(batch)
+            if batch and batch[-1] is None:
+                return
+
+    def stop(self):
+        """
+        Drain the queue and close the handlers. Registered to run at interpreter exit.
+        A process without a listener thread (deferStart) writes its queued records itself.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        elif self.thread is None and self.pid == os.getpid():
+            batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            self.handleBatch(batch)
+        for handler in self.handlers:
+            handler.close()
+
+
+class PipelineQueueHandler(QueueHandler):
+    """
+    Description:
+        QueueHandler attached to the app logger. The calling thread only merges the message arguments
+        and traceback into the record, the handlers format and write it in the listener thread.
+    """
+
+    def __init__(self, pipeline):
+        super().__init__(None)
+        self.pipeline = pipeline
+
+    def enqueue(self, record):
+        self.pipeline.put(record)
@@ -0,0 +1,387 @@
+"""
+Description:
+    - Segment based log files, replacing the 10 KB RotatingFileHandler files
+    - Each process appends to its own open segment, rolled over by size (LOG_SEGMENT_SIZE) or age (LOG_SEGMENT_MAX_AGE)
+    - Closed segments are gzip compressed and indexed in logs/manifest.jsonl, segments past LOG_RETENTION_DAYS are deleted
+      once the log shipper has shipped them
+    - Segments left open by a process that died (crash, SIGKILL) are closed by the next process applying retention
+    - Log files from before the manifest ('<time>_spa.log[.n]') are adopted as closed segments once, so they are shipped too
+    - The log shipper and log tooling read the manifest instead of listing the logs directory
+    - Forked processes never write to or roll over their parent's segment: the parent flushes before the fork,
+      the child only closes its inherited copy of the stream and opens its own segment
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import socket
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError: # Windows - manifest updates are not locked
+    fcntl = None
+
+
+class Manifest(object):
+    """
+    Description:
+        JSON lines file of segment records. A segment is recorded when it opens and again when it closes,
+        the latest record of a segment wins:
+        {'segment': file name, 'status': 'open' or 'closed', 'host': name, 'pid': n, 'start': time, 'end': time,
+         'records': n, 'bytes': n, 'compressedBytes': n}
+    """
+
+    fileName = 'manifest.jsonl'
+    checkpointName = '.shipper-checkpoint.json' # Log shipper checkpoint: segment name: uncompressed bytes shipped
+    legacyName = re.compile(r'^\d{8}-\d{6}_spa\.log(\.\d+)?$') # RotatingFileHandler files written before the manifest
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, self.fileName)
+        self.directory = directory
+
+    def lock(self, f):
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX) # Processes sharing the logs directory append and compact in turn
+
+    @contextmanager
+    def locked(self):
+        # Manifest opened for appending and locked
+        while True:
+            f = open(self.path, 'a')
+            self.lock(f)
+            if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                break
+            f.close() # Compacted while waiting for the lock, lock the new file
+        with f:
+            yield f
+
+    def append(self, record):
+        with self.locked() as f:
+            f.write(json.dumps(record) + '\n')
+
+    def segments(self):
+        """
+        Returns
+        -------
+        dictionary
+            Segment name: latest record, oldest segment first.
+
+        """
+
+        segments = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # Partial line from a crash
+                        continue
+                    segments.pop(record['segment'], None)
+                    segments[record['segment']] = record
+        except OSError:
+            pass
+        return segments
+
+    def segmentPath(self, record):
+        # Closed segments are compressed
+        return os.path.join(self.directory, record['segment'] + ('.gz' if record['status'] == 'closed' else ''))
+
+    def shipped(self):
+        """
+        Returns
+        -------
+        dictionary or None
+            Segment name: uncompressed bytes shipped, from the log shipper checkpoint. None if this directory was never shipped.
+
+        """
+
+        try:
+            with open(os.path.join(self.directory, self.checkpointName)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def closeOrphans(self, segments):
+        """
+        Close the open segments of processes on this host that are no longer running: compress the file
+        and record the segment as closed. Called with the manifest locked.
+
+        Parameters
+        ----------
+        segments : dictionary
+            From segments(), updated in place.
+
+        Returns
+        -------
+        integer
+            Number of segments closed.
+
+        """
+
+        host = socket.gethostname()
+        closed = 0
+        for name, record in list(segments.items()):
+            if record['status'] != 'open' or record.get('host') != host or processAlive(record.get('pid')):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.exists(path):
+                    end = datetime.utcfromtimestamp(os.path.getmtime(path)) # Last write
+                    size, lines = compressSegment(path)
+                elif os.path.exists(path + '.gz'): # Died after compressing, before recording the segment as closed
+                    end = datetime.utcfromtimestamp(os.path.getmtime(path + '.gz'))
+                    size, lines = measureSegment(path + '.gz')
+                else:
+                    del segments[name]
+                    continue
+            except OSError:
+                logging.getLogger(__name__).exception(f'Failed to close orphaned log segment {name}')
+                continue
+
+            segments[name] = {**record, 'status': 'closed', 'end': end.isoformat(), 'records': lines, 'bytes': size,
+                              'compressedBytes': os.path.getsize(path + '.gz')}
+            closed += 1
+        return closed
+
+    def adoptLegacy(self):
+        """
+        One time migration of the log files written before the manifest: compress each one and record it as a closed segment,
+        so the shipper ships it and retention deletes it. Adopted files are renamed (.gz) and no longer match.
+
+        Returns
+        -------
+        integer
+            Number of files adopted.
+
+        """
+
+        names = sorted(entry.name for entry in os.scandir(self.directory) if entry.is_file() and self.legacyName.match(entry.name))
+        if not names:
+            return 0
+
+        adopted = 0
+        with self.locked() as f:
+            for name in names:
+                path = os.path.join(self.directory, name)
+                try:
+                    modified = datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+                    size, lines = compressSegment(path)
+                except FileNotFoundError: # Adopted by another process
+                    continue
+                f.write(json.dumps({'segment': name, 'status': 'closed', 'start': modified, 'end': modified, 'records': lines,
+                                    'bytes': size, 'compressedBytes': os.path.getsize(path + '.gz')}) + '\n')
+                adopted += 1
+        return adopted
+
+    def applyRetention(self, retentionDays):
+        """
+        Close orphaned segments, delete the closed segments that ended more than retentionDays ago and
+        compact the manifest to one record per segment. Once the directory is shipped, a segment is only deleted
+        after the shipper checkpoint has all of its bytes, so a shipping backlog is never lost.
+
+        Parameters
+        ----------
+        retentionDays : float
+
+        Returns
+        -------
+        integer
+            Number of segments deleted.
+
+        """
+
+        cutoff = (datetime.utcnow() - timedelta(days=retentionDays)).isoformat()
+        shipped = self.shipped()
+        with self.locked():
+            segments = self.segments()
+            self.closeOrphans(segments)
+            kept = []
+            for record in segments.values():
+                expired = record['status'] == 'closed' and record['end'] < cutoff
+                if expired and (shipped is None or shipped.get(record['segment'], 0) >= record['bytes']):
+                    try:
+                        os.remove(self.segmentPath(record))
+                    except OSError:
+                        pass
+                else:
+                    kept.append(record)
+
+            with open(self.path + '.tmp', 'w') as tmp:
+                tmp.writelines(json.dumps(record) + '\n' for record in kept)
+            os.replace(self.path + '.tmp', self.path)
+        return len(segments) - len(kept)
+
+
+def processAlive(pid):
+    # Unknown owners count as alive. On Windows os.kill would terminate the process
+    if pid is None or fcntl is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # Running as another user
+        return True
+    return True
+
+
+def compressSegment(path):
+    """
+    Compress a segment file to <path>.gz and delete it. A partial last line, left by a process that died while writing,
+    is ended with a newline so the shipper (which only ships complete lines) ships it.
+
+    Parameters
+    ----------
+    path : string
+
+    Returns
+    -------
+    tuple
+        Uncompressed bytes, lines.
+
+    """
+
+    size = 0
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            target.write(chunk)
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+        if last != b'\n':
+            target.write(b'\n')
+            size += 1
+            lines += 1
+    os.remove(path)
+    return size, lines
+
+
+def measureSegment(path):
+    # Uncompressed bytes and lines of a compressed segment
+    size = 0
+    lines = 0
+    with gzip.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+    return size, lines
+
+
+class SegmentFileHandler(logging.Handler):
+    """
+    Description:
+        Writes to logs/<prefix>-<host>-<pid>-<start time>.log. Records are not flushed one by one,
+        the log pipeline listener calls flush() once per batch (and at least every LOG_FLUSH_INTERVAL seconds),
+        which also rolls over an aged segment.
+    """
+
+    terminator = '\n'
+
+    def __init__(self, directory, prefix='spa', maxBytes=10 * 1024 * 1024, maxAge=3600, retentionDays=14):
+        super().__init__()
+        self.directory = directory
+        self.prefix = prefix
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+        self.retentionDays = retentionDays
+        self.manifest = Manifest(directory)
+
+        self.stream = None
+        self.pid = None
+        self.segment = None
+        self.host = None
+        self.startTime = None
+        self.records = 0
+
+        try:
+            self.manifest.adoptLegacy()
+        except OSError:
+            logging.getLogger(__name__).exception('Failed to adopt the legacy log files')
+
+        if hasattr(os, 'register_at_fork'):
+            handler = weakref.ref(self)
+            os.register_at_fork(before=lambda: handler() is not None and handler().beforeFork())
+
+    def beforeFork(self):
+        # Flush in the parent, so the copy of the stream a forked child inherits has nothing left to write
+        self.acquire()
+        try:
+            if self.stream is not None and self.pid == os.getpid():
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def openSegment(self):
+        self.startTime = datetime.utcnow()
+        self.pid = os.getpid()
+        self.host = socket.gethostname()
+        self.segment = f'{self.prefix}-{self.host}-{self.pid}-{self.startTime.strftime("%Y%m%d-%H%M%S-%f")}.log'
+        self.stream = open(os.path.join(self.directory, self.segment), 'a', encoding='utf-8')
+        self.records = 0
+        self.manifest.append({'segment': self.segment, 'status': 'open', 'host': self.host, 'pid': self.pid,
+                              'start': self.startTime.isoformat()}) # Owner, to close the segment if the process dies
+
+    def closeSegment(self):
+        """
+        Compress the open segment, record it in the manifest as closed and apply retention.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.stream.close()
+        self.stream = None
+        path = os.path.join(self.directory, self.segment)
+        size = compressSegment(path)[0]
+
+        self.manifest.append({'segment': self.segment, 'status': 'closed', 'host': self.host, 'pid': self.pid, 'start': self.startTime.isoformat(),
+                              'end': datetime.utcnow().isoformat(), 'records': self.records, 'bytes': size,
+                              'compressedBytes': os.path.getsize(path + '.gz')})
+        self.manifest.applyRetention(self.retentionDays)
+
+    def emit(self, record):
+        try:
+            if self.stream is not None and self.pid != os.getpid(): # First record in a forked worker
+                self.stream.close() # The parent's segment, flushed before the fork. Only releases this process's descriptor
+                self.stream = None
+            if self.stream is None:
+                self.openSegment()
+            elif self.stream.tell() >= self.maxBytes:
+                self.closeSegment()
+                self.openSegment()
+            self.stream.write(self.format(record) + self.terminator)
+            self.records += 1
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream is None or self.pid != os.getpid():
+                return
+            self.stream.flush()
+            if (datetime.utcnow() - self.startTime).total_seconds() >= self.maxAge:
+                self.closeSegment() # The next record opens a new segment
+        except Exception:
+            self.handleError(logging.makeLogRecord({'msg': f'Log segment rollover failed for {self.segment}'}))
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream is not None and self.pid == os.getpid():
+                self.closeSegment()
+        finally:
+            self.release()
+        super().close()
@@ -0,0 +1,215 @@
+"""
+Description:
+    - Incremental log shipper for the log backup job
+    - Ships the segments listed in the logs manifest (see appPkg/main/logsegments.py)
+    - Remembers how many bytes of each segment were shipped, and only ships the new complete lines,
+      from the open segment file or, once the segment is closed, from its gzip file
+    - New bytes are uploaded as gzip compressed chunks, ie logs/<segment>/<offset>.gz, by the 'logs' executor pool
+    - The offsets are saved in a checkpoint file after every run, so shipping resumes where it stopped after a restart
+    - Destination is S3 (one client reused for every upload) or a local directory standing in for S3
+"""
+
+import gzip
+import json
+import logging
+import os
+from threading import Lock
+from appPkg.main.executors import executors
+from appPkg.main.logsegments import Manifest
+
+
+class S3Store(object):
+    """
+    Description:
+        S3 bucket destination. The boto3 client is created on the first upload and reused.
+    """
+
+    def __init__(self, bucket, region=None, accessKeyID=None, secretAccessKey=None):
+        self.bucket = bucket
+        self.region = region
+        self.accessKeyID = accessKeyID
+        self.secretAccessKey = secretAccessKey
+        self.client = None
+        self.lock = Lock()
+
+    def put(self, key, data):
+        with self.lock:
+            if self.client is None:
+                import boto3 # Imported on first use, only the process running the log backup job needs boto3
+                self.client = boto3.client(service_name='s3', region_name=self.region,
+                                           aws_access_key_id=self.accessKeyID,
+                                           aws_secret_access_key=self.secretAccessKey)
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentEncoding='gzip')
+
+
+class LocalStore(object):
+    """
+    Description:
+        Local directory destination, standing in for S3 in development and tests.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def put(self, key, data):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+
+class LogShipper(object):
+    """
+    Description:
+        Checkpoint: segment name: uncompressed bytes shipped
+    """
+
+    checkpointName = Manifest.checkpointName # Also read by retention, which keeps the segments not yet shipped
+
+    def __init__(self, store, executor, prefix='logs', maxSegmentSize=8 * 1024 * 1024):
+        self.store = store
+        self.executor = executor # Runs the uploads, ie the 'logs' executor pool
+        self.prefix = prefix
+        self.maxSegmentSize = maxSegmentSize # Bytes read per segment, a large backlog is shipped over several runs
+        self.lock = Lock() # One run at a time
+
+        self.bytesRead = 0
+        self.bytesUploaded = 0
+        self.uploads = 0
+        self.failures = 0
+
+    def loadCheckpoint(self, directory):
+        try:
+            with open(os.path.join(directory, self.checkpointName)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def saveCheckpoint(self, directory, checkpoint):
+        path = os.path.join(directory, self.checkpointName)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(path + '.tmp', path) # Atomic, a crash leaves the previous checkpoint
+
+    def readSegment(self, path, offset, compressed):
+        """
+        Read the new complete lines of a segment.
+
+        Parameters
+        ----------
+        path : string
+        offset : integer
+            Uncompressed bytes already shipped.
+        compressed : boolean
+            True for a closed (gzip) segment.
+
+        Returns
+        -------
+        bytes
+            Up to maxSegmentSize bytes ending with a newline, empty if there is no complete new line.
+
+        """
+
+        with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as f:
+            f.seek(offset)
+            data = f.read(self.maxSegmentSize)
+        end = data.rfind(b'\n') + 1 # A line being written is shipped on the next run
+        return data[:end]
+
+    def upload(self, key, data):
+        compressed = gzip.compress(data)
+        self.store.put(key, compressed)
+        return len(compressed)
+
+    def ship(self, directory):
+        """
+        Ship the new bytes of every segment in the logs manifest, then save the checkpoint.
+
+        Parameters
+        ----------
+        directory : string
+            Logs directory.
+
+        Returns
+        -------
+        dictionary
+            Segments uploaded and failed, bytes read and uploaded (compressed) in this run.
+
+        """
+
+        with self.lock:
+            checkpoint = self.loadCheckpoint(directory)
+            manifest = Manifest(directory)
+            present = {}
+            pending = [] # (segment, new offset, bytes read, future)
+
+            for segment, record in manifest.segments().items():
+                offset = checkpoint.get(segment, 0)
+                present[segment] = offset
+                if record['status'] == 'closed' and offset >= record['bytes']:
+                    continue
+
+                try:
+                    data = self.readSegment(manifest.segmentPath(record), offset, record['status'] == 'closed')
+                except OSError: # Compressed or deleted since the manifest was read, shipped on the next run
+                    continue
+                if not data:
+                    continue
+                key = f"{self.prefix}/{segment}/{offset:012d}.gz"
+                pending.append((segment, offset + len(data), len(data), self.executor.submit(self.upload, key, data)))
+
+            run = {'uploads': 0, 'failures': 0, 'bytesRead': 0, 'bytesUploaded': 0}
+            for segment, offset, length, future in pending:
+                try:
+                    run['bytesUploaded'] += future.result()
+                except Exception: # Logged by the executor
+                    logging.getLogger(__name__).error(f"Failed to ship {segment}")
+                    run['failures'] += 1 # Offset unchanged, retried on the next run
+                    continue
+                present[segment] = offset
+                run['uploads'] += 1
+                run['bytesRead'] += length
+
+            # Segments deleted by retention are dropped from the checkpoint
+            self.saveCheckpoint(directory, present)
+
+            self.uploads += run['uploads']
+            self.failures += run['failures']
+            self.bytesRead += run['bytesRead']
+            self.bytesUploaded += run['bytesUploaded']
+            return run
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dictionary
+            Totals since the process started.
+
+        """
+
+        return {'uploads': self.uploads, 'failures': self.failures,
+                'bytesRead': self.bytesRead, 'bytesUploaded': self.bytesUploaded}
+
+
+def createShipper(config):
+    """
+    Shipper for the app config. LOG_SHIP_DIRECTORY, when set, replaces S3 with a local directory.
+
+    Parameters
+    ----------
+    config : Flask config
+
+    Returns
+    -------
+    LogShipper instance
+
+    """
+
+    if config['LOG_SHIP_DIRECTORY']:
+        store = LocalStore(config['LOG_SHIP_DIRECTORY'])
+    else:
+        store = S3Store(config['AWS_S3_BUCKET'], config['AWS_DEFAULT_REGION'],
+                        config['AWS_ACCESS_KEY_ID'], config['AWS_SECRET_ACCESS_KEY'])
+    return LogShipper(store, executors.pool('logs'), prefix='logs')
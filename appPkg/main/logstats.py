@@ -0,0 +1,251 @@
+"""
+Description:
+    - Streaming access log statistics ('flask logs stats')
+    - Reads every log file once: open segments and legacy log files through mmap, closed (gzip) segments
+      by decompressing the mmapped file in chunks, so memory use does not grow with the size of the history
+    - Access log lines are matched with one precompiled bytes pattern, other lines are skipped by the regex engine
+    - Counts per endpoint, user, IP and time bucket in the same pass. Each table keeps at most maxKeys entries,
+      the least counted keys are dropped when it overflows (keys never dropped keep exact counts)
+"""
+
+import mmap
+import os
+import re
+import zlib
+from collections import Counter
+from operator import itemgetter
+from appPkg.main.logsegments import Manifest
+
+
+# '2021-10-18 18:52:46,793 INFO: IP: 1.2.3.4 - User: 7 - Accessing: main.index - 200 in 3.1 ms [in ...]'
+# Lines written before the access log have ' in <module>. ' instead of the status and duration
+ACCESS_LINE = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d):\d\d,\d+ INFO: IP: (\S+) - User: (\S+) - Accessing: (\S+)'
+                         rb'(?: - (\d{3}) in ([\d.]+) ms)?', re.MULTILINE)
+
+CHUNK_SIZE = 4 * 1024 * 1024 # Bytes scanned at a time, bounds the memory used for matched lines
+
+
+class BoundedCounter(object):
+    """
+    Description:
+        Key: count table holding at most maxKeys keys. On overflow the table is pruned to its maxKeys // 2
+        most counted keys, the counts of the dropped keys are added to 'dropped'.
+    """
+
+    def __init__(self, maxKeys=10000):
+        self.maxKeys = maxKeys
+        self.counts = Counter()
+        self.dropped = 0
+
+    def update(self, counts):
+        self.counts.update(counts)
+        if len(self.counts) > self.maxKeys:
+            kept = Counter(dict(self.counts.most_common(self.maxKeys // 2)))
+            self.dropped += sum(self.counts.values()) - sum(kept.values())
+            self.counts = kept
+
+    def top(self, n):
+        return self.counts.most_common(n)
+
+
+class AccessStats(object):
+    """
+    Description:
+        Aggregates matched access log lines. bucketLength is the number of characters of the
+        'YYYY-mm-dd HH:MM' timestamp kept as the time bucket, ie 13 for hours, 10 for days.
+    """
+
+    def __init__(self, since=None, bucketLength=13, maxKeys=10000):
+        self.since = since.encode() if since else None # Timestamps compare as strings
+        self.bucketLength = bucketLength
+        self.requests = 0
+        self.errors = 0 # 5xx responses
+        self.files = 0
+        self.bytesRead = 0
+        self.endpoints = BoundedCounter(maxKeys)
+        self.endpointTime = {} # Endpoint: [timed requests, total milliseconds], for the endpoints still counted
+        self.users = BoundedCounter(maxKeys)
+        self.ips = BoundedCounter(maxKeys)
+        self.buckets = BoundedCounter(maxKeys)
+
+    def scan(self, data, pos=0, endpos=None):
+        """
+        Aggregate the access log lines of a buffer. The matching and counting run in C (re.findall, Counter),
+        so the cost per line stays close to the regex scan itself.
+
+        Parameters
+        ----------
+        data : bytes-like (bytes or mmap)
+        pos, endpos : integer, optional
+            Window of the buffer to scan, both at line boundaries. The default is the whole buffer.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        rows = ACCESS_LINE.findall(data, pos, len(data) if endpos is None else endpos)
+        if self.since:
+            rows = [row for row in rows if row[0] >= self.since]
+        if not rows:
+            return
+
+        self.requests += len(rows)
+        self.ips.update(map(itemgetter(1), rows))
+        self.users.update(map(itemgetter(2), rows))
+        self.endpoints.update(map(itemgetter(3), rows))
+        self.buckets.update(row[0][:self.bucketLength] for row in rows)
+
+        # Durations are summed per distinct (endpoint, duration) pair, far fewer than the lines
+        for status, count in Counter(map(itemgetter(4), rows)).items():
+            if status[:1] == b'5':
+                self.errors += count
+        counted = self.endpoints.counts
+        for (endpoint, elapsed), count in Counter(zip(map(itemgetter(3), rows), map(itemgetter(5), rows))).items():
+            if elapsed and endpoint in counted: # Lines written before the access log have no duration
+                timing = self.endpointTime.setdefault(endpoint, [0, 0.0])
+                timing[0] += count
+                timing[1] += float(elapsed) * count
+
+    def scanFile(self, path):
+        """
+        Parameters
+        ----------
+        path : string
+            Plain or gzip (.gz) log file.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if path.endswith('.gz'):
+                    self.scanCompressed(mapped, size)
+                else:
+                    self.scanMapped(mapped, size)
+        self.files += 1
+
+    def scanMapped(self, mapped, size):
+        # The regex runs on the mapped pages in windows ending at a newline, no copy
+        pos = 0
+        while pos < size:
+            endpos = mapped.rfind(b'\n', pos, pos + CHUNK_SIZE) + 1 if pos + CHUNK_SIZE < size else size
+            if endpos <= pos: # Line longer than a window, the window is extended to its end so it is matched whole
+                endpos = mapped.find(b'\n', pos + CHUNK_SIZE) + 1 or size
+            self.scan(mapped, pos, endpos)
+            pos = endpos
+        self.bytesRead += size
+
+    def scanCompressed(self, mapped, size):
+        # Decompress at most CHUNK_SIZE bytes at a time, carrying the partial last line over to the next chunk
+        decompressor = zlib.decompressobj(wbits=31) # gzip header
+        carry = b''
+        offset = 0
+        while True:
+            if decompressor.unconsumed_tail:
+                compressed = decompressor.unconsumed_tail
+            elif offset < size:
+                compressed = mapped[offset:offset + CHUNK_SIZE]
+                offset += CHUNK_SIZE
+            else:
+                break
+            data = carry + decompressor.decompress(compressed, CHUNK_SIZE)
+            end = data.rfind(b'\n') + 1
+            self.scan(data, 0, end)
+            self.bytesRead += end
+            carry = data[end:]
+        carry += decompressor.flush()
+        self.scan(carry)
+        self.bytesRead += len(carry)
+
+    def meanTime(self, endpoint):
+        # None for endpoints only seen in lines without a duration
+        timed, total = self.endpointTime.get(endpoint, (0, 0.0))
+        return total / timed if timed else None
+
+    def report(self, top=10):
+        """
+        Returns
+        -------
+        dictionary
+            Totals, top endpoints (name, count, mean ms), users and IPs, and the request count per time bucket.
+
+        """
+
+        return {'requests': self.requests, 'errors': self.errors, 'files': self.files, 'bytesRead': self.bytesRead,
+                'endpoints': [(endpoint.decode(), count, self.meanTime(endpoint)) for endpoint, count in self.endpoints.top(top)],
+                'users': [(user.decode(), count) for user, count in self.users.top(top)],
+                'ips': [(ip.decode(), count) for ip, count in self.ips.top(top)],
+                'buckets': [(bucket.decode(), count) for bucket, count in sorted(self.buckets.counts.items())],
+                'dropped': {'endpoint': self.endpoints.dropped, 'user': self.users.dropped,
+                            'IP': self.ips.dropped, 'bucket': self.buckets.dropped}}
+
+
+def logFiles(directory, since=None):
+    """
+    Log files to scan, oldest first: log files written before the segment manifest (ie '<time>_spa.log.1'),
+    then the segments listed in the manifest. Closed segments that ended before 'since' are skipped.
+
+    Parameters
+    ----------
+    directory : string
+        Logs directory.
+    since : string, optional
+        'YYYY-mm-dd[ HH:MM]'. The default is None.
+
+    Returns
+    -------
+    list
+        File paths.
+
+    """
+
+    manifest = Manifest(directory)
+    segments = manifest.segments()
+    names = set(segments) | {segment + '.gz' for segment in segments} | {Manifest.fileName}
+    legacy = sorted(entry.path for entry in os.scandir(directory) if entry.is_file() and entry.name not in names
+                    and not entry.name.startswith('.') and not entry.name.endswith('.tmp'))
+
+    paths = []
+    cutoff = since.replace(' ', 'T') if since else None # Manifest times are ISO format
+    for record in segments.values():
+        if cutoff and record['status'] == 'closed' and record['end'] < cutoff:
+            continue
+        paths.append(manifest.segmentPath(record))
+    return legacy + paths
+
+
+def accessStats(directory, since=None, bucketLength=13, maxKeys=10000):
+    """
+    Parameters
+    ----------
+    directory : string
+        Logs directory.
+    since : string, optional
+        Only count requests at or after 'YYYY-mm-dd[ HH:MM]'. The default is None.
+    bucketLength : integer, optional
+        Timestamp characters per time bucket. The default is 13 (hourly).
+    maxKeys : integer, optional
+        Keys kept per table. The default is 10000.
+
+    Returns
+    -------
+    AccessStats instance
+
+    """
+
+    stats = AccessStats(since, bucketLength, maxKeys)
+    for path in logFiles(directory, since):
+        try:
+            stats.scanFile(path)
+        except FileNotFoundError:
+            if not path.endswith('.gz') and os.path.exists(path + '.gz'): # Segment closed while scanning
+                stats.scanFile(path + '.gz')
+    return stats
@@ -0,0 +1,139 @@
+"""
+Description:
+    - Notification outbox dispatcher
+    - Claims due rows in batches (PostgreSQL: FOR UPDATE SKIP LOCKED, so several processes can dispatch at once),
+      sends them over one SMTP connection and marks them SENT
+    - Failed sends are retried with exponential backoff, rows are marked FAILED after OUTBOX_MAX_ATTEMPTS
+    - Rows claimed by a dispatcher that died are reclaimed once their claim expires
+    - Due per-user digests (see appPkg/main/digest.py) are built before each run
+"""
+
+import logging
+import uuid
+from datetime import datetime, timedelta
+from flask_mail import Message
+from appPkg import db
+from appPkg.email import sendMessages
+from appPkg.models import notificationOutbox
+from appPkg.main.digest import buildDigests
+
+
+def dueCondition(now):
+    # Pending rows whose retry time has passed, or rows left SENDING by a dispatcher that died
+    return db.or_(db.and_(notificationOutbox.status == 'PENDING', notificationOutbox.nextAttemptTime <= now),
+                  db.and_(notificationOutbox.status == 'SENDING', notificationOutbox.claimedUntil < now))
+
+
+def claimBatch(config):
+    """
+    Claim up to OUTBOX_BATCH_SIZE due rows for this dispatcher and commit the claim.
+    The claim UPDATE repeats the due condition, so on databases without SKIP LOCKED (SQLite)
+    a row picked by two dispatchers is only claimed by one.
+
+    Parameters
+    ----------
+    config : Flask config
+
+    Returns
+    -------
+    list
+        Claimed notificationOutbox instances.
+
+    """
+
+    now = datetime.utcnow()
+    dueIDs = [row.id for row in db.session.query(notificationOutbox.id).filter(dueCondition(now))
+              .order_by(notificationOutbox.id).limit(config['OUTBOX_BATCH_SIZE'])
+              .with_for_update(skip_locked=True).all()]
+    if not dueIDs:
+        db.session.commit()
+        return []
+
+    token = uuid.uuid4().hex
+    notificationOutbox.query.filter(notificationOutbox.id.in_(dueIDs), dueCondition(now)).update(
+        {'status': 'SENDING', 'claimedBy': token,
+         'claimedUntil': now + timedelta(seconds=config['OUTBOX_CLAIM_TIMEOUT'])}, synchronize_session=False)
+    db.session.commit()
+
+    return notificationOutbox.query.filter_by(claimedBy=token, status='SENDING').order_by(notificationOutbox.id).all()
+
+
+def sendBatch(rows, config):
+    """
+    Send the claimed rows over one SMTP connection (see appPkg/email.py sendMessages) and record the outcome of each row.
+    Failed rows are retried by later runs with backoff, not within the batch.
+
+    Parameters
+    ----------
+    rows : list
+        Claimed notificationOutbox instances.
+    config : Flask config
+
+    Returns
+    -------
+    tuple
+        (sent, failed) counts.
+
+    """
+
+    messages = []
+    for row in rows:
+        msg = Message(row.subject, sender=row.sender, recipients=[row.recipient])
+        msg.body = row.textBody
+        msg.html = row.htmlBody
+        messages.append(msg)
+
+    sent = failed = 0
+    for row, error in zip(rows, sendMessages(messages)):
+        row.attempts = (row.attempts or 0) + 1
+        if error is not None:
+            row.lastError = str(error)[:300]
+            if row.attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+                row.status = 'FAILED'
+                logging.getLogger(__name__).error(f'Giving up on outbox notification {row.id} to {row.recipient}: {error}')
+            else:
+                row.status = 'PENDING'
+                row.nextAttemptTime = datetime.utcnow() + timedelta(
+                    seconds=config['OUTBOX_RETRY_BACKOFF'] * 2 ** (row.attempts - 1))
+            failed += 1
+        else:
+            row.status = 'SENT'
+            row.sentTime = datetime.utcnow()
+            sent += 1
+        row.claimedBy = None
+        row.claimedUntil = None
+
+    db.session.commit()
+    return sent, failed
+
+
+def dispatchOutbox(app):
+    """
+    Based off scheduler, also queued on the 'outbox' executor pool by each alert check cycle that triggered alerts.
+    Builds the due digests, then claims and sends batches until no due rows are left.
+
+    Parameters
+    ----------
+    app : Flask instance
+
+    Returns
+    -------
+    dictionary
+        Number of notifications sent and failed.
+
+    """
+
+    totals = {'sent': 0, 'failed': 0}
+    with app.app_context():
+        buildDigests(app.config)
+        while True:
+            rows = claimBatch(app.config)
+            if not rows:
+                break
+            sent, failed = sendBatch(rows, app.config)
+            totals['sent'] += sent
+            totals['failed'] += failed
+            if failed and not sent: # Mail server down, leave the rest for the next run
+                break
+
+    return totals
@@ -0,0 +1,155 @@
+"""
+Description:
+    - Thread-safe, process-local price cache in front of tickerInfo
+    - Entries expire when the price they hold goes stale (the loader says for how long it is fresh),
+      least recently used entries are evicted past the size cap
+    - Concurrent misses for one symbol share a single fetch (single-flight)
+"""
+
+from collections import OrderedDict
+from threading import Event, Lock
+from time import monotonic
+
+
+class InFlight(object):
+    """
+    Description:
+        A fetch in progress. Other threads missing on the same symbol wait on it.
+    """
+
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error = None
+
+
+class PriceCache(object):
+    """
+    Description:
+        symbol: (price, expiry) in LRU order, plus hit/miss/eviction counters
+    """
+
+    def __init__(self, maxSize=1000):
+        self.maxSize = maxSize
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.inFlight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        """
+        Size cap from PRICE_CACHE_SIZE, same pattern as the Flask extensions.
+
+        Parameters
+        ----------
+        app : Flask instance
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.maxSize = app.config['PRICE_CACHE_SIZE']
+
+    def put(self, symbol, price, ttl):
+        """
+        Store a price, ie one fetched by the alert check cycle.
+
+        Parameters
+        ----------
+        symbol : string
+        price : float
+        ttl : float
+            Seconds before the entry expires. 0 or less is not cached (and drops the symbol's entry).
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with self.lock:
+            self.store(symbol, price, ttl)
+
+    def store(self, symbol, price, ttl):
+        # Callers hold self.lock
+        if ttl <= 0: # Already stale, ie a served-stale price
+            self.entries.pop(symbol, None)
+            return
+        self.entries[symbol] = (price, monotonic() + ttl)
+        self.entries.move_to_end(symbol)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, symbol, loader):
+        """
+        Return the cached price, or load it. Only one thread runs the loader for a symbol at a time.
+
+        Parameters
+        ----------
+        symbol : string
+        loader : function
+            Called with no arguments on a miss, returns (price, seconds the price stays fresh).
+            A None price, or one already stale (0 seconds), is returned but not cached.
+
+        Returns
+        -------
+        float
+            Price, None if the loader had no valid data.
+
+        """
+
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry and entry[1] > monotonic():
+                self.entries.move_to_end(symbol)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            flight = self.inFlight.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = self.inFlight[symbol] = InFlight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        ttl = 0
+        try:
+            flight.value, ttl = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                if flight.value is not None:
+                    self.store(symbol, flight.value, ttl)
+                del self.inFlight[symbol]
+            flight.done.set()
+
+        return flight.value
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dictionary
+            Cache size plus hit, miss and eviction counters.
+
+        """
+
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# Process wide cache for the web path and the alert check cycle
+priceCache = PriceCache()
@@ -0,0 +1,407 @@
+"""
+Description:
+    - Quote providers used to get current stock prices
+    - QuoteProvider interface, the original blocking YahooFinancials provider (default),
+      a provider fanning out one request per symbol over a thread pool and one pooled HTTP session,
+      an asyncio provider fanning out the requests on one event loop and one pooled aiohttp session,
+      and local fake providers (threads and asyncio) for offline load tests
+"""
+
+import asyncio
+import logging
+import random
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from time import sleep
+from flask import current_app
+from appPkg.main.resilience import SymbolBackoff, CircuitBreaker
+
+
+class QuoteProviderError(Exception):
+    """
+    Description:
+        The provider could not be reached or answered with an error for every requested symbol (an outage),
+        as opposed to having no data for a symbol.
+    """
+
+
+class QuoteProvider(ABC):
+    """
+    Description:
+        Interface for current price lookups. Subclasses implement getPrices.
+        Transport and HTTP errors are raised, a symbol the provider has no data for is returned as None.
+    """
+
+    @abstractmethod
+    def getPrices(self, symbols):
+        """
+        Get the current price of several stock symbols.
+
+        Parameters
+        ----------
+        symbols : list
+            Stock symbols/tickers.
+
+        Returns
+        -------
+        dictionary
+            Stock symbol to current price. None if no valid data for the symbol.
+            Symbols whose own request failed (transport or HTTP error) are left out.
+
+        Raises
+        ------
+        Exception
+            The provider failed as a whole, ie QuoteProviderError or a network error.
+
+        """
+
+    def getPrice(self, symbol):
+        """
+        Get the current price of one stock symbol.
+
+        Parameters
+        ----------
+        symbol : string
+            Stock symbol/ticker.
+
+        Returns
+        -------
+        float
+            Current price, None if no valid data for the symbol.
+
+        """
+
+        return self.getPrices([symbol]).get(symbol)
+
+
+class YahooFinancialsProvider(QuoteProvider):
+    """
+    Description:
+        Blocking multi-symbol YahooFinancials lookup. This can take upto 5 seconds per call.
+    """
+
+    def getPrices(self, symbols):
+        from yahoofinancials import YahooFinancials # Imported on first use, it pulls in the BeautifulSoup stack
+
+        prices = YahooFinancials(list(symbols)).get_current_price() or {} # A list of tickers returns a dictionary
+        return {symbol: prices.get(symbol) for symbol in symbols}
+
+
+class ConcurrentQuoteProvider(QuoteProvider):
+    """
+    Description:
+        Fans out one blocking fetch per symbol over a thread pool of 'concurrency' threads, kept across calls.
+        Subclasses implement fetchPrice, which must bound its own time (ie an HTTP timeout of 'timeout' seconds),
+        return None when there is no data for the symbol and raise on transport or HTTP errors.
+    """
+
+    def __init__(self, concurrency=20, timeout=5):
+        self.concurrency = concurrency
+        self.timeout = timeout # Seconds per request
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='quotes') # Threads start on first use
+
+    @abstractmethod
+    def fetchPrice(self, symbol):
+        """
+        Parameters
+        ----------
+        symbol : string
+
+        Returns
+        -------
+        float
+            Current price, None if no valid data for the symbol.
+
+        """
+
+    def fetchLogged(self, symbol):
+        # (price, None), or (None, exception) logged, so one failed request cannot fail the others
+        try:
+            return self.fetchPrice(symbol), None
+        except Exception as e:
+            logging.getLogger(__name__).info(f'Quote fetch failed for {symbol}: {e!r}')
+            return None, e
+
+    def getPrices(self, symbols):
+        symbols = list(symbols)
+        prices, errors = {}, []
+        for symbol, (price, error) in zip(symbols, self.executor.map(self.fetchLogged, symbols)):
+            if error is None:
+                prices[symbol] = price
+            else:
+                errors.append(error)
+
+        if errors and len(errors) == len(symbols):
+            raise QuoteProviderError(f'All {len(symbols)} quote requests failed, last error {errors[-1]!r}')
+        return prices
+
+
+class YahooChartProvider(ConcurrentQuoteProvider):
+    """
+    Description:
+        Yahoo Finance chart endpoint (regularMarketPrice of /v8/finance/chart/<symbol>), one request per symbol
+        over one pooled requests.Session, so connections are reused across requests and cycles.
+    """
+
+    url = 'https://query1.finance.yahoo.com/v8/finance/chart/{}'
+
+    def __init__(self, concurrency=20, timeout=5):
+        import requests # Imported when the provider is created, on the first quote lookup (alert cycle or new alert form)
+        from requests.adapters import HTTPAdapter
+
+        super().__init__(concurrency, timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = 'Mozilla/5.0'
+
+    def fetchPrice(self, symbol):
+        response = self.session.get(self.url.format(symbol), params={'interval': '1d', 'range': '1d'}, timeout=self.timeout)
+        if response.status_code == 404: # Unknown symbol
+            return None
+        response.raise_for_status()
+        result = response.json()['chart']['result']
+        return result[0]['meta'].get('regularMarketPrice') if result else None
+
+
+class FakeQuoteProvider(ConcurrentQuoteProvider):
+    """
+    Description:
+        Local random walk around 100 with simulated network latency. No network access, for offline load testing of the pipeline.
+    """
+
+    def __init__(self, concurrency=20, timeout=5, latency=0.05):
+        super().__init__(concurrency, timeout)
+        self.latency = latency # Seconds per simulated request
+        self.prices = {}
+
+    def fetchPrice(self, symbol):
+        sleep(self.latency)
+        price = self.prices.get(symbol, 100.0) * random.uniform(0.98, 1.02)
+        self.prices[symbol] = price
+        return round(price, 2)
+
+
+class AsyncQuoteProvider(QuoteProvider):
+    """
+    Description:
+        Fans out one coroutine per symbol on an event loop run by a background thread, kept across calls,
+        so synchronous callers (alert cycles, request handlers) wait on the result of one whole cycle.
+        At most 'concurrency' requests are in flight and each is bounded by 'timeout' seconds.
+        Subclasses implement fetchPrice, which must return None when there is no data for the symbol
+        and raise on transport or HTTP errors, and createSession for a session shared by every request.
+    """
+
+    def __init__(self, concurrency=20, timeout=5):
+        self.concurrency = concurrency
+        self.timeout = timeout # Seconds per request
+        self.loop = None # Loop thread, semaphore and session start on first use
+        self.semaphore = None
+        self.session = None
+        self.lock = Lock()
+
+    def createSession(self):
+        """
+        Runs on the event loop.
+
+        Returns
+        -------
+        Session passed to fetchPrice, None if the provider needs none.
+
+        """
+
+        return None
+
+    @abstractmethod
+    async def fetchPrice(self, session, symbol):
+        """
+        Parameters
+        ----------
+        session : session returned by createSession
+        symbol : string
+
+        Returns
+        -------
+        float
+            Current price, None if no valid data for the symbol.
+
+        """
+
+    def startLoop(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                Thread(target=loop.run_forever, name='quotes-loop', daemon=True).start()
+                self.loop = loop
+            return self.loop
+
+    async def fetchLogged(self, symbol):
+        # (price, None), or (None, exception) logged, so one failed request cannot fail the others
+        async with self.semaphore:
+            try:
+                return await asyncio.wait_for(self.fetchPrice(self.session, symbol), self.timeout), None
+            except Exception as e:
+                logging.getLogger(__name__).info(f'Quote fetch failed for {symbol}: {e!r}')
+                return None, e
+
+    async def fetchAll(self, symbols):
+        if self.session is None: # Created on the loop, aiohttp sessions belong to the loop they were created on
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.session = self.createSession()
+        return await asyncio.gather(*(self.fetchLogged(symbol) for symbol in symbols))
+
+    def getPrices(self, symbols):
+        symbols = list(symbols)
+        results = asyncio.run_coroutine_threadsafe(self.fetchAll(symbols), self.startLoop()).result()
+
+        prices, errors = {}, []
+        for symbol, (price, error) in zip(symbols, results):
+            if error is None:
+                prices[symbol] = price
+            else:
+                errors.append(error)
+
+        if errors and len(errors) == len(symbols):
+            raise QuoteProviderError(f'All {len(symbols)} quote requests failed, last error {errors[-1]!r}')
+        return prices
+
+
+class AsyncYahooChartProvider(AsyncQuoteProvider):
+    """
+    Description:
+        Yahoo Finance chart endpoint (regularMarketPrice of /v8/finance/chart/<symbol>) over one pooled aiohttp session,
+        with at most 'concurrency' connections reused across requests and cycles.
+    """
+
+    url = YahooChartProvider.url
+
+    def createSession(self):
+        import aiohttp # Imported on the first quote lookup, only this provider needs aiohttp
+
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency),
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                     headers={'User-Agent': 'Mozilla/5.0'})
+
+    async def fetchPrice(self, session, symbol):
+        async with session.get(self.url.format(symbol), params={'interval': '1d', 'range': '1d'}) as response:
+            if response.status == 404: # Unknown symbol
+                return None
+            response.raise_for_status()
+            result = (await response.json())['chart']['result']
+            return result[0]['meta'].get('regularMarketPrice') if result else None
+
+
+class AsyncFakeQuoteProvider(AsyncQuoteProvider):
+    """
+    Description:
+        FakeQuoteProvider prices on the asyncio pipeline, for offline load testing without aiohttp.
+    """
+
+    def __init__(self, concurrency=20, timeout=5, latency=0.05):
+        super().__init__(concurrency, timeout)
+        self.latency = latency # Seconds per simulated request
+        self.prices = {}
+
+    async def fetchPrice(self, session, symbol):
+        await asyncio.sleep(self.latency)
+        price = self.prices.get(symbol, 100.0) * random.uniform(0.98, 1.02)
+        self.prices[symbol] = price
+        return round(price, 2)
+
+
+class GuardedQuoteProvider(QuoteProvider):
+    """
+    Description:
+        Wraps the configured provider with per-symbol negative caching and a provider-level circuit breaker.
+        Skipped symbols are returned as None, the same as symbols the provider has no data for.
+        Only provider failures count toward the breaker: raised errors, or no data for any symbol of a multi-symbol batch.
+        A symbol without data is a per-symbol miss (ie a mistyped symbol) and only backs off that symbol.
+    """
+
+    def __init__(self, provider, backoff, breaker):
+        self.provider = provider
+        self.backoff = backoff
+        self.breaker = breaker
+
+    def getPrices(self, symbols):
+        prices = {symbol: None for symbol in symbols}
+        symbols = [symbol for symbol in symbols if not self.backoff.isBlocked(symbol)]
+        if not symbols or not self.breaker.allow():
+            return prices
+
+        try:
+            fetched = self.provider.getPrices(symbols)
+        except Exception as e:
+            logging.getLogger(__name__).info(f'Quote provider failed: {e!r}')
+            self.breaker.recordFailure() # Not the symbols' fault, none of them back off
+            return prices
+
+        if len(symbols) > 1 and not any(fetched.get(symbol) for symbol in symbols):
+            self.breaker.recordFailure() # A whole batch without data is an outage that did not raise
+            return prices
+        self.breaker.recordSuccess() # The provider answered
+
+        for symbol in symbols:
+            if symbol not in fetched: # This symbol's request failed in transit
+                continue
+            if fetched[symbol]:
+                self.backoff.recordSuccess(symbol)
+                prices[symbol] = fetched[symbol]
+            else:
+                self.backoff.recordFailure(symbol)
+
+        return prices
+
+
+quoteProviders = {
+    'yahoofinancials': YahooFinancialsProvider,
+    'yahoo-chart': YahooChartProvider,
+    'yahoo-chart-async': AsyncYahooChartProvider,
+    'fake': FakeQuoteProvider,
+    'fake-async': AsyncFakeQuoteProvider
+}
+
+quoteProvider = None
+quoteProviderLock = Lock()
+
+def getQuoteProvider():
+    """
+    Process wide quote provider selected by QUOTE_PROVIDER, behind the negative cache and circuit breaker.
+    Created once so its HTTP session is reused.
+
+    Returns
+    -------
+    QuoteProvider instance
+
+    """
+
+    global quoteProvider
+    with quoteProviderLock:
+        if quoteProvider is None:
+            config = current_app.config
+            providerClass = quoteProviders[config['QUOTE_PROVIDER']]
+            if issubclass(providerClass, (ConcurrentQuoteProvider, AsyncQuoteProvider)):
+                provider = providerClass(config['QUOTE_CONCURRENCY'], config['QUOTE_TIMEOUT'])
+            else:
+                provider = providerClass()
+            quoteProvider = GuardedQuoteProvider(provider,
+                                                 SymbolBackoff(config['QUOTE_BACKOFF_BASE'], config['QUOTE_BACKOFF_MAX']),
+                                                 CircuitBreaker(config['BREAKER_FAILURE_THRESHOLD'], config['BREAKER_RESET_TIMEOUT']))
+        return quoteProvider
+
+
+def resetQuoteProvider():
+    """
+    Drop the process wide quote provider, ie in a forked gunicorn worker, so its HTTP session and thread pool
+    (or event loop thread) are created in the worker rather than inherited from the master.
+
+    Returns
+    -------
+    None.
+
+    """
+
+    global quoteProvider
+    with quoteProviderLock:
+        quoteProvider = None
@@ -0,0 +1,125 @@
+"""
+Description:
+    - Per-symbol negative cache with exponential backoff for symbols the quote provider has no data for
+    - Provider-level circuit breaker that short-circuits all fetches during an outage until a half-open probe succeeds
+    - De-duplication window for admin issue emails
+"""
+
+import logging
+from threading import Lock
+from time import monotonic
+
+
+class SymbolBackoff(object):
+    """
+    Description:
+        symbol: (consecutive failures, retry time). A failing symbol is skipped for base * 2^(failures - 1) seconds, up to maximum.
+    """
+
+    def __init__(self, base=60, maximum=3600):
+        self.base = base
+        self.maximum = maximum
+        self.lock = Lock()
+        self.failures = {}
+
+    def isBlocked(self, symbol):
+        with self.lock:
+            entry = self.failures.get(symbol)
+            return entry is not None and entry[1] > monotonic()
+
+    def recordFailure(self, symbol):
+        with self.lock:
+            count = self.failures.get(symbol, (0, 0))[0] + 1
+            self.failures[symbol] = (count, monotonic() + min(self.base * 2 ** (count - 1), self.maximum))
+
+    def recordSuccess(self, symbol):
+        with self.lock:
+            self.failures.pop(symbol, None)
+
+
+class CircuitBreaker(object):
+    """
+    Description:
+        CLOSED - requests go through, consecutive failures are counted
+        OPEN - after threshold consecutive failures, all requests are short-circuited for resetTimeout seconds
+        HALF OPEN - one probe request is let through, success closes the breaker, failure opens it again
+    """
+
+    def __init__(self, threshold=5, resetTimeout=120):
+        self.threshold = threshold
+        self.resetTimeout = resetTimeout
+        self.lock = Lock()
+        self.state = 'CLOSED'
+        self.consecutiveFailures = 0
+        self.openUntil = 0
+        self.probing = False
+
+    def allow(self):
+        """
+        Returns
+        -------
+        boolean
+            True if a request may go to the provider.
+
+        """
+
+        with self.lock:
+            if self.state == 'CLOSED':
+                return True
+            if self.state == 'OPEN' and monotonic() >= self.openUntil:
+                self.state = 'HALF OPEN'
+            if self.state == 'HALF OPEN' and not self.probing:
+                self.probing = True # Only one probe at a time
+                return True
+            return False
+
+    def recordSuccess(self):
+        with self.lock:
+            if self.state != 'CLOSED':
+                logging.getLogger(__name__).info('Quote provider circuit breaker closed')
+            self.state = 'CLOSED'
+            self.consecutiveFailures = 0
+            self.probing = False
+
+    def recordFailure(self):
+        with self.lock:
+            self.consecutiveFailures += 1
+            self.probing = False
+            if self.state == 'HALF OPEN' or self.consecutiveFailures >= self.threshold:
+                if self.state != 'OPEN':
+                    logging.getLogger(__name__).info('Quote provider circuit breaker opened')
+                self.state = 'OPEN'
+                self.openUntil = monotonic() + self.resetTimeout
+
+
+class DedupWindow(object):
+    """
+    Description:
+        Allows one event per key per window, ie one issue email per symbol.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.lastSent = {}
+
+    def allow(self, key, window):
+        """
+        Parameters
+        ----------
+        key : string
+        window : float
+            Seconds before the same key is allowed again.
+
+        Returns
+        -------
+        boolean
+            True if the event for this key should go ahead.
+
+        """
+
+        with self.lock:
+            now = monotonic()
+            if key in self.lastSent and now - self.lastSent[key] < window:
+                return False
+            self.lastSent[key] = now
+            return True
@@ -12,9 +12,8 @@ from appPkg.models import Stock
 from appPkg.main.forms import SelectStockForm, EnterPriceForm, DeleteStockForm
 from appPkg.models import User, Stock, alertTracker
 from appPkg.main.handlers import tickerInfo
-from appPkg.main.syslog import logInfo
+from appPkg.main.alertindex import alertIndex
 from datetime import datetime, timedelta
-import inspect
 
 @bp.route('/')
 @bp.route('/index')
@@ -37,7 +36,6 @@ def about():
     -------
     HTML template
     """
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
         
     return render_template("about.html")
 
@@ -62,8 +60,6 @@ def manage_alerts():
     Redirect webpage
     """   
     
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
-    
     formSelectStock = SelectStockForm()
     formDeleteStock = DeleteStockForm()
     strAlertsList, userStocks, userAlertCounts = getUserData() # Get user related alerts data. See "getUserData" for more info
@@ -94,6 +90,7 @@ def manage_alerts():
             deleteThis = alertTracker.query.filter_by(userID=current_user.id, id=deleteAlertID).first()
             db.session.delete(deleteThis)
             db.session.commit()
+            alertIndex.remove(deleteAlertID) # Keep the alert threshold index up to date
             flash(f'Deleted {selectedStock}.')
             return redirect(url_for('main.manage_alerts', userid=current_user.id))
         else:
@@ -124,8 +121,6 @@ def enter_price():
     HTML template
     """
     
-    logInfo(inspect.stack()[0].function, __name__, current_user) # Log page access information
-    
     selectedStock = session.get("selectedStock")
     lastPrice = session.get("lastPrice")
     formUserPrice = EnterPriceForm()
@@ -135,9 +130,12 @@ def enter_price():
                                 stockID = Stock.query.filter_by(symbol=selectedStock).first().id,
                                 priceAtUserInput = lastPrice,
                                 desiredPrice = formUserPrice.desiredPrice.data,
-                                status = 'IN PROGRESS')
+                                status = 'IN PROGRESS',
+                                direction = alertTracker.getDirection(lastPrice, formUserPrice.desiredPrice.data))
         db.session.add(newAlert)
         db.session.commit()
+        if alertIndex.loaded: # Only the process running the alert cycle keeps an index
+            alertIndex.add(newAlert.id, selectedStock, newAlert.priceAtUserInput, newAlert.desiredPrice) # Keep the alert threshold index up to date
         flash(f'Alert is now active for {selectedStock}.')
         return redirect(url_for('main.manage_alerts', userid=current_user.id))
     
@@ -0,0 +1,168 @@
+"""
+Description:
+    - Process pool sharded alert evaluation for very large alert populations
+    - 'IN PROGRESS' alerts are partitioned by stockID across ALERT_SHARDS worker processes, each shard loads the alerts
+      of its own list of stocks through the alert_tracker stockID index
+    - The cycle's price snapshot is shared with the workers through a shared memory buffer indexed by stockID
+    - Workers only return the triggered alert IDs, the parent process commits and notifies
+"""
+
+import math
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from threading import Lock
+from flask import current_app
+from sqlalchemy import bindparam, create_engine, text
+
+executor = None
+executorLock = Lock()
+
+# Per worker process engine, created on the shard's first run
+shardEngine = None
+
+
+def getExecutor(workers):
+    """
+    Process wide pool, created once and reused every cycle. Spawned rather than forked since the parent runs threads.
+
+    Parameters
+    ----------
+    workers : integer
+        Number of worker processes.
+
+    Returns
+    -------
+    ProcessPoolExecutor instance
+
+    """
+
+    global executor
+    with executorLock:
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return executor
+
+
+def attachSnapshot(snapshotName):
+    """
+    Attach to the parent's price snapshot without taking ownership, the parent unlinks it.
+
+    Parameters
+    ----------
+    snapshotName : string
+        Shared memory name of the price snapshot.
+
+    Returns
+    -------
+    SharedMemory instance
+
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=snapshotName, track=False)
+    # Before 3.13 attaching also registers the buffer with the resource tracker (bpo-39959). The pool's workers are
+    # spawned with the parent's tracker, where the buffer is already registered, and the parent's unlink unregisters it
+    return shared_memory.SharedMemory(name=snapshotName)
+
+
+def evaluateShard(databaseURI, stockIDs, snapshotName, snapshotSize):
+    """
+    Runs in a worker process. Load this shard's alerts and compare them to the shared price snapshot.
+
+    Parameters
+    ----------
+    databaseURI : string
+        SQLALCHEMY_DATABASE_URI
+    stockIDs : list
+        Stocks of this shard, each stock belongs to one shard.
+    snapshotName : string
+        Shared memory name of the price snapshot.
+    snapshotSize : integer
+        Number of prices in the snapshot (max stockID + 1).
+
+    Returns
+    -------
+    list
+        Triggered alert IDs.
+
+    """
+
+    global shardEngine
+    if shardEngine is None:
+        shardEngine = create_engine(databaseURI)
+
+    snapshot = attachSnapshot(snapshotName)
+    prices = snapshot.buf.cast('d')
+
+    # Looked up by the alert_tracker stockID index rather than scanning every alert
+    statement = text(
+        'SELECT id, "stockID", "priceAtUserInput", "desiredPrice", direction FROM alert_tracker '
+        'WHERE "stockID" IN :stockIDs AND status = \'IN PROGRESS\''
+    ).bindparams(bindparam('stockIDs', expanding=True))
+
+    triggeredIDs = []
+    try:
+        with shardEngine.connect() as connection:
+            for start in range(0, len(stockIDs), 500): # Below SQLite's bound parameter limit
+                alerts = connection.execute(statement, {'stockIDs': stockIDs[start:start + 500]})
+
+                for alertID, stockID, priceAtUserInput, desiredPrice, direction in alerts:
+                    price = prices[stockID]
+                    if math.isnan(price): # Stock without a valid price this cycle
+                        continue
+
+                    if direction is None: # Alerts created before the direction column
+                        direction = 'FALLING' if priceAtUserInput - desiredPrice >= 0 else 'RISING'
+                    if (direction == 'FALLING' and price <= desiredPrice) or (direction == 'RISING' and price >= desiredPrice):
+                        triggeredIDs.append(alertID)
+    finally:
+        prices.release()
+        snapshot.close()
+
+    return triggeredIDs
+
+
+def evaluateSharded(stockPrices):
+    """
+    Evaluate all 'IN PROGRESS' alerts across the process pool. Needs an app context.
+
+    Parameters
+    ----------
+    stockPrices : dictionary
+        Stock ID to current price, only stocks with a valid price this cycle.
+
+    Returns
+    -------
+    list
+        Triggered alert IDs. Nothing is committed.
+
+    """
+
+    if not stockPrices:
+        return []
+
+    shards = current_app.config['ALERT_SHARDS']
+    snapshotSize = max(stockPrices) + 1
+
+    # Price snapshot indexed by stockID, NaN for stocks without a price
+    snapshot = shared_memory.SharedMemory(create=True, size=8 * snapshotSize)
+    prices = snapshot.buf.cast('d')
+    try:
+        for i in range(snapshotSize):
+            prices[i] = math.nan
+        for stockID, price in stockPrices.items():
+            prices[stockID] = price
+
+        # Stocks split into one contiguous run of stockIDs per shard, only stocks with a price this cycle are loaded
+        stockIDs = sorted(stockPrices)
+        shardSize = math.ceil(len(stockIDs) / shards)
+        futures = [getExecutor(shards).submit(evaluateShard, current_app.config['SQLALCHEMY_DATABASE_URI'],
+                                              stockIDs[start:start + shardSize], snapshot.name, snapshotSize)
+                   for start in range(0, len(stockIDs), shardSize)]
+        return [alertID for future in futures for alertID in future.result()]
+    finally:
+        prices.release()
+        snapshot.close()
+        snapshot.unlink()
@@ -0,0 +1,98 @@
+"""
+Description:
+    - NumPy vectorized alert evaluation
+    - 'IN PROGRESS' alerts are loaded into column arrays and compared to the cycle's prices with one gather and one vectorized comparison
+"""
+
+import numpy as np
+from appPkg import db
+from appPkg.models import alertTracker
+
+
+def evaluateArrays(alertIDs, stockIDs, desiredPrices, falling, stockPrices):
+    """
+    Find the triggered alerts. Same trigger rule as the original loop:
+    falling - price <= desiredPrice, rising - price >= desiredPrice.
+
+    Parameters
+    ----------
+    alertIDs : numpy array of int
+    stockIDs : numpy array of int
+    desiredPrices : numpy array of float
+    falling : numpy array of bool
+        True if the user is checking for a falling stock price.
+    stockPrices : dictionary
+        Stock ID to current price, only stocks with a valid price this cycle.
+
+    Returns
+    -------
+    numpy array
+        Triggered alert IDs.
+
+    """
+
+    if not len(alertIDs) or not stockPrices:
+        return alertIDs[:0]
+
+    # Price lookup indexed by stockID, NaN for stocks without a price (NaN comparisons are always False)
+    lookup = np.full(max(int(stockIDs.max()), max(stockPrices)) + 1, np.nan)
+    lookup[np.fromiter(stockPrices.keys(), dtype=np.int64)] = np.fromiter(stockPrices.values(), dtype=np.float64)
+
+    prices = lookup[stockIDs] # Gather each alert's stock price
+    triggered = np.where(falling, prices <= desiredPrices, prices >= desiredPrices)
+    return alertIDs[triggered]
+
+
+class VectorizedAlertEngine(object):
+    """
+    Description:
+        Column arrays of every 'IN PROGRESS' alert
+    """
+
+    def __init__(self, alertIDs, stockIDs, desiredPrices, falling):
+        self.alertIDs = alertIDs
+        self.stockIDs = stockIDs
+        self.desiredPrices = desiredPrices
+        self.falling = falling
+
+    @staticmethod
+    def load():
+        """
+        Load the 'IN PROGRESS' alert columns in one query. Needs an app context.
+
+        Returns
+        -------
+        VectorizedAlertEngine instance
+
+        """
+
+        rows = db.session.query(alertTracker.id, alertTracker.stockID, alertTracker.priceAtUserInput,
+                                alertTracker.desiredPrice, alertTracker.direction) \
+            .filter(alertTracker.status == 'IN PROGRESS', alertTracker.stockID.isnot(None)).all()
+
+        alertIDs = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        stockIDs = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        priceAtUserInput = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        desiredPrices = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+        direction = np.array([row[4] or '' for row in rows], dtype=object)
+
+        # Alerts created before the direction column fall back to the original rule
+        falling = np.where(direction == '', priceAtUserInput - desiredPrices >= 0, direction == 'FALLING')
+
+        return VectorizedAlertEngine(alertIDs, stockIDs, desiredPrices, falling)
+
+    def evaluate(self, stockPrices):
+        """
+        Parameters
+        ----------
+        stockPrices : dictionary
+            Stock ID to current price, only stocks with a valid price this cycle.
+
+        Returns
+        -------
+        list
+            Triggered alert IDs.
+
+        """
+
+        return evaluateArrays(self.alertIDs, self.stockIDs, self.desiredPrices, self.falling, stockPrices).tolist()
@@ -0,0 +1,152 @@
+"""
+Description:
+    - Batched writer for the alert check cycle
+    - Collects the cycle's stock price updates, alert status changes and outbox notifications and flushes them in one transaction
+    - PostgreSQL: multi-row UPDATE ... FROM (VALUES ...), others: executemany
+"""
+
+from sqlalchemy.orm.attributes import set_committed_value
+from appPkg import db
+from appPkg.models import Stock, alertTracker, notificationOutbox
+from datetime import datetime
+
+
+class CycleWriter(object):
+    """
+    Description:
+        Writes go through the session's connection, so they share the cycle's transaction and the caller commits.
+        The loaded instances are updated in place, so email templates still show the new values.
+    """
+
+    def __init__(self, flushSize=500):
+        self.flushSize = flushSize # Rows per statement
+        self.prices = {} # stockID: (lastPrice, lastUpdateTime)
+        self.statuses = {} # status: [alertID]
+        self.notifications = [] # notificationOutbox rows
+
+    def updatePrice(self, stock, price, updateTime):
+        """
+        Parameters
+        ----------
+        stock : stock instance
+        price : float
+        updateTime : datetime
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.prices[stock.id] = (price, updateTime)
+        set_committed_value(stock, 'lastPrice', price)
+        set_committed_value(stock, 'lastUpdateTime', updateTime)
+
+    def updateStatus(self, alert, status):
+        """
+        Change the status of an 'IN PROGRESS' alert on the next flush.
+
+        Parameters
+        ----------
+        alert : alert instance
+        status : string
+            ie 'ALERT TRIGGERED'
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.statuses.setdefault(status, []).append(alert.id)
+        set_committed_value(alert, 'status', status)
+
+    def addNotification(self, alertID, sender, recipient, subject, textBody, htmlBody, status='PENDING', triggerPrice=None):
+        """
+        Queue an email in the notification outbox. Written in the same transaction as the alert status change.
+
+        Parameters
+        ----------
+        alertID : integer
+        sender : string
+        recipient : string
+        subject : string
+        textBody : text
+        htmlBody : HTML
+        status : string, optional
+            The default is 'PENDING'. 'DIGEST' rows are rendered into a per-user digest before sending.
+        triggerPrice : float, optional
+            Stock price that triggered the alert. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        now = datetime.utcnow()
+        self.notifications.append({'alertID': alertID, 'sender': sender, 'recipient': recipient, 'subject': subject,
+                                   'textBody': textBody, 'htmlBody': htmlBody, 'status': status, 'attempts': 0,
+                                   'nextAttemptTime': now, 'createdTime': now, 'triggerPrice': triggerPrice})
+
+    def chunks(self, items):
+        for i in range(0, len(items), self.flushSize):
+            yield items[i:i + self.flushSize]
+
+    def flush(self):
+        """
+        Write everything collected so far on the session's transaction. Needs an app context.
+        The caller commits (db.session.commit()).
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.prices and not self.statuses and not self.notifications:
+            return
+
+        connection = db.session.connection()
+        prices = [(stockID, price, updateTime) for stockID, (price, updateTime) in self.prices.items()]
+
+        for chunk in self.chunks(prices):
+            if connection.dialect.name == 'postgresql':
+                # One multi-row statement per chunk
+                values = ', '.join(f'(:id{i}, :price{i}, :time{i})' for i in range(len(chunk)))
+                params = {}
+                for i, (stockID, price, updateTime) in enumerate(chunk):
+                    params.update({f'id{i}': stockID, f'price{i}': price, f'time{i}': updateTime})
+                connection.execute(db.text(
+                    'UPDATE stock SET "lastPrice" = v.price, "lastUpdateTime" = v.time '
+                    f'FROM (VALUES {values}) AS v(id, price, time) WHERE stock.id = v.id'
+                ), params)
+            else:
+                connection.execute(
+                    Stock.__table__.update().where(Stock.__table__.c.id == db.bindparam('stockID'))
+                    .values(lastPrice=db.bindparam('price'), lastUpdateTime=db.bindparam('updateTime')),
+                    [{'stockID': stockID, 'price': price, 'updateTime': updateTime} for stockID, price, updateTime in chunk])
+
+        # Only alerts still 'IN PROGRESS' change status. An alert deleted or already triggered by another process
+        # since it was loaded is left alone, and the notification queued for it is dropped
+        table = alertTracker.__table__
+        requested, updated = set(), set()
+        for status, alertIDs in self.statuses.items():
+            for chunk in self.chunks(alertIDs):
+                requested.update(chunk)
+                condition = table.c.id.in_(chunk) & (table.c.status == 'IN PROGRESS')
+                statement = table.update().where(condition).values(status=status)
+                if connection.dialect.name == 'postgresql':
+                    updated.update(row[0] for row in connection.execute(statement.returning(table.c.id)))
+                else: # No UPDATE ... RETURNING, SQLite writers are serialized so the rows read here are the rows updated
+                    updated.update(row[0] for row in connection.execute(db.select(table.c.id).where(condition)))
+                    connection.execute(statement)
+        skipped = requested - updated
+        notifications = [row for row in self.notifications if row['alertID'] not in skipped]
+
+        for chunk in self.chunks(notifications):
+            connection.execute(notificationOutbox.__table__.insert(), chunk)
+
+        self.prices = {}
+        self.statuses = {}
+        self.notifications = []
@@ -302,11 +302,154 @@ class alertTracker(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     userID = db.Column(db.Integer, db.ForeignKey('user.id'))
-    stockID = db.Column(db.Integer, db.ForeignKey('stock.id'))
+    stockID = db.Column(db.Integer, db.ForeignKey('stock.id'), index=True) # Sharded evaluation loads alerts by stockID
     
     priceAtUserInput = db.Column(db.Float()) 
     desiredPrice = db.Column(db.Float())
     status = db.Column(db.String(50)) # 'IN PROGRESS', 'ALERT TRIGGERED'
+    direction = db.Column(db.String(10)) # 'RISING', 'FALLING'
+    
+    stock = db.relationship('Stock')
+    user = db.relationship('User')
+    
+    @staticmethod
+    def getDirection(priceAtUserInput, desiredPrice):
+        """
+        Direction the user is checking the stock price for.
+
+        Parameters
+        ----------
+        priceAtUserInput : float
+        desiredPrice : float
+
+        Returns
+        -------
+        string
+            'FALLING' if the desired price is at or below the price when the alert was set, else 'RISING'.
+
+        """
+        
+        return 'FALLING' if priceAtUserInput - desiredPrice >= 0 else 'RISING'
+    
+    @staticmethod
+    def loadWithStockAndUser(alertIDs=None, status='IN PROGRESS'):
+        """
+        Load alerts along with their stock and user in one joined query,
+        so the alert check cycle does not query the stock and user tables per alert.
+
+        Parameters
+        ----------
+        alertIDs : list, optional
+            The default is None, which loads every alert with the given status. Otherwise only these alert IDs.
+        status : string, optional
+            The default is 'IN PROGRESS', so by default only live alerts are loaded. None loads alerts of any status.
+
+        Returns
+        -------
+        list
+            alertTracker instances with alert.stock and alert.user already populated.
+
+        """
+        
+        query = alertTracker.query
+        if status is not None:
+            query = query.filter_by(status=status)
+        if alertIDs is not None:
+            query = query.filter(alertTracker.id.in_(alertIDs))
+        return query.options(db.joinedload(alertTracker.stock), db.joinedload(alertTracker.user)).all()
+    
+    @staticmethod
+    def triggerInDatabase(stockIDs):
+        """
+        Set-based alert evaluation. The database selects the alerts crossed by the stock's lastPrice
+        and flips them to 'ALERT TRIGGERED' in one UPDATE ... FROM ... RETURNING statement.
+        Raw SQL: PostgreSQL, and SQLite from 3.35 (UPDATE ... FROM needs 3.33, RETURNING 3.35).
+        Older SQLite builds (ie Debian bullseye's 3.34) select the crossed IDs first and update them by ID
+        in the same transaction, SQLite writers are serialized so the rows selected are the rows updated.
+
+        Parameters
+        ----------
+        stockIDs : list
+            Stocks with a valid price this cycle. Stocks YahooFinance failed on are not evaluated.
+
+        Returns
+        -------
+        list
+            IDs of the alerts that were triggered. Not committed.
+
+        """
+        
+        if not stockIDs:
+            return []
+        
+        crossed = (
+            'alert_tracker."stockID" = stock.id '
+            'AND alert_tracker.status = \'IN PROGRESS\' '
+            'AND stock.id IN :stockIDs '
+            'AND ((alert_tracker.direction = \'FALLING\' AND stock."lastPrice" <= alert_tracker."desiredPrice") '
+            'OR (alert_tracker.direction = \'RISING\' AND stock."lastPrice" >= alert_tracker."desiredPrice"))'
+        )
+        stockIDsParam = db.bindparam('stockIDs', expanding=True)
+        params = {'stockIDs': list(stockIDs)}
+        
+        dialect = db.engine.dialect
+        if dialect.name != 'sqlite' or dialect.dbapi.sqlite_version_info >= (3, 35):
+            statement = db.text(
+                'UPDATE alert_tracker SET status = \'ALERT TRIGGERED\' FROM stock WHERE ' + crossed + ' RETURNING alert_tracker.id'
+            ).bindparams(stockIDsParam)
+            return [row[0] for row in db.session.execute(statement, params)]
+        
+        alertIDs = [row[0] for row in db.session.execute(
+            db.text('SELECT alert_tracker.id FROM alert_tracker, stock WHERE ' + crossed).bindparams(stockIDsParam), params)]
+        for start in range(0, len(alertIDs), 500): # Below SQLite's bound parameter limit
+            db.session.execute(
+                alertTracker.__table__.update().where(alertTracker.__table__.c.id.in_(alertIDs[start:start + 500]))
+                .values(status='ALERT TRIGGERED'))
+        return alertIDs
+    
+    
+class notificationOutbox(db.Model):
+    """
+    Description:
+        Notification emails written in the same transaction as the alert status change,
+        sent and retried by the outbox dispatcher (see appPkg/main/outbox.py)
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    alertID = db.Column(db.Integer, db.ForeignKey('alert_tracker.id', ondelete='SET NULL'))
+    
+    sender = db.Column(db.String(120))
+    recipient = db.Column(db.String(120))
+    subject = db.Column(db.String(300))
+    textBody = db.Column(db.Text())
+    htmlBody = db.Column(db.Text())
+    
+    status = db.Column(db.String(20), index=True) # 'PENDING', 'SENDING', 'SENT', 'FAILED', or 'DIGEST', 'DIGESTED' in digest mode
+    attempts = db.Column(db.Integer, default=0)
+    nextAttemptTime = db.Column(db.DateTime()) # PENDING - not sent before this time
+    claimedBy = db.Column(db.String(32)) # Dispatcher batch currently sending the row
+    claimedUntil = db.Column(db.DateTime()) # SENDING - reclaimed after this time if the dispatcher died
+    createdTime = db.Column(db.DateTime())
+    sentTime = db.Column(db.DateTime())
+    lastError = db.Column(db.String(300))
+    triggerPrice = db.Column(db.Float()) # Stock price that triggered the alert, shown in the email
+    
+    
+class cycleStatus(db.Model):
+    """
+    Description:
+        Last alert check cycle of the worker process, one row per cycle name (see appPkg/main/cycles.py).
+        Lets 'flask shell' in any container see the cycle that ran in the worker
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    host = db.Column(db.String(255))
+    pid = db.Column(db.Integer)
+    running = db.Column(db.Boolean())
+    lastStart = db.Column(db.DateTime())
+    lastDuration = db.Column(db.Float()) # Seconds
+    lastOutcome = db.Column(db.String(300)) # 'OK' or the exception raised
+    lastOverran = db.Column(db.Boolean())
+    overruns = db.Column(db.Integer)
+    updatedTime = db.Column(db.DateTime())
     
     
 @login.user_loader 
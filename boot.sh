@@ -1,7 +1,17 @@
 #!/bin/bash
 # Docker container start-up script
 # activate the virtual environment, upgrade the database though the migration framework, and run the server with gunicorn
+# Role (first argument, set by the ECS container command):
+#   web    - gunicorn web workers, without the alert jobs (default)
+#   worker - the background jobs only ('flask alerts worker')
+# Both ship their own container's logs directory (LOG_SHIPPING_ENABLED, one shipper per container)
 
 source venv/bin/activate
 
-exec gunicorn -b :5000 --access-logfile - --error-logfile - stockpricealert:app
\ No newline at end of file
+export SCHEDULER_ENABLED=0 # Web workers never run the alert jobs, the worker starts them explicitly
+
+if [ "$1" == "worker" ]; then
+    exec flask alerts worker
+fi
+
+exec gunicorn -c gunicorn.conf.py stockpricealert:app # Preloaded app, see gunicorn.conf.py
\ No newline at end of file
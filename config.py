@@ -38,9 +38,76 @@ class Config(object):
     # CURRENT PRICE CHECK FREQUENCY (in minutes)
     PRICE_CHECK_FREQUENCY = 9
     
+    # SERVE-STALE FOR INTERACTIVE PRICE LOOKUPS - a stale price younger than PRICE_HARD_STALENESS (in minutes)
+    # is shown immediately and refreshed in the background
+    SERVE_STALE_PRICES = True
+    PRICE_HARD_STALENESS = 60
+    
+    # MAXIMUM NUMBER OF SYMBOLS IN THE IN-MEMORY PRICE CACHE (entries expire PRICE_CHECK_FREQUENCY after the price was updated)
+    PRICE_CACHE_SIZE = 1000
+    
+    # NUMBER OF SYMBOLS PER YAHOOFINANCE REQUEST DURING AN ALERT CHECK
+    PRICE_BATCH_SIZE = 50
+    
+    # FAILING QUOTES - a symbol without data is skipped for QUOTE_BACKOFF_BASE seconds, doubling up to QUOTE_BACKOFF_MAX.
+    # After BREAKER_FAILURE_THRESHOLD consecutive provider failures (errors, or no data for a whole batch) all fetches are skipped for BREAKER_RESET_TIMEOUT seconds
+    QUOTE_BACKOFF_BASE = 60
+    QUOTE_BACKOFF_MAX = 3600
+    BREAKER_FAILURE_THRESHOLD = 5
+    BREAKER_RESET_TIMEOUT = 120
+    
+    # ISSUE EMAILS ARE SENT AT MOST ONCE PER SYMBOL PER WINDOW (in minutes)
+    ISSUE_EMAIL_WINDOW = 60
+    
+    # ROWS PER BULK UPDATE STATEMENT WHEN AN ALERT CHECK CYCLE WRITES ITS PRICE AND STATUS UPDATES
+    WRITE_FLUSH_SIZE = 500
+    
+    # QUOTE PROVIDER - 'yahoofinancials' (blocking multi-symbol lookup), 'yahoo-chart' (Yahoo chart endpoint, one request per symbol
+    # on QUOTE_CONCURRENCY threads over a pooled HTTP session), 'yahoo-chart-async' (the same requests as asyncio tasks over a pooled
+    # aiohttp session, at most QUOTE_CONCURRENCY in flight) or 'fake' / 'fake-async' (offline load testing)
+    QUOTE_PROVIDER = os.environ.get('QUOTE_PROVIDER') or 'yahoofinancials'
+    QUOTE_CONCURRENCY = 20 # Maximum concurrent quote requests
+    QUOTE_TIMEOUT = 5 # Seconds per quote request
+    
+    # ALERT EVALUATION MODE - 'index' (in-memory threshold index), 'database' (one UPDATE ... RETURNING per cycle),
+    # 'sharded' (alerts partitioned by stockID across ALERT_SHARDS worker processes) or 'vectorized' (NumPy column arrays)
+    ALERT_EVALUATION_MODE = os.environ.get('ALERT_EVALUATION_MODE') or 'index'
+    ALERT_SHARDS = int(os.environ.get('ALERT_SHARDS') or os.cpu_count() or 1)
+    
+    # BACKGROUND JOBS (alert checks, outbox dispatch) - set SCHEDULER_ENABLED=0 in web workers
+    # and run the jobs in a separate 'flask alerts worker' process instead
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') != '0'
+    
+    # LOG BACKUP JOB - every process writing to a logs directory also ships it (one shipper per directory, see leader.py),
+    # so web containers ship their own logs. Set LOG_SHIPPING_ENABLED=0 only where another process ships the same directory
+    LOG_SHIPPING_ENABLED = os.environ.get('LOG_SHIPPING_ENABLED', '1') != '0'
+    
+    # DIRECTORY FOR SCHEDULER LEADER FILE LOCKS (used when the DB is not PostgreSQL). Defaults to the system temp directory
+    LEADER_LOCK_DIR = os.environ.get('LEADER_LOCK_DIR')
+    
+    # APP LOGGING - records are queued (up to LOG_QUEUE_SIZE) and written by a background thread in batches of LOG_BATCH_SIZE,
+    # at least every LOG_FLUSH_INTERVAL seconds. Error emails are sent at most once per LOG_EMAIL_INTERVAL seconds, errors in between are aggregated
+    LOG_QUEUE_SIZE = 10000
+    LOG_BATCH_SIZE = 100
+    LOG_FLUSH_INTERVAL = 1
+    LOG_EMAIL_INTERVAL = 300
+    # Set by gunicorn.conf.py: the preloading master starts no listener thread before forking, its records are written at exit
+    LOG_DEFER_LISTENER = os.environ.get('LOG_DEFER_LISTENER') == '1'
+
+    # LOG SEGMENTS - each process writes its own segment, closed (gzip compressed) at LOG_SEGMENT_SIZE bytes or after LOG_SEGMENT_MAX_AGE seconds.
+    # Closed segments are listed in logs/manifest.jsonl and deleted after LOG_RETENTION_DAYS days
+    LOG_SEGMENT_SIZE = 10 * 1024 * 1024 # 10 MB
+    LOG_SEGMENT_MAX_AGE = 3600 # 1 hour
+    LOG_RETENTION_DAYS = 14
+    
     # AWS S3 BACKUP FREQUENCY (in seconds)
     LOG_BACKUP_FREQUENCY = 15 # 15 seconds
     
+    # LOG SHIPPING - new log lines are uploaded as gzip segments by LOG_SHIP_WORKERS threads.
+    # Set LOG_SHIP_DIRECTORY to ship to a local directory instead of S3 (development and testing)
+    LOG_SHIP_WORKERS = 4
+    LOG_SHIP_DIRECTORY = os.environ.get('LOG_SHIP_DIRECTORY')
+    
     # Email configuration to send errors
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
@@ -48,4 +115,35 @@ class Config(object):
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     ADMINS = [os.environ.get('ADMINS')]
-    
\ No newline at end of file
+    
+    # Email delivery queue - up to MAIL_QUEUE_SIZE queued messages, sent by at most MAIL_WORKERS drain tasks on the 'mail' executor pool.
+    # Each batch of up to MAIL_BATCH_SIZE messages goes over one SMTP connection, closed after the batch. A full queue blocks senders up to MAIL_ENQUEUE_TIMEOUT seconds
+    MAIL_QUEUE_SIZE = 10000
+    MAIL_WORKERS = 4
+    MAIL_BATCH_SIZE = 50
+    MAIL_ENQUEUE_TIMEOUT = 5
+    
+    # NOTIFICATION OUTBOX - dispatcher runs every OUTBOX_DISPATCH_FREQUENCY seconds (and in the background after each alert check cycle), OUTBOX_BATCH_SIZE rows per claim.
+    # Failed sends are retried after OUTBOX_RETRY_BACKOFF * 2^(attempts - 1) seconds, up to OUTBOX_MAX_ATTEMPTS.
+    # Rows claimed by a dispatcher that died are reclaimed after OUTBOX_CLAIM_TIMEOUT seconds
+    OUTBOX_DISPATCH_FREQUENCY = 30
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_RETRY_BACKOFF = 60
+    OUTBOX_CLAIM_TIMEOUT = 300
+    
+    # ALERT DIGEST - set ALERT_DIGEST to send one email per user listing all of their alerts triggered within ALERT_DIGEST_WINDOW seconds
+    # instead of one email per alert. 0 groups the alerts of a single check cycle
+    ALERT_DIGEST = os.environ.get('ALERT_DIGEST') is not None
+    ALERT_DIGEST_WINDOW = int(os.environ.get('ALERT_DIGEST_WINDOW') or 0)
+
+    # BACKGROUND TASK POOLS - name: (max threads, max queued tasks, policy when the queue is full, seconds 'block' waits before rejecting).
+    # 'block' holds the submitter back (backpressure), 'reject' refuses the task, 'caller' runs it in the submitting thread.
+    # Threads start on demand and are reused, each task runs in an app context. 'flask shell' >>> executors.stats()
+    EXECUTOR_POOLS = {
+        'alerts': (1, 1, 'reject', 0), # Alert check cycles, already single-flight
+        'refresh': (4, 100, 'reject', 0), # Serve-stale background price refreshes, a rejected refresh is retried on the next request
+        'outbox': (1, 1, 'reject', 0), # Outbox dispatch after an alert check cycle, one running and one queued at most
+        'mail': (MAIL_WORKERS, MAIL_WORKERS, 'reject', 0), # Email drain tasks, at most MAIL_WORKERS at a time, messages queue in the delivery queue
+        'logs': (LOG_SHIP_WORKERS, 100, 'caller', 0) # Log shipping uploads, the backup job uploads itself when the pool is busy
+    }
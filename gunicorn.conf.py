@@ -0,0 +1,31 @@
+"""
+Description:
+    - gunicorn settings, used by boot.sh
+    - The app is preloaded once in the master and forked into the workers, which share its memory pages copy-on-write
+    - Nothing that must not cross a fork (scheduler and log listener threads, database connections) is started in the master,
+      each worker resets them in post_fork or starts them on first use
+    - Number of workers from WEB_CONCURRENCY (gunicorn default 1)
+"""
+
+import os
+
+bind = ':5000'
+accesslog = '-'
+errorlog = '-'
+preload_app = True
+
+# The scheduler is started in the workers after the fork, not in the master. Web workers ship the container's logs,
+# and only run the alert jobs with SCHEDULER_ENABLED=1
+runScheduler = os.environ.get('SCHEDULER_ENABLED', '1') != '0'
+shipLogs = os.environ.get('LOG_SHIPPING_ENABLED', '1') != '0'
+os.environ['SCHEDULER_ENABLED'] = '0'
+os.environ['LOG_SHIPPING_ENABLED'] = '0'
+
+# The master's log records (ie 'SPA startup') are queued and written when it exits, each worker starts its own listener thread
+os.environ['LOG_DEFER_LISTENER'] = '1'
+
+
+def post_fork(server, worker):
+    from appPkg import resetAfterFork
+
+    resetAfterFork(server.app.wsgi(), runScheduler, shipLogs)
@@ -1,7 +1,12 @@
-from appPkg import create_app, db
-from appPkg.models import Stock, User, alertTracker
+from appPkg import create_app, db, cli
+from appPkg.models import Stock, User, alertTracker, notificationOutbox, cycleStatus
+from appPkg.main.handlers import alertCycle
+from appPkg.main.pricecache import priceCache
+from appPkg.email import mailDelivery
+from appPkg.main.executors import executors
 
 app = create_app() 
+cli.register(app)
 
 if __name__ == '__main__':
    app.run(host="localhost", port=int("5000")) # Only needed for Spyder debug
@@ -18,6 +23,10 @@ def make_shell_context():
         >>> db
         >>> Stock
         >>> alertTracker
+        >>> alertCycle.status() # Last cycle run by the worker process
+        >>> priceCache.stats()
+        >>> mailDelivery.stats()
+        >>> executors.stats()
 
     Returns
     -------
@@ -25,4 +34,4 @@ def make_shell_context():
         Database models for easy query and lookup via Python shell.
 
     """
-    return {'db': db, 'Stock': Stock, 'User': User, 'alertTracker': alertTracker}
\ No newline at end of file
+    return {'db': db, 'Stock': Stock, 'User': User, 'alertTracker': alertTracker, 'notificationOutbox': notificationOutbox, 'cycleStatus': cycleStatus, 'alertCycle': alertCycle, 'priceCache': priceCache, 'mailDelivery': mailDelivery, 'executors': executors}
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Description:
+    Test fixtures - an app built by create_app on an in-memory SQLite database, without the scheduler or file logging
+"""
+
+import smtplib
+import pytest
+from datetime import datetime
+from config import Config
+from appPkg import create_app, db, mail
+from appPkg.models import Stock, User, alertTracker
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SCHEDULER_ENABLED = False
+    LOG_SHIPPING_ENABLED = False
+    WTF_CSRF_ENABLED = False
+    MAIL_SERVER = None
+    MAIL_SUPPRESS_SEND = True
+    ADMINS = ['admin@example.com']
+    QUOTE_PROVIDER = 'fake'
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='user', email='user@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def makeStock(app):
+    # makeStock('AAPL', lastPrice=100.0) -> committed Stock row
+    def makeStock(symbol, lastPrice=100.0, lastUpdateTime=None):
+        stock = Stock(symbol=symbol, name=symbol, active=True, lastPrice=lastPrice,
+                      lastUpdateTime=lastUpdateTime or datetime.utcnow())
+        db.session.add(stock)
+        db.session.commit()
+        return stock
+    return makeStock
+
+
+@pytest.fixture
+def makeAlert(user):
+    # makeAlert(stock, desiredPrice) -> committed 'IN PROGRESS' alert set at priceAtUserInput
+    def makeAlert(stock, desiredPrice, priceAtUserInput=100.0, status='IN PROGRESS', id=None):
+        alert = alertTracker(id=id, userID=user.id, stockID=stock.id, priceAtUserInput=priceAtUserInput,
+                             desiredPrice=desiredPrice, status=status,
+                             direction=alertTracker.getDirection(priceAtUserInput, desiredPrice))
+        db.session.add(alert)
+        db.session.commit()
+        return alert
+    return makeAlert
+
+
+class FakeSMTP(object):
+    # Records the connections opened and the messages sent, failing the sends listed in failures
+    def __init__(self, failures=(), refuse=False):
+        self.failures = list(failures)
+        self.refuse = refuse
+        self.opened = 0
+        self.closed = 0
+        self.sent = []
+
+    def connect(self):
+        fake = self
+
+        class Connection(object):
+            def __enter__(self):
+                if fake.refuse:
+                    raise ConnectionRefusedError('refused')
+                fake.opened += 1
+                return self
+
+            def __exit__(self, *exc):
+                fake.closed += 1
+
+            def send(self, msg):
+                if msg.subject in fake.failures:
+                    fake.failures.remove(msg.subject)
+                    raise smtplib.SMTPServerDisconnected('dropped')
+                fake.sent.append(msg.subject)
+
+        return Connection()
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    fake = FakeSMTP()
+    monkeypatch.setattr(mail, 'connect', fake.connect)
+    return fake
@@ -0,0 +1,116 @@
+from appPkg import db
+from appPkg.main.alertindex import AlertIndex
+
+
+def test_crossed_rising_and_falling(app):
+    index = AlertIndex()
+    index.add(1, 'AAPL', 100.0, 110.0) # Rising
+    index.add(2, 'AAPL', 100.0, 90.0) # Falling
+    index.add(3, 'AAPL', 100.0, 120.0)
+
+    assert index.crossed('AAPL', 100.0) == []
+    assert sorted(index.crossed('AAPL', 115.0)) == [1]
+    assert sorted(index.crossed('AAPL', 120.0)) == [1, 3]
+    assert index.crossed('AAPL', 90.0) == [2]
+    assert index.crossed('MSFT', 1000.0) == []
+
+
+def test_remove_drops_empty_symbols(app):
+    index = AlertIndex()
+    index.add(1, 'AAPL', 100.0, 110.0)
+    index.remove(1)
+    index.remove(1) # Unknown IDs are ignored
+
+    assert index.symbols() == set()
+    assert index.crossed('AAPL', 200.0) == []
+
+
+def test_sync_loads_alerts_committed_out_of_id_order(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    makeAlert(stock, 110.0, id=10)
+    index = AlertIndex()
+    index.sync()
+
+    makeAlert(stock, 105.0, id=5) # ID below an alert already synced
+    index.sync()
+
+    assert sorted(index.crossed('AAPL', 110.0)) == [5, 10]
+
+
+def test_sync_removes_deleted_triggered_and_edited_alerts(makeStock, makeAlert):
+    aapl, msft = makeStock('AAPL'), makeStock('MSFT')
+    deleted = makeAlert(aapl, 110.0)
+    triggered = makeAlert(aapl, 120.0)
+    edited = makeAlert(msft, 110.0)
+    index = AlertIndex()
+    index.sync()
+    assert index.symbols() == {'AAPL', 'MSFT'}
+
+    # Changes made by other processes
+    db.session.delete(deleted)
+    triggered.status = 'ALERT TRIGGERED'
+    edited.desiredPrice = 90.0
+    db.session.commit()
+    index.sync()
+
+    assert index.symbols() == {'MSFT'}
+    assert set(index.entries) == {edited.id}
+    assert index.crossed('MSFT', 110.0) == []
+    assert index.crossed('MSFT', 90.0) == [edited.id]
+
+
+def test_sync_after_the_first_only_loads_new_alerts(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    makeAlert(stock, 110.0)
+    index = AlertIndex()
+    index.sync()
+    makeAlert(stock, 120.0)
+    index.sync()
+    index.sync()
+
+    assert index.fullSyncs == 1
+    assert sorted(index.crossed('AAPL', 120.0)) == sorted(index.entries)
+    assert len(index.entries) == 2
+
+
+def test_sync_reloads_when_a_threshold_is_edited(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    alert = makeAlert(stock, 110.0)
+    index = AlertIndex()
+    index.sync()
+
+    alert.desiredPrice = 110.01 # Same count, different total
+    db.session.commit()
+    index.sync()
+
+    assert index.fullSyncs == 2
+    assert index.crossed('AAPL', 110.0) == []
+    assert index.crossed('AAPL', 110.01) == [alert.id]
+
+
+def test_routes_keep_a_loaded_index_up_to_date(app, user, makeStock, makeAlert, monkeypatch):
+    from flask_login import login_user
+    from appPkg.main import routes
+
+    stock = makeStock('AAPL')
+    existingID = makeAlert(stock, 90.0).id
+    index = AlertIndex()
+    index.sync()
+    monkeypatch.setattr(routes, 'alertIndex', index)
+
+    @app.login_manager.request_loader
+    def loadUser(request):
+        return user
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['selectedStock'] = 'AAPL'
+        session['lastPrice'] = 100.0
+    client.post('/enterprice', data={'desiredPrice': 120.0, 'submit': True})
+    client.post('/managealerts', data={'deleteUserAlert': f'AAPL (ID:{existingID})'})
+
+    newAlertID, = index.entries
+    assert newAlertID != existingID
+    assert index.crossed('AAPL', 120.0) == [newAlertID]
+    index.sync()
+    assert index.fullSyncs == 1 # Marker matches, the routes' changes were already indexed
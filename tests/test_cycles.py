@@ -0,0 +1,49 @@
+from threading import Event
+from appPkg.main.cycles import CycleRunner
+from appPkg.models import cycleStatus
+
+
+def test_status_is_recorded_for_other_processes(app):
+    runner = CycleRunner('test', lambda app: None)
+    runner.run(app)
+
+    row = cycleStatus.query.get('test')
+    assert row.lastOutcome == 'OK' and row.running is False
+
+    # Another process (ie 'flask shell' in a web container) has not run a cycle and reads the recorded one
+    other = CycleRunner('test', lambda app: None)
+    status = other.status()
+    assert status['lastOutcome'] == 'OK'
+    assert status['lastStart'] == row.lastStart
+
+
+def test_failed_cycle_outcome(app):
+    def fail(app):
+        raise ValueError('no prices')
+
+    runner = CycleRunner('test', fail)
+    runner.run(app)
+    assert runner.status()['lastOutcome'] == "ValueError('no prices')"
+    assert cycleStatus.query.get('test').lastOutcome == "ValueError('no prices')"
+
+
+def test_overlapping_ticks_coalesce(app):
+    started, release = Event(), Event()
+    calls = []
+
+    def cycle(app):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+
+    runner = CycleRunner('test', cycle)
+    assert runner.trigger(app)
+    started.wait(5)
+    assert not runner.trigger(app) # Coalesced into one follow-up run
+    assert not runner.trigger(app)
+    release.set()
+
+    from appPkg.main.executors import executors
+    executors.pool('alerts').join()
+    assert len(calls) == 2
+    assert runner.status()['overruns'] == 2
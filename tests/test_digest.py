@@ -0,0 +1,41 @@
+from appPkg import db
+from appPkg.models import notificationOutbox
+from appPkg.main.digest import buildDigests
+from appPkg.main.handlers import queueAlertEmail
+from appPkg.main.writer import CycleWriter
+
+
+def trigger(app, alerts, digest):
+    app.config['ALERT_DIGEST'] = digest
+    writer = CycleWriter()
+    for alert in alerts:
+        writer.updateStatus(alert, 'ALERT TRIGGERED')
+        queueAlertEmail(alert, alert.stock, alert.user, writer)
+    writer.flush()
+    db.session.commit()
+
+
+def test_digest_shows_the_trigger_prices(app, makeStock, makeAlert):
+    app.config['ALERT_DIGEST_WINDOW'] = 0
+    aapl, msft = makeStock('AAPL', lastPrice=111.0), makeStock('MSFT', lastPrice=222.0)
+    trigger(app, [makeAlert(aapl, 110.0), makeAlert(msft, 220.0)], digest=True)
+
+    # Prices move on before the dispatcher builds the digest
+    aapl.lastPrice, msft.lastPrice = 150.0, 250.0
+    db.session.commit()
+    assert buildDigests(app.config) == 1
+
+    digest = notificationOutbox.query.filter_by(status='PENDING').one()
+    assert digest.subject == '[StockPriceAlert] 2 Alerts Triggered'
+    assert '$111.0' in digest.textBody and '$222.0' in digest.textBody and '$222.0' in digest.htmlBody
+    assert '$150.0' not in digest.textBody and '$250.0' not in digest.textBody
+    assert notificationOutbox.query.filter_by(status='DIGESTED').count() == 2
+
+
+def test_notification_records_the_trigger_price(app, makeStock, makeAlert):
+    stock = makeStock('AAPL', lastPrice=111.0)
+    trigger(app, [makeAlert(stock, 110.0)], digest=False)
+
+    row = notificationOutbox.query.one()
+    assert row.status == 'PENDING' and row.triggerPrice == 111.0
+    assert 'Stock Price (when triggered): $111.0' in row.textBody
@@ -0,0 +1,55 @@
+import smtplib
+from flask_mail import Message
+from appPkg import email
+from appPkg.email import sendMessages, mailDelivery
+
+
+def messages(*subjects):
+    return [Message(subject, sender='spa@example.com', recipients=['user@example.com']) for subject in subjects]
+
+
+def test_batch_shares_one_connection(smtp):
+    assert sendMessages(messages('a', 'b', 'c')) == [None, None, None]
+    assert smtp.opened == smtp.closed == 1
+
+
+def test_failed_send_reconnects_and_retries(smtp):
+    smtp.failures = ['b', 'c', 'c']
+    results = sendMessages(messages('a', 'b', 'c', 'd'), retries=1)
+
+    assert results[:2] == [None, None] and results[3] is None
+    assert isinstance(results[2], smtplib.SMTPServerDisconnected) # Failed twice
+    assert smtp.sent == ['a', 'b', 'd']
+    assert smtp.opened == smtp.closed == 4 # Every connection closed
+
+
+def test_unreachable_server_fails_the_batch(smtp):
+    smtp.refuse = True
+    results = sendMessages(messages('a', 'b'), retries=1)
+    assert all(isinstance(error, ConnectionRefusedError) for error in results)
+
+
+def test_delivery_drains_the_queue_in_batches(smtp, monkeypatch):
+    monkeypatch.setattr(mailDelivery, 'batchSize', 10)
+    before = mailDelivery.stats()
+    for msg in messages(*[str(i) for i in range(25)]):
+        mailDelivery.enqueue(msg)
+    mailDelivery.join()
+    mailDelivery.pool.join()
+
+    stats = mailDelivery.stats()
+    assert sorted(smtp.sent, key=int) == [str(i) for i in range(25)]
+    assert stats['sent'] - before['sent'] == 25
+    assert stats['queueDepth'] == 0 and stats['workers'] == 0 # Drain tasks end with the queue
+    assert smtp.opened == smtp.closed
+
+
+def test_full_queue_drops_after_timeout(app, monkeypatch):
+    monkeypatch.setattr(mailDelivery, 'queue', email.Queue(maxsize=1))
+    monkeypatch.setattr(mailDelivery, 'enqueueTimeout', 0.01)
+    monkeypatch.setattr(mailDelivery, 'draining', mailDelivery.workers) # Drain tasks busy
+    dropped = mailDelivery.stats()['dropped']
+
+    mailDelivery.enqueue(messages('a')[0])
+    mailDelivery.enqueue(messages('b')[0])
+    assert mailDelivery.stats()['dropped'] == dropped + 1
@@ -0,0 +1,124 @@
+import threading
+from threading import Event
+from types import SimpleNamespace
+import pytest
+from appPkg.main.executors import BoundedPool, Executors, TaskRejected
+
+
+@pytest.fixture
+def pools():
+    created = []
+
+    def makePool(*args, **kwargs):
+        pool = BoundedPool(*args, **kwargs)
+        created.append(pool)
+        return pool
+
+    yield makePool
+    for pool in created:
+        pool.shutdown()
+
+
+def busyPool(makePool, policy, timeout=0):
+    # One worker held by a running task, and a queue of one already full
+    pool = makePool('test', 1, 1, policy, timeout)
+    release = Event()
+    running = Event()
+    pool.submit(lambda: (running.set(), release.wait(5)))
+    running.wait(5)
+    pool.submit(lambda: None)
+    return pool, release
+
+
+def test_reject_policy_rejects_when_full(pools):
+    pool, release = busyPool(pools, 'reject')
+    with pytest.raises(TaskRejected):
+        pool.submit(lambda: None)
+    release.set()
+    pool.join()
+    assert (pool.stats()['rejected'], pool.stats()['completed']) == (1, 2)
+
+
+def test_block_policy_waits_then_rejects(pools):
+    pool, release = busyPool(pools, 'block', timeout=0.05)
+    with pytest.raises(TaskRejected):
+        pool.submit(lambda: None)
+    release.set()
+    assert pool.submit(lambda: 'done').result(5) == 'done' # Room again once the worker is free
+
+
+def test_caller_policy_runs_in_submitting_thread(pools):
+    pool, release = busyPool(pools, 'caller')
+    future = pool.submit(threading.current_thread)
+    assert future.result(0) is threading.current_thread()
+    release.set()
+    assert pool.stats()['callerRuns'] == 1
+
+
+def test_failed_task_sets_exception_and_counts(pools):
+    pool = pools('test', 2, 10)
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        pool.submit(fail).result(5)
+    pool.join()
+    assert pool.stats()['failed'] == 1
+
+
+def test_shutdown_drains_queued_tasks(pools):
+    pool = pools('test', 1, 100)
+    release = Event()
+    ran = []
+    pool.submit(release.wait, 5)
+    for i in range(10):
+        pool.submit(ran.append, i)
+    release.set()
+    pool.shutdown()
+
+    assert ran == list(range(10))
+    assert pool.stats()['threads'] == 0
+
+
+def test_idle_callback_failure_keeps_worker(pools):
+    pool = pools('test', 1, 10, idleTimeout=0.01)
+    idle = Event()
+
+    def onIdle():
+        idle.set()
+        raise OSError('connection already closed')
+
+    pool.onIdle = onIdle
+    pool.submit(lambda: None).result(5)
+    assert idle.wait(5)
+    assert pool.submit(lambda: 'still serving').result(5) == 'still serving'
+    assert pool.threads[0].is_alive()
+
+
+def test_wait_is_averaged_over_started_tasks(pools):
+    pool = pools('test', 1, 10)
+    release = Event()
+    running = Event()
+    pool.submit(lambda: (running.set(), release.wait(5)))
+    running.wait(5)
+
+    stats = pool.stats()
+    assert (stats['started'], stats['completed']) == (1, 0)
+    assert stats['meanWait'] == pool.waitTime # Running task counted, not divided by the finished tasks
+    release.set()
+    pool.join()
+    assert pool.stats()['completed'] == 1
+
+
+def test_init_app_updates_pools_in_place():
+    executors = Executors()
+    executors.init_app(SimpleNamespace(config={'EXECUTOR_POOLS': {'mail': (1, 10, 'block', 5)}}))
+    pool = executors.pool('mail')
+
+    executors.init_app(SimpleNamespace(config={'EXECUTOR_POOLS': {'mail': (4, 50, 'reject', 0)}}))
+    assert executors.pool('mail') is pool # References held elsewhere, ie mailDelivery.pool, stay valid
+    assert (pool.workers, pool.queueSize, pool.policy, pool.timeout, pool.queue.maxsize) == (4, 50, 'reject', 0, 50)
+
+    with pytest.raises(ValueError):
+        executors.init_app(SimpleNamespace(config={'EXECUTOR_POOLS': {'mail': (1, 10, 'unknown', 0)}}))
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+import pytest
+from appPkg import db
+from appPkg.main import leader
+from appPkg.main.leader import LeaderLock, runAsLeader
+
+pytestmark = pytest.mark.skipif(leader.fcntl is None, reason='No file locking on this platform')
+
+
+class FakeConnection(object):
+    # Stands in for a PostgreSQL connection, sharing the held advisory keys of a FakeServer
+    def __init__(self, server):
+        self.server = server
+        self.keys = set()
+        self.closed = False
+
+    def execute(self, statement, params=None):
+        if self.closed:
+            raise ConnectionError('connection lost')
+        if 'pg_try_advisory_lock' in str(statement):
+            acquired = params['key'] not in self.server.held
+            if acquired:
+                self.server.held.add(params['key'])
+                self.keys.add(params['key'])
+            return SimpleNamespace(scalar=lambda: acquired)
+        return None
+
+    def close(self):
+        if not self.closed:
+            self.server.held -= self.keys
+        self.closed = True
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.held = set()
+        self.dialect = SimpleNamespace(name='postgresql')
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(leader, 'db', SimpleNamespace(engine=server, text=db.text))
+    return server
+
+
+def test_advisory_lock_single_leader(app, postgres):
+    first, second = LeaderLock('checkAlerts'), LeaderLock('checkAlerts')
+
+    assert first.acquire(app)
+    assert first.acquire(app) # Cheap once held
+    assert not second.acquire(app)
+
+    first.release()
+    assert second.acquire(app)
+
+
+def test_advisory_lock_lost_connection_is_released(app, postgres):
+    first, second = LeaderLock('checkAlerts'), LeaderLock('checkAlerts')
+    assert first.acquire(app)
+
+    first.connection.close() # Connection dropped by the server, the lock goes with it
+    assert second.acquire(app)
+    assert not first.acquire(app)
+
+
+def test_file_lock_single_leader(app, tmp_path):
+    app.config['LEADER_LOCK_DIR'] = str(tmp_path)
+    first, second = LeaderLock('checkAlerts'), LeaderLock('checkAlerts')
+
+    assert first.acquire(app)
+    assert not second.acquire(app) # Separate open file, as in another process
+    first.release()
+    assert second.acquire(app)
+    second.release()
+
+
+def test_host_scoped_lock_ignores_advisory_lock(app, postgres, tmp_path):
+    hostLock = LeaderLock('backup_logs', lockDir=str(tmp_path))
+    assert hostLock.acquire(app)
+    assert postgres.held == set() # File lock in the directory, not an advisory lock
+    assert (tmp_path / '.spa-backup_logs.lock').exists()
+    assert not LeaderLock('backup_logs', lockDir=str(tmp_path)).acquire(app)
+    hostLock.release()
+
+    assert not LeaderLock('backup_logs', lockDir=str(tmp_path / 'missing')).acquire(app)
+
+
+def test_runAsLeader_runs_job_once_per_lock(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(leader, 'leaderLocks', {})
+    calls = []
+    runAsLeader('backup_logs', lambda app, value: calls.append(value), app, 1, lockDir=str(tmp_path))
+    assert calls == [1]
+    leader.leaderLocks['backup_logs'].release()
@@ -0,0 +1,66 @@
+import logging
+import os
+import pytest
+from appPkg.main.logpipeline import LogPipeline
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def makeLogger(pipeline, name):
+    logger = logging.getLogger(f'test.logpipeline.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [pipeline.queueHandler]
+    return logger
+
+
+def test_listener_thread_writes_records():
+    handler = ListHandler()
+    pipeline = LogPipeline([handler], flushInterval=0.05)
+    makeLogger(pipeline, 'listener').info('hello %s', 'world')
+    assert pipeline.thread.is_alive()
+
+    pipeline.stop()
+    assert handler.messages == ['hello world']
+
+
+def test_deferred_owner_starts_no_thread_and_writes_at_stop():
+    handler = ListHandler()
+    pipeline = LogPipeline([handler], deferStart=True)
+    makeLogger(pipeline, 'deferred').info('startup')
+    assert pipeline.thread is None
+    assert handler.messages == []
+
+    pipeline.stop()
+    assert handler.messages == ['startup']
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='No fork on this platform')
+def test_forked_child_starts_listener_without_parent_records(tmp_path):
+    handler = ListHandler()
+    pipeline = LogPipeline([handler], deferStart=True, flushInterval=0.05)
+    logger = makeLogger(pipeline, 'forked')
+    logger.info('parent')
+
+    result = tmp_path / 'child.txt'
+    pid = os.fork()
+    if pid == 0: # Child: report the thread and what its handler wrote, then exit without running atexit
+        try:
+            logger.info('child')
+            started = pipeline.thread is not None and pipeline.thread.is_alive()
+            pipeline.stop()
+            result.write_text(f'{started} {handler.messages}')
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert result.read_text() == "True ['child']"
+    pipeline.stop()
+    assert handler.messages == ['parent']
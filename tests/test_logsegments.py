@@ -0,0 +1,157 @@
+import gzip
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from appPkg.main.logsegments import Manifest, SegmentFileHandler
+from appPkg.main.logshipper import LogShipper, LocalStore
+
+
+def makeRecord(message):
+    return logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'})
+
+
+def readSegment(manifest, record):
+    path = manifest.segmentPath(record)
+    with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path)) as f:
+        return f.read()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='No fork on this platform')
+def test_forked_child_writes_its_own_segment(tmp_path):
+    handler = SegmentFileHandler(str(tmp_path))
+    handler.emit(makeRecord('parent')) # Buffered, not flushed yet
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            handler.emit(makeRecord('child'))
+            handler.close()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    handler.close()
+
+    manifest = Manifest(str(tmp_path))
+    segments = list(manifest.segments().values())
+    assert len(segments) == 2
+    assert all(record['status'] == 'closed' for record in segments)
+    assert sorted(readSegment(manifest, record) for record in segments) == ['child\n', 'parent\n']
+
+
+def writeManifest(directory, records):
+    with open(os.path.join(directory, Manifest.fileName), 'w') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+
+
+def closedSegment(directory, name, text, end):
+    with gzip.open(os.path.join(directory, name + '.gz'), 'wt') as f:
+        f.write(text)
+    return {'segment': name, 'status': 'closed', 'start': end, 'end': end, 'records': text.count('\n'), 'bytes': len(text)}
+
+
+def deadPid():
+    # Pid of a process that has exited and been reaped
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+def test_segment_rolls_over_by_size(tmp_path):
+    handler = SegmentFileHandler(str(tmp_path), maxBytes=19)
+    for i in range(5):
+        handler.emit(makeRecord(f'line {i:02d} of the log')) # 19 bytes with the newline
+    handler.close()
+
+    manifest = Manifest(str(tmp_path))
+    segments = list(manifest.segments().values())
+    assert len(segments) == 5
+    assert [(record['status'], record['records'], record['bytes']) for record in segments] == [('closed', 1, 19)] * 5
+    assert ''.join(readSegment(manifest, record) for record in segments) == ''.join(f'line {i:02d} of the log\n' for i in range(5))
+    assert sorted(os.listdir(tmp_path)) == sorted([Manifest.fileName] + [record['segment'] + '.gz' for record in segments])
+
+
+def test_segment_rolls_over_by_age_on_flush(tmp_path):
+    handler = SegmentFileHandler(str(tmp_path), maxAge=0)
+    handler.emit(makeRecord('aged'))
+    handler.flush()
+    assert handler.stream is None
+
+    record, = Manifest(str(tmp_path)).segments().values()
+    assert record['status'] == 'closed'
+    assert record['host'] == socket.gethostname() and record['pid'] == os.getpid()
+
+
+def test_retention_keeps_expired_segments_until_shipped(tmp_path):
+    old = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    new = datetime.utcnow().isoformat()
+    records = [closedSegment(str(tmp_path), 'shipped.log', 'a\n', old),
+               closedSegment(str(tmp_path), 'partly-shipped.log', 'a\nb\n', old),
+               closedSegment(str(tmp_path), 'unshipped.log', 'a\n', old),
+               closedSegment(str(tmp_path), 'recent.log', 'a\n', new)]
+    writeManifest(str(tmp_path), records)
+    with open(os.path.join(tmp_path, Manifest.checkpointName), 'w') as f:
+        json.dump({'shipped.log': 2, 'partly-shipped.log': 2, 'recent.log': 2}, f)
+
+    manifest = Manifest(str(tmp_path))
+    assert manifest.applyRetention(14) == 1
+    assert list(manifest.segments()) == ['partly-shipped.log', 'unshipped.log', 'recent.log']
+    assert not os.path.exists(os.path.join(tmp_path, 'shipped.log.gz'))
+    assert os.path.exists(os.path.join(tmp_path, 'unshipped.log.gz'))
+
+
+def test_retention_without_shipping_deletes_by_age(tmp_path):
+    old = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    writeManifest(str(tmp_path), [closedSegment(str(tmp_path), 'old.log', 'a\n', old)])
+
+    manifest = Manifest(str(tmp_path))
+    assert manifest.applyRetention(14) == 1
+    assert manifest.segments() == {}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='No fork on this platform')
+def test_retention_closes_segments_of_dead_processes(tmp_path):
+    start = datetime.utcnow().isoformat()
+    host = socket.gethostname()
+    with open(os.path.join(tmp_path, 'dead.log'), 'w') as f:
+        f.write('complete\npartial') # Died while writing
+    with open(os.path.join(tmp_path, 'live.log'), 'w') as f:
+        f.write('running\n')
+    writeManifest(str(tmp_path), [
+        {'segment': 'dead.log', 'status': 'open', 'host': host, 'pid': deadPid(), 'start': start},
+        {'segment': 'live.log', 'status': 'open', 'host': host, 'pid': os.getpid(), 'start': start},
+        {'segment': 'other-host.log', 'status': 'open', 'host': host + '-other', 'pid': deadPid(), 'start': start}])
+
+    manifest = Manifest(str(tmp_path))
+    manifest.applyRetention(14)
+    segments = manifest.segments()
+    assert {name: record['status'] for name, record in segments.items()} == \
+        {'dead.log': 'closed', 'live.log': 'open', 'other-host.log': 'open'}
+    assert (segments['dead.log']['records'], segments['dead.log']['bytes']) == (2, len('complete\npartial\n'))
+    assert readSegment(manifest, segments['dead.log']) == 'complete\npartial\n'
+    assert not os.path.exists(os.path.join(tmp_path, 'dead.log'))
+
+
+def test_legacy_log_files_are_adopted_and_shipped(tmp_path):
+    for name, text in (('20211018-185246_spa.log', 'current\n'), ('20211018-185246_spa.log.1', 'rotated\n')):
+        with open(os.path.join(tmp_path, name), 'w') as f:
+            f.write(text)
+
+    SegmentFileHandler(str(tmp_path)).close()
+    manifest = Manifest(str(tmp_path))
+    segments = manifest.segments()
+    assert list(segments) == ['20211018-185246_spa.log', '20211018-185246_spa.log.1']
+    assert [readSegment(manifest, record) for record in segments.values()] == ['current\n', 'rotated\n']
+    assert Manifest(str(tmp_path)).adoptLegacy() == 0
+
+    store = tmp_path / 'store'
+    with ThreadPoolExecutor(1) as executor:
+        run = LogShipper(LocalStore(str(store)), executor).ship(str(tmp_path))
+    assert run['uploads'] == 2
+    with gzip.open(store / 'logs' / '20211018-185246_spa.log.1' / f'{0:012d}.gz', 'rt') as f:
+        assert f.read() == 'rotated\n'
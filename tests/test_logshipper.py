@@ -0,0 +1,109 @@
+import gzip
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from appPkg.main.logsegments import Manifest, SegmentFileHandler
+from appPkg.main.logshipper import LogShipper, LocalStore
+
+
+class FailingStore(LocalStore):
+    # Fails the first 'failures' uploads
+    def __init__(self, directory, failures=1):
+        super().__init__(directory)
+        self.failures = failures
+
+    def put(self, key, data):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('upload failed')
+        super().put(key, data)
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(2) as executor:
+        yield executor
+
+
+@pytest.fixture
+def logs(tmp_path):
+    (tmp_path / 'logs').mkdir()
+    return str(tmp_path / 'logs'), str(tmp_path / 'store')
+
+
+def makeRecord(message):
+    return logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'})
+
+
+def shipped(store):
+    # Segment name to the uploaded chunks in offset order: [(offset, text)]
+    chunks = {}
+    prefix = os.path.join(store, 'logs')
+    for segment in sorted(os.listdir(prefix)):
+        for name in sorted(os.listdir(os.path.join(prefix, segment))):
+            with gzip.open(os.path.join(prefix, segment, name), 'rt') as f:
+                chunks.setdefault(segment, []).append((int(name.split('.')[0]), f.read()))
+    return chunks
+
+
+def checkpoint(directory):
+    with open(os.path.join(directory, Manifest.checkpointName)) as f:
+        return json.load(f)
+
+
+def test_lines_are_shipped_once_across_a_restart(logs, executor):
+    logs, store = logs
+    handler = SegmentFileHandler(logs)
+    handler.emit(makeRecord('first'))
+    handler.emit(makeRecord('second'))
+    handler.flush()
+    assert LogShipper(LocalStore(store), executor).ship(logs)['uploads'] == 1
+
+    handler.emit(makeRecord('third'))
+    handler.flush()
+    restarted = LogShipper(LocalStore(store), executor) # Offsets reloaded from the checkpoint
+    assert restarted.ship(logs)['uploads'] == 1
+    assert restarted.ship(logs)['uploads'] == 0 # Nothing new
+
+    (segment, chunks), = shipped(store).items()
+    assert chunks == [(0, 'first\nsecond\n'), (len('first\nsecond\n'), 'third\n')]
+    assert checkpoint(logs) == {segment: len('first\nsecond\nthird\n')}
+
+
+def test_segment_closed_between_runs_ships_its_tail(logs, executor):
+    logs, store = logs
+    shipper = LogShipper(LocalStore(store), executor)
+    handler = SegmentFileHandler(logs)
+    handler.emit(makeRecord('shipped open'))
+    handler.flush()
+    shipper.ship(logs)
+
+    handler.emit(makeRecord('written before close'))
+    handler.close() # Compressed, the open file is gone
+    assert shipper.ship(logs)['uploads'] == 1
+    assert shipper.ship(logs)['uploads'] == 0
+
+    (segment, chunks), = shipped(store).items()
+    assert chunks == [(0, 'shipped open\n'), (len('shipped open\n'), 'written before close\n')]
+    record, = Manifest(logs).segments().values()
+    assert record['status'] == 'closed' and checkpoint(logs) == {segment: record['bytes']}
+
+
+def test_failed_upload_keeps_the_offset(logs, executor):
+    logs, store = logs
+    handler = SegmentFileHandler(logs)
+    handler.emit(makeRecord('retried'))
+    handler.flush()
+
+    shipper = LogShipper(FailingStore(store), executor)
+    run = shipper.ship(logs)
+    assert (run['uploads'], run['failures']) == (0, 1)
+    assert set(checkpoint(logs).values()) == {0}
+    assert not os.path.exists(store)
+
+    assert shipper.ship(logs)['uploads'] == 1
+    (segment, chunks), = shipped(store).items()
+    assert chunks == [(0, 'retried\n')]
+    handler.close()
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+from appPkg.main import logstats
+from appPkg.main.logsegments import Manifest
+from appPkg.main.logstats import AccessStats, BoundedCounter, accessStats, logFiles
+
+
+def accessLine(time, ip, user, endpoint, status=200, elapsed=2.0):
+    return (f'{time},123 INFO: IP: {ip} - User: {user} - Accessing: {endpoint} - {status} in {elapsed:.1f} ms '
+            f'[in /app/appPkg/main/syslog.py:84]\n')
+
+
+LINES = (accessLine('2021-10-18 18:52:46', '1.2.3.4', '7', 'main.index', elapsed=2.0)
+         + accessLine('2021-10-18 18:59:01', '1.2.3.4', '?', 'main.index', elapsed=4.0)
+         + '2021-10-18 19:00:00,001 ERROR: Exception on /api [in /app/appPkg/errors/handlers.py:12]\n'
+         + accessLine('2021-10-18 19:05:10', '5.6.7.8', '7', 'api.alerts', status=503, elapsed=10.0)
+         # Written before the access log, no status or duration
+         + '2021-10-18 19:06:00,5 INFO: IP: 5.6.7.8 - User: 7 - Accessing: main.about in <module>. [in /app/appPkg/main/routes.py:40]\n')
+
+
+def test_scan_counts_access_lines():
+    stats = AccessStats()
+    stats.scan(LINES.encode())
+    report = stats.report()
+
+    assert (report['requests'], report['errors']) == (4, 1)
+    assert report['endpoints'] == [('main.index', 2, 3.0), ('api.alerts', 1, 10.0), ('main.about', 1, None)]
+    assert report['users'] == [('7', 3), ('?', 1)]
+    assert report['ips'] == [('1.2.3.4', 2), ('5.6.7.8', 2)]
+    assert report['buckets'] == [('2021-10-18 18', 2), ('2021-10-18 19', 2)]
+
+
+def test_scan_since_and_daily_buckets():
+    stats = AccessStats(since='2021-10-18 19:00', bucketLength=10)
+    stats.scan(LINES.encode())
+    report = stats.report()
+
+    assert report['requests'] == 2
+    assert report['buckets'] == [('2021-10-18', 2)]
+
+
+def test_bounded_counter_drops_least_counted_keys():
+    counter = BoundedCounter(maxKeys=4)
+    counter.update(['a'] * 5 + ['b'] * 4 + ['c'] * 3 + ['d'] * 2)
+    assert counter.dropped == 0
+
+    counter.update(['e'])
+    assert counter.top(10) == [('a', 5), ('b', 4)]
+    assert counter.dropped == 3 + 2 + 1
+
+
+def test_compressed_file_matches_plain_file_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(logstats, 'CHUNK_SIZE', 64) # Lines span the chunk boundaries
+    data = LINES * 50
+    (tmp_path / 'plain.log').write_text(data)
+    with gzip.open(tmp_path / 'closed.log.gz', 'wt') as f:
+        f.write(data)
+
+    plain = AccessStats()
+    plain.scanFile(str(tmp_path / 'plain.log'))
+    compressed = AccessStats()
+    compressed.scanFile(str(tmp_path / 'closed.log.gz'))
+
+    assert plain.report()['requests'] == 200
+    assert compressed.report() == plain.report()
+    assert compressed.bytesRead == len(data)
+
+
+def test_access_stats_reads_manifest_segments_and_legacy_files(tmp_path):
+    directory = str(tmp_path)
+    (tmp_path / '20211017-120000_spa.log').write_text(accessLine('2021-10-17 12:00:00', '9.9.9.9', '1', 'auth.login'))
+    with gzip.open(tmp_path / 'old.log.gz', 'wt') as f:
+        f.write(accessLine('2021-10-17 13:00:00', '9.9.9.9', '1', 'main.index'))
+    (tmp_path / 'open.log').write_text(LINES)
+    (tmp_path / Manifest.checkpointName).write_text('{}')
+    with open(os.path.join(directory, Manifest.fileName), 'w') as f:
+        f.write(json.dumps({'segment': 'old.log', 'status': 'closed', 'start': '2021-10-17T13:00:00',
+                            'end': '2021-10-17T13:00:01', 'bytes': 1}) + '\n')
+        f.write(json.dumps({'segment': 'open.log', 'status': 'open', 'start': '2021-10-18T18:00:00'}) + '\n')
+
+    assert [os.path.basename(path) for path in logFiles(directory)] == ['20211017-120000_spa.log', 'old.log.gz', 'open.log']
+    assert accessStats(directory).report()['requests'] == 6
+
+    # Closed segments that ended before 'since' are not read
+    assert [os.path.basename(path) for path in logFiles(directory, since='2021-10-18')] == ['20211017-120000_spa.log', 'open.log']
+    assert accessStats(directory, since='2021-10-18').report()['requests'] == 4
@@ -0,0 +1,54 @@
+import sqlite3
+import pytest
+from sqlalchemy import event
+from appPkg import db
+from appPkg.models import alertTracker
+
+
+def test_loadWithStockAndUser_defaults_to_in_progress(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    live = makeAlert(stock, 110.0)
+    makeAlert(stock, 120.0, status='ALERT TRIGGERED')
+
+    assert [alert.id for alert in alertTracker.loadWithStockAndUser()] == [live.id]
+    assert len(alertTracker.loadWithStockAndUser(status=None)) == 2
+
+
+@pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 35), reason='UPDATE ... RETURNING needs SQLite 3.35')
+def test_triggerInDatabase_flips_crossed_alerts(makeStock, makeAlert):
+    stock = makeStock('AAPL', lastPrice=115.0)
+    rising = makeAlert(stock, 110.0)
+    notYet = makeAlert(stock, 120.0)
+    falling = makeAlert(stock, 90.0)
+
+    assert alertTracker.triggerInDatabase([stock.id]) == [rising.id]
+    db.session.commit()
+    db.session.expire_all()
+    assert [rising.status, notYet.status, falling.status] == ['ALERT TRIGGERED', 'IN PROGRESS', 'IN PROGRESS']
+
+
+def test_triggerInDatabase_without_update_returning(makeStock, makeAlert, monkeypatch):
+    # SQLite before 3.35 (ie Debian bullseye's 3.34) selects the crossed IDs, then updates them by ID
+    monkeypatch.setattr(db.engine.dialect.dbapi, 'sqlite_version_info', (3, 34, 1))
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    stock = makeStock('AAPL', lastPrice=85.0)
+    other = makeStock('MSFT', lastPrice=200.0)
+    falling = makeAlert(stock, 90.0)
+    rising = makeAlert(stock, 110.0)
+    notEvaluated = makeAlert(other, 150.0)
+    triggered = makeAlert(stock, 95.0, status='ALERT TRIGGERED')
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert alertTracker.triggerInDatabase([stock.id]) == [falling.id]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert not any('RETURNING' in statement for statement in statements)
+    db.session.commit()
+    db.session.expire_all()
+    assert [falling.status, rising.status, notEvaluated.status, triggered.status] == \
+        ['ALERT TRIGGERED', 'IN PROGRESS', 'IN PROGRESS', 'ALERT TRIGGERED']
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from appPkg import db
+from appPkg.models import notificationOutbox
+from appPkg.main.outbox import claimBatch, dispatchOutbox
+
+
+def addRows(count, **fields):
+    now = datetime.utcnow()
+    for i in range(count):
+        row = dict(sender='spa@example.com', recipient=f'user{i}@example.com', subject=f'Alert {i}', textBody='text',
+                   htmlBody='<p>html</p>', status='PENDING', attempts=0, nextAttemptTime=now, createdTime=now)
+        row.update(fields)
+        db.session.add(notificationOutbox(**row))
+    db.session.commit()
+
+
+def test_claim_takes_due_rows_once(app):
+    app.config['OUTBOX_BATCH_SIZE'] = 2
+    addRows(3)
+    addRows(1, nextAttemptTime=datetime.utcnow() + timedelta(minutes=5)) # Not due yet
+
+    first = claimBatch(app.config)
+    second = claimBatch(app.config)
+    assert len(first) == 2 and len(second) == 1
+    assert {row.claimedBy for row in first} != {row.claimedBy for row in second}
+    assert claimBatch(app.config) == [] # Claimed rows are no longer due
+
+
+def test_expired_claim_is_reclaimed(app):
+    addRows(1, status='SENDING', claimedBy='dead', claimedUntil=datetime.utcnow() - timedelta(seconds=1))
+    addRows(1, status='SENDING', claimedBy='alive', claimedUntil=datetime.utcnow() + timedelta(minutes=5))
+
+    rows = claimBatch(app.config)
+    assert [row.subject for row in rows] == ['Alert 0']
+    assert rows[0].claimedBy != 'dead'
+
+
+def test_dispatch_sends_and_retries_with_backoff(app, smtp):
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 2
+    addRows(3)
+    smtp.failures = ['Alert 1']
+
+    assert dispatchOutbox(app) == {'sent': 2, 'failed': 1}
+    retried = notificationOutbox.query.filter_by(subject='Alert 1').one()
+    assert retried.status == 'PENDING' and retried.attempts == 1 and retried.lastError
+    assert retried.nextAttemptTime > datetime.utcnow() + timedelta(seconds=app.config['OUTBOX_RETRY_BACKOFF'] - 5)
+    assert smtp.opened == 2 # Re-opened after the failed send
+
+    # Second failure reaches OUTBOX_MAX_ATTEMPTS
+    retried.nextAttemptTime = datetime.utcnow()
+    db.session.commit()
+    smtp.failures = ['Alert 1']
+    assert dispatchOutbox(app) == {'sent': 0, 'failed': 1}
+    assert notificationOutbox.query.filter_by(subject='Alert 1').one().status == 'FAILED'
+    assert notificationOutbox.query.filter_by(status='SENT').count() == 2
+
+
+def test_dispatch_stops_when_the_server_is_down(app, smtp):
+    app.config['OUTBOX_BATCH_SIZE'] = 2
+    addRows(5)
+    smtp.refuse = True
+
+    assert dispatchOutbox(app) == {'sent': 0, 'failed': 2} # Rest left for the next run
+    assert notificationOutbox.query.filter_by(status='PENDING', attempts=0).count() == 3
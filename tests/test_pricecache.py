@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from appPkg.main import handlers
+from appPkg.main.pricecache import PriceCache
+
+
+def test_entries_expire_and_evict(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('appPkg.main.pricecache.monotonic', lambda: now[0])
+    cache = PriceCache(maxSize=2)
+    cache.put('AAPL', 100.0, 60)
+    cache.put('MSFT', 200.0, 60)
+    assert cache.get('AAPL', lambda: (None, 0)) == 100.0 # AAPL most recently used
+
+    cache.put('GOOG', 300.0, 60) # Evicts MSFT
+    assert set(cache.entries) == {'AAPL', 'GOOG'}
+
+    now[0] += 61
+    assert cache.get('AAPL', lambda: (101.0, 60)) == 101.0 # Expired, loaded again
+    assert cache.stats() == {'size': 2, 'hits': 1, 'misses': 1, 'evictions': 1}
+
+
+def test_stale_and_missing_prices_are_not_cached():
+    cache = PriceCache()
+    assert cache.get('AAPL', lambda: (100.0, 0)) == 100.0
+    assert cache.get('MSFT', lambda: (None, 60)) is None
+    assert cache.entries == {}
+
+
+def test_concurrent_misses_share_one_load():
+    cache = PriceCache()
+    release, calls = Event(), []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 100.0, 60
+
+    results = []
+    threads = [Thread(target=lambda: results.append(cache.get('AAPL', loader))) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [100.0] * 5
+    assert len(calls) == 1
+
+
+def test_price_expires_with_the_stored_update_time(app, makeStock):
+    # Updated 8 of the 9 minutes of PRICE_CHECK_FREQUENCY ago: fresh for about one more minute, not nine
+    makeStock('AAPL', lastPrice=100.0, lastUpdateTime=datetime.utcnow() - timedelta(minutes=8))
+    price, ttl = handlers.loadTickerInfo('AAPL')
+    assert price == 100.0
+    assert 50 < ttl <= 60
+
+
+def test_served_stale_price_is_not_cached(app, makeStock, monkeypatch):
+    makeStock('AAPL', lastPrice=100.0, lastUpdateTime=datetime.utcnow() - timedelta(minutes=30))
+    refreshed = []
+    monkeypatch.setattr(handlers, 'refreshTickerInBackground', refreshed.append)
+    monkeypatch.setattr(handlers, 'priceCache', PriceCache())
+
+    assert handlers.tickerInfo('AAPL') == 100.0
+    assert refreshed == ['AAPL']
+    assert handlers.priceCache.entries == {} # The next request checks the DB again
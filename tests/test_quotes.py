@@ -0,0 +1,110 @@
+import asyncio
+import os
+import pytest
+from time import perf_counter
+from appPkg.main.quotes import QuoteProvider, QuoteProviderError, ConcurrentQuoteProvider, FakeQuoteProvider, \
+    YahooFinancialsProvider, AsyncQuoteProvider, AsyncFakeQuoteProvider, AsyncYahooChartProvider, getQuoteProvider, resetQuoteProvider
+from config import Config
+
+
+def test_providers_must_implement_their_fetch():
+    with pytest.raises(TypeError):
+        QuoteProvider()
+    with pytest.raises(TypeError):
+        ConcurrentQuoteProvider()
+    with pytest.raises(TypeError):
+        AsyncQuoteProvider()
+
+
+@pytest.mark.skipif('QUOTE_PROVIDER' in os.environ, reason='QUOTE_PROVIDER set in the environment')
+def test_default_provider_is_yahoofinancials(app):
+    assert Config.QUOTE_PROVIDER == 'yahoofinancials'
+    app.config['QUOTE_PROVIDER'] = Config.QUOTE_PROVIDER
+    resetQuoteProvider()
+    try:
+        assert isinstance(getQuoteProvider().provider, YahooFinancialsProvider)
+    finally:
+        resetQuoteProvider()
+
+
+def test_concurrent_fetches_overlap():
+    provider = FakeQuoteProvider(concurrency=10, latency=0.05)
+    start = perf_counter()
+    prices = provider.getPrices([f'SYM{i}' for i in range(20)])
+    elapsed = perf_counter() - start
+
+    assert len(prices) == 20 and all(prices.values())
+    assert elapsed < 0.5 # 20 sequential requests would take 1s
+
+
+def test_failed_request_is_left_out():
+    class Failing(FakeQuoteProvider):
+        def fetchPrice(self, symbol):
+            if symbol == 'BAD':
+                raise ConnectionError('reset')
+            return super().fetchPrice(symbol)
+
+    prices = Failing(latency=0).getPrices(['AAPL', 'BAD'])
+    assert 'BAD' not in prices and prices['AAPL']
+
+
+def test_async_fetches_overlap_on_one_loop():
+    provider = AsyncFakeQuoteProvider(concurrency=10, latency=0.05)
+    start = perf_counter()
+    prices = provider.getPrices([f'SYM{i}' for i in range(20)])
+    elapsed = perf_counter() - start
+
+    assert len(prices) == 20 and all(prices.values())
+    assert elapsed < 0.5 # 20 sequential requests would take 1s
+    loop = provider.loop
+    provider.getPrices(['SYM0'])
+    assert provider.loop is loop # Reused across cycles
+
+
+def test_async_failed_and_timed_out_requests_are_left_out():
+    class Failing(AsyncFakeQuoteProvider):
+        async def fetchPrice(self, session, symbol):
+            if symbol == 'BAD':
+                raise ConnectionError('reset')
+            if symbol == 'SLOW':
+                await asyncio.sleep(5)
+            return await super().fetchPrice(session, symbol)
+
+    provider = Failing(timeout=0.1, latency=0)
+    prices = provider.getPrices(['AAPL', 'BAD', 'SLOW'])
+    assert list(prices) == ['AAPL'] and prices['AAPL']
+    with pytest.raises(QuoteProviderError):
+        provider.getPrices(['BAD', 'SLOW'])
+
+
+def test_async_yahoo_chart_reads_the_market_price():
+    class Response(object):
+        def __init__(self, status, body):
+            self.status = status
+            self.body = body
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        def raise_for_status(self):
+            if self.status >= 400:
+                raise ConnectionError(f'HTTP {self.status}')
+
+        async def json(self):
+            return self.body
+
+    class Session(object):
+        # Stands in for the aiohttp session: AAPL has a price, XXXX is unknown, DOWN fails
+        def get(self, url, params=None):
+            if url.endswith('/AAPL'):
+                return Response(200, {'chart': {'result': [{'meta': {'regularMarketPrice': 150.5}}]}})
+            return Response(404 if url.endswith('/XXXX') else 503, None)
+
+    class Provider(AsyncYahooChartProvider):
+        def createSession(self):
+            return Session()
+
+    assert Provider().getPrices(['AAPL', 'XXXX', 'DOWN']) == {'AAPL': 150.5, 'XXXX': None}
@@ -0,0 +1,128 @@
+import pytest
+from appPkg.main import resilience
+from appPkg.main.quotes import QuoteProvider, QuoteProviderError, ConcurrentQuoteProvider, GuardedQuoteProvider
+from appPkg.main.resilience import SymbolBackoff, CircuitBreaker, DedupWindow
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience, 'monotonic', lambda: now[0])
+    return now
+
+
+class ScriptedProvider(QuoteProvider):
+    # Returns the prices it is given, or raises them
+    def __init__(self):
+        self.result = {}
+        self.calls = 0
+
+    def getPrices(self, symbols):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return {symbol: self.result[symbol] for symbol in symbols if symbol in self.result}
+
+
+def guarded(threshold=2):
+    provider = ScriptedProvider()
+    return provider, GuardedQuoteProvider(provider, SymbolBackoff(60, 3600), CircuitBreaker(threshold, 120))
+
+
+def test_backoff_doubles_up_to_maximum(clock):
+    backoff = SymbolBackoff(base=60, maximum=100)
+    backoff.recordFailure('BAD')
+    assert backoff.isBlocked('BAD')
+    clock[0] += 61
+    assert not backoff.isBlocked('BAD')
+
+    backoff.recordFailure('BAD') # 120s, capped at 100
+    clock[0] += 99
+    assert backoff.isBlocked('BAD')
+    clock[0] += 2
+    assert not backoff.isBlocked('BAD')
+
+    backoff.recordSuccess('BAD')
+    assert 'BAD' not in backoff.failures
+
+
+def test_breaker_opens_then_half_open_probe(clock):
+    breaker = CircuitBreaker(threshold=2, resetTimeout=120)
+    breaker.recordFailure()
+    assert breaker.allow()
+    breaker.recordFailure()
+    assert breaker.state == 'OPEN' and not breaker.allow()
+
+    clock[0] += 120
+    assert breaker.allow() # Half open, one probe
+    assert breaker.state == 'HALF OPEN' and not breaker.allow()
+    breaker.recordFailure() # Failed probe opens it again
+    assert breaker.state == 'OPEN' and not breaker.allow()
+
+    clock[0] += 120
+    assert breaker.allow()
+    breaker.recordSuccess()
+    assert breaker.state == 'CLOSED' and breaker.allow()
+
+
+def test_single_symbol_without_data_does_not_trip_breaker(clock):
+    provider, quotes = guarded(threshold=2)
+    provider.result = {'TYPO': None}
+    for symbol in ('TYPO', 'TYPO2', 'TYPO3'): # User input, not an outage
+        provider.result = {symbol: None}
+        assert quotes.getPrice(symbol) is None
+
+    assert quotes.breaker.state == 'CLOSED'
+    assert quotes.backoff.isBlocked('TYPO')
+    calls = provider.calls
+    assert quotes.getPrice('TYPO') is None and provider.calls == calls # Backed off, not fetched
+
+
+def test_provider_errors_trip_breaker_without_backoff(clock):
+    provider, quotes = guarded(threshold=2)
+    provider.result = QuoteProviderError('connection refused')
+    quotes.getPrice('AAPL')
+    quotes.getPrices(['AAPL', 'MSFT'])
+
+    assert quotes.breaker.state == 'OPEN'
+    assert not quotes.backoff.isBlocked('AAPL')
+    calls = provider.calls
+    assert quotes.getPrices(['AAPL']) == {'AAPL': None} and provider.calls == calls # Short-circuited
+
+
+def test_whole_batch_without_data_counts_as_failure(clock):
+    provider, quotes = guarded(threshold=1)
+    provider.result = {'AAPL': None, 'MSFT': None}
+    quotes.getPrices(['AAPL', 'MSFT'])
+
+    assert quotes.breaker.state == 'OPEN'
+    assert not quotes.backoff.isBlocked('AAPL')
+
+
+def test_symbol_failed_in_transit_is_not_backed_off(clock):
+    provider, quotes = guarded()
+    provider.result = {'AAPL': 100.0, 'GONE': None} # MSFT request failed, left out
+    assert quotes.getPrices(['AAPL', 'MSFT', 'GONE']) == {'AAPL': 100.0, 'MSFT': None, 'GONE': None}
+    assert not quotes.backoff.isBlocked('MSFT')
+    assert quotes.backoff.isBlocked('GONE')
+    assert quotes.breaker.state == 'CLOSED'
+
+
+def test_concurrent_provider_raises_when_every_request_fails():
+    class Provider(ConcurrentQuoteProvider):
+        def fetchPrice(self, symbol):
+            if symbol == 'NONE':
+                return None
+            raise ConnectionError('refused')
+
+    with pytest.raises(QuoteProviderError):
+        Provider(concurrency=2).getPrices(['AAPL', 'MSFT'])
+    assert Provider(concurrency=2).getPrices(['AAPL', 'NONE']) == {'NONE': None}
+
+
+def test_dedup_window(clock):
+    window = DedupWindow()
+    assert window.allow('AAPL', 60)
+    assert not window.allow('AAPL', 60)
+    clock[0] += 60
+    assert window.allow('AAPL', 60)
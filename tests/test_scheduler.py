@@ -0,0 +1,57 @@
+import os
+import pytest
+import appPkg
+from appPkg import db, resetAfterFork, startScheduler
+
+
+@pytest.fixture
+def scheduler(app):
+    yield
+    if appPkg.scheduler.running:
+        appPkg.scheduler.shutdown(wait=False)
+        appPkg.scheduler.remove_all_jobs()
+
+
+def jobIDs():
+    return sorted(job.id for job in appPkg.scheduler.get_jobs())
+
+
+def test_web_process_only_ships_logs(app, scheduler):
+    startScheduler(app, alertJobs=False, logJobs=True)
+    assert jobIDs() == ['job2']
+
+
+def test_worker_adds_alert_jobs_to_running_scheduler(app, scheduler):
+    startScheduler(app, alertJobs=False, logJobs=True)
+    startScheduler(app, alertJobs=True, logJobs=True)
+    assert appPkg.scheduler.running
+    assert jobIDs() == ['job1', 'job2', 'job3']
+
+
+def test_scheduler_exists_before_it_starts(app, scheduler):
+    assert not appPkg.scheduler.running # create_app starts no jobs with both switches off
+    startScheduler(app, alertJobs=True, logJobs=False)
+    assert appPkg.scheduler.running
+    assert jobIDs() == ['job1', 'job3']
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='No fork on this platform')
+def test_forked_worker_gets_its_own_connection_pool(app, tmp_path):
+    pool = db.engine.pool
+    result = tmp_path / 'child.txt'
+    pid = os.fork()
+    if pid == 0: # Child: reset as a gunicorn worker would, then report the pool and a query through it
+        try:
+            resetAfterFork(app)
+            with db.engine.connect() as connection:
+                value = connection.exec_driver_sql('SELECT 1').scalar()
+            result.write_text(f'{db.engine.pool is not pool} {value}')
+        except Exception as e:
+            result.write_text(repr(e))
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert result.read_text() == 'True 1'
+    assert db.engine.pool is pool
+    assert not appPkg.scheduler.running
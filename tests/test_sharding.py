@@ -0,0 +1,60 @@
+from multiprocessing import shared_memory
+import pytest
+from appPkg import create_app, db
+from appPkg.main import sharding
+from appPkg.main.vectorized import VectorizedAlertEngine
+from appPkg.models import Stock, User, alertTracker
+from conftest import TestConfig
+
+
+@pytest.fixture
+def fileApp(tmp_path):
+    # The shard workers connect on their own, so the database has to be a file rather than in memory
+    class ShardConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "shards.db"}'
+        ALERT_SHARDS = 2
+
+    app = create_app(ShardConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    if sharding.executor is not None:
+        sharding.executor.shutdown()
+        sharding.executor = None
+
+
+def test_sharded_matches_vectorized_and_unlinks_snapshot(fileApp, monkeypatch):
+    user = User(username='user', email='user@example.com')
+    stocks = [Stock(symbol=f'S{i}', name=f'S{i}', active=True) for i in range(6)]
+    db.session.add_all([user] + stocks)
+    db.session.commit()
+
+    for i, stock in enumerate(stocks):
+        for desiredPrice in (90.0, 95.0, 105.0, 110.0):
+            db.session.add(alertTracker(userID=user.id, stockID=stock.id, priceAtUserInput=100.0, desiredPrice=desiredPrice,
+                                        status='IN PROGRESS', direction=alertTracker.getDirection(100.0, desiredPrice)))
+        db.session.add(alertTracker(userID=user.id, stockID=stock.id, priceAtUserInput=100.0, desiredPrice=90.0,
+                                    status='ALERT TRIGGERED', direction='FALLING'))
+        db.session.add(alertTracker(userID=user.id, stockID=stock.id, priceAtUserInput=100.0, desiredPrice=108.0,
+                                    status='IN PROGRESS', direction=None)) # Created before the direction column
+    db.session.commit()
+    # The last stock has no price this cycle
+    stockPrices = {stock.id: price for stock, price in zip(stocks[:-1], (89.0, 94.0, 100.0, 106.0, 112.0))}
+
+    created = []
+
+    class RecordedSharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.name)
+
+    monkeypatch.setattr(sharding.shared_memory, 'SharedMemory', RecordedSharedMemory)
+    triggeredIDs = sharding.evaluateSharded(stockPrices)
+
+    assert sorted(triggeredIDs) == sorted(VectorizedAlertEngine.load().evaluate(stockPrices))
+    assert len(triggeredIDs) == 2 + 1 + 0 + 1 + 3 # The legacy alert only crosses at 112.0
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=created[0])
@@ -0,0 +1,32 @@
+import numpy as np
+from appPkg import db
+from appPkg.main.vectorized import VectorizedAlertEngine, evaluateArrays
+from appPkg.models import alertTracker
+
+
+def test_evaluate_arrays_skips_stocks_without_a_price():
+    alertIDs = np.array([1, 2, 3, 4], dtype=np.int64)
+    stockIDs = np.array([0, 1, 2, 2], dtype=np.int64)
+    desiredPrices = np.array([90.0, 110.0, 90.0, 110.0])
+    falling = np.array([True, False, True, False])
+
+    # Stock 1 has no price this cycle, stock 3 has no alerts
+    triggered = evaluateArrays(alertIDs, stockIDs, desiredPrices, falling, {0: 89.0, 2: 120.0, 3: 1.0})
+    assert triggered.tolist() == [1, 4]
+    assert evaluateArrays(alertIDs, stockIDs, desiredPrices, falling, {}).tolist() == []
+
+
+def test_load_falls_back_to_the_original_rule_without_direction(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    unpriced = makeStock('MSFT')
+    legacyFalling = makeAlert(stock, 90.0)
+    legacyRising = makeAlert(stock, 110.0)
+    current = makeAlert(stock, 95.0)
+    makeAlert(unpriced, 90.0)
+    legacyFalling.direction = legacyRising.direction = None # Created before the direction column
+    db.session.commit()
+
+    engine = VectorizedAlertEngine.load()
+    assert sorted(engine.evaluate({stock.id: 80.0})) == sorted([legacyFalling.id, current.id])
+    assert engine.evaluate({stock.id: 115.0}) == [legacyRising.id]
+    assert engine.evaluate({unpriced.id: 200.0}) == []
@@ -0,0 +1,44 @@
+from datetime import datetime
+from appPkg import db
+from appPkg.models import Stock, alertTracker, notificationOutbox
+from appPkg.main.writer import CycleWriter
+
+
+def test_flush_writes_prices_statuses_and_notifications_in_chunks(makeStock, makeAlert):
+    stocks = [makeStock(f'SYM{i}') for i in range(5)]
+    alerts = [makeAlert(stock, 110.0) for stock in stocks]
+    writer = CycleWriter(flushSize=2)
+    now = datetime(2026, 1, 1)
+
+    for stock in stocks:
+        writer.updatePrice(stock, 120.0, now)
+    for alert in alerts:
+        writer.updateStatus(alert, 'ALERT TRIGGERED')
+        writer.addNotification(alert.id, 'spa@example.com', 'user@example.com', 'Alert', 'text', '<p>html</p>')
+    writer.flush()
+    db.session.commit()
+    db.session.expire_all()
+
+    assert {stock.lastPrice for stock in Stock.query.all()} == {120.0}
+    assert {alert.status for alert in alertTracker.query.all()} == {'ALERT TRIGGERED'}
+    assert notificationOutbox.query.filter_by(status='PENDING').count() == 5
+    assert writer.prices == {} and writer.statuses == {} and writer.notifications == []
+
+
+def test_flush_only_flips_in_progress_alerts(makeStock, makeAlert):
+    stock = makeStock('AAPL')
+    live = makeAlert(stock, 110.0)
+    gone = makeAlert(stock, 120.0)
+    writer = CycleWriter()
+    for alert in (live, gone):
+        writer.updateStatus(alert, 'ALERT TRIGGERED')
+        writer.addNotification(alert.id, 'spa@example.com', 'user@example.com', 'Alert', 'text', '<p>html</p>')
+
+    # Changed by another process after this cycle loaded it
+    db.session.execute(alertTracker.__table__.update().where(alertTracker.id == gone.id).values(status='DELETED'))
+    writer.flush()
+    db.session.commit()
+
+    assert db.session.query(alertTracker.status).filter_by(id=gone.id).scalar() == 'DELETED'
+    assert db.session.query(alertTracker.status).filter_by(id=live.id).scalar() == 'ALERT TRIGGERED'
+    assert [row.alertID for row in notificationOutbox.query.all()] == [live.id]